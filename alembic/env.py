@@ -17,6 +17,9 @@ from app.models.invoice import Invoice
 from app.models.invoice_item import InvoiceItem
 from app.models.consumer_analysis import ConsumerAnalysis
 from app.models.invitation import Invitation
+from app.models.ocr_job import OcrJob
+from app.models.analysis_job import AnalysisJob
+from app.models.spending_summary import UserItemStat, UserSpendingSummary
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,29 @@
+"""add file processing timings
+
+Revision ID: 4a8d2f6c1e95
+Revises: e3a7b5d90c12
+Create Date: 2025-05-02 10:41:27.318540
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a8d2f6c1e95'
+down_revision: Union[str, None] = 'e3a7b5d90c12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('file', sa.Column('processing_timings', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('file', 'processing_timings')
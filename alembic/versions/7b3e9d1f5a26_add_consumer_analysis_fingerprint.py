@@ -0,0 +1,28 @@
+"""add consumer analysis fingerprint
+
+Revision ID: 7b3e9d1f5a26
+Revises: 4a8d2f6c1e95
+Create Date: 2025-05-04 16:22:09.581304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b3e9d1f5a26'
+down_revision: Union[str, None] = '4a8d2f6c1e95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('consumer_analysis', sa.Column('data_fingerprint', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('consumer_analysis', 'data_fingerprint')
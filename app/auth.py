@@ -2,6 +2,7 @@ from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
@@ -10,18 +11,27 @@ from app.core.config import settings
 from app.core.db import get_db
 from app.crud.user import get_user_by_username, get_user_by_email
 from app.schemas.user import TokenData
-from app.utils.password import verify_password
+from app.utils.password import verify_and_update_password_async
+from app.utils.user_cache import cache_user, get_cached_user
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.api_prefix}/token")
 
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = get_user_by_email(db, email=email)
+async def authenticate_user(db: Session, email: str, password: str):
+    user = await run_in_threadpool(get_user_by_email, db, email)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await verify_and_update_password_async(
+        password, user.hashed_password
+    )
+    if not valid:
         return False
+    if new_hash:
+        # 工作因子已变化，用新的哈希替换旧的
+        user.hashed_password = new_hash
+        db.add(user)
+        await run_in_threadpool(db.commit)
     return user
 
 
@@ -60,9 +70,16 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = get_user_by_username(db, username=token_data.username)
+    # 命中缓存时返回的是不绑定会话的用户对象
+    expires = payload.get("exp")
+    user = get_cached_user(token_data.username, expires)
+    if user is not None:
+        return user
+
+    user = await run_in_threadpool(get_user_by_username, db, token_data.username)
     if user is None:
         raise credentials_exception
+    cache_user(token_data.username, expires, user)
     return user
 
 
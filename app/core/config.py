@@ -1,3 +1,7 @@
+import os
+from typing import Optional
+
+from pydantic import Field
 from pydantic_settings import BaseSettings
 
 
@@ -18,13 +22,65 @@ class Settings(BaseSettings):
     database_name: str
     database_username: str
 
+    # Database pool (每个进程一个连接池)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30  # 等待空闲连接的最长时间(秒)
+    db_pool_recycle: int = 1800  # 连接使用超过该时长(秒)后重建，避免使用已被代理断开的连接
+    db_pool_pre_ping: bool = True  # 取出连接时先检测是否可用
+    db_statement_timeout_ms: int = 0  # 单条SQL的超时时间，0表示不限制
+    db_async_enabled: bool = False  # 额外创建asyncpg异步引擎(需要安装asyncpg)
+
     # JWT
     secret_key: str
     algorithm: str
     access_token_expire_minutes: int
+    auth_user_cache_ttl: int = 5  # 令牌->用户缓存的有效期(秒)，0表示不缓存，也是其他进程看到用户修改的最大延迟
+    auth_user_cache_max_entries: int = 10000
+
+    # Passwords
+    password_bcrypt_rounds: int = 12  # bcrypt工作因子，修改后旧哈希在登录时重新计算
+    password_hash_workers: int = Field(default_factory=lambda: os.cpu_count() or 1)
 
     # openai
     openai_api_key: str
+    openai_api_url: str = "https://api.openai.com/v1/chat/completions"
+    openai_model: str = "gpt-3.5-turbo"
+    openai_prompt_token_budget: int = 1500  # 分析提示词的token上限(本地估算)
+    openai_max_completion_tokens: int = 1000
+    openai_connect_timeout: float = 5.0
+    openai_read_timeout: float = 60.0
+    openai_max_retries: int = 3  # 429/5xx/网络错误时的最多重试次数
+    openai_retry_backoff: float = 1.0  # 第一次重试前的等待时间(秒)，之后每次翻倍
+    openai_retry_max_delay: float = 30.0
+    openai_max_connections: int = 20  # 共享HTTP客户端的连接池大小
+    openai_max_concurrency: int = 8  # 每个进程同时进行的OpenAI请求数量
+
+    # OCR worker
+    ocr_worker_count: int = Field(default_factory=lambda: os.cpu_count() or 1)
+    ocr_job_lease_seconds: int = 600  # 任务租约时长，超时后可被其他worker重新领取
+    ocr_job_poll_interval: float = 2.0  # 队列为空时的轮询间隔(秒)
+    ocr_job_max_attempts: int = 3
+
+    # 消费分析任务
+    analysis_worker_count: int = 4  # 每个API进程中同时执行的分析任务数，0表示该进程不执行
+    analysis_job_lease_seconds: int = 300
+    analysis_job_poll_interval: float = 1.0
+    analysis_job_max_attempts: int = 2
+    analysis_job_retry_backoff: float = 30.0  # 失败后第一次重试前的等待时间(秒)，之后每次翻倍
+    analysis_job_retry_max_delay: float = 600.0
+
+    # OCR
+    ocr_timeout_seconds: int = 300  # 单次ocrmypdf/convert调用的超时时间
+    ocr_cache_max_bytes: int = 64 * 1024 * 1024  # 按内容哈希缓存OCR结果的内存上限
+    pdf_text_layer_min_chars: int = 50  # PDF自带文字层至少有这么多字符时跳过OCR
+
+    # Uploads
+    upload_max_bytes: int = 20 * 1024 * 1024  # 单个上传文件的大小上限
+    upload_batch_max_files: int = 50  # 批量上传一次最多的文件数
+
+    # Metrics
+    metrics_dir: Optional[str] = None  # 多进程(OCR worker)指标快照目录
 
     class Config:
         case_sensitive = False
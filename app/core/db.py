@@ -1,35 +1,113 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
-from app.core.config import settings
-
-# Add SSL parameters for production environments
 import os
+import time
 
-from sqlalchemy import create_engine, event
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
 from app.core.config import settings
-import os
+from app.utils.metrics import registry
 
 # SQLAlchemy database URL
 SQLALCHEMY_DATABASE_URL = (
     f"postgresql://{settings.database_username}:{settings.database_password}@"
     f"{settings.database_hostname}:{settings.database_port}/{settings.database_name}"
 )
+SQLALCHEMY_ASYNC_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace(
+    "postgresql://", "postgresql+asyncpg://", 1
+)
 
-# Create the SQLAlchemy engine with SSL for production
-if os.environ.get("ENVIRONMENT") == "production":
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL,
-        connect_args={
-            "sslmode": "require",
-        },
-    )
-else:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Add SSL parameters for production environments
+PRODUCTION = os.environ.get("ENVIRONMENT") == "production"
+
+pool_checkout_seconds = registry.histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a connection from the pool, including connecting",
+    ["engine"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+pool_checkout_timeouts = registry.counter(
+    "db_pool_checkout_timeouts_total",
+    "Pool checkouts that gave up after DB_POOL_TIMEOUT seconds",
+    ["engine"],
+)
+
+
+class _TimedCheckoutMixin:
+    """记录从连接池获取连接的等待时间"""
+
+    engine_label = "sync"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            pool_checkout_timeouts.inc(engine=self.engine_label)
+            raise
+        finally:
+            pool_checkout_seconds.observe(
+                time.perf_counter() - start, engine=self.engine_label
+            )
+
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    engine_label = "sync"
+
+
+class TimedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    engine_label = "async"
+
+
+# 每个进程各有一个连接池，总连接数最多为 进程数 * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+POOL_OPTIONS = dict(
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout,
+    pool_recycle=settings.db_pool_recycle,
+    pool_pre_ping=settings.db_pool_pre_ping,
+)
+
+connect_args = {}
+if PRODUCTION:
+    connect_args["sslmode"] = "require"
+if settings.db_statement_timeout_ms > 0:
+    connect_args["options"] = f"-c statement_timeout={settings.db_statement_timeout_ms}"
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    poolclass=TimedQueuePool,
+    connect_args=connect_args,
+    **POOL_OPTIONS,
+)
 # Create a sessionmaker
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 可选的异步引擎(asyncpg)，DB_ASYNC_ENABLED 为真时创建
+async_engine = None
+AsyncSessionLocal = None
+if settings.db_async_enabled:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_connect_args = {}
+    if PRODUCTION:
+        async_connect_args["ssl"] = "require"
+    if settings.db_statement_timeout_ms > 0:
+        async_connect_args["server_settings"] = {
+            "statement_timeout": str(settings.db_statement_timeout_ms)
+        }
+
+    async_engine = create_async_engine(
+        SQLALCHEMY_ASYNC_DATABASE_URL,
+        poolclass=TimedAsyncQueuePool,
+        connect_args=async_connect_args,
+        **POOL_OPTIONS,
+    )
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+
 
 # Dependency
 def get_db():
@@ -41,3 +119,14 @@ def get_db():
         raise e  # Re-raise the exception so FastAPI can handle it
     finally:
         db.close()
+
+
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        raise RuntimeError("Async database engine is disabled, set DB_ASYNC_ENABLED")
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception:
+            await db.rollback()
+            raise
@@ -0,0 +1,181 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import uuid
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from app.core.config import settings
+from app.crud.job_queue import (
+    claim_next_job,
+    complete_job,
+    extend_job_lease,
+    fail_expired_jobs,
+    fail_job,
+)
+from app.models.analysis_job import AnalysisJob
+
+
+def get_analysis_job(db: Session, job_id: uuid.UUID) -> Optional[AnalysisJob]:
+    return db.query(AnalysisJob).filter(AnalysisJob.id == job_id).first()
+
+
+OPEN_JOB_INDEX = "uq_analysis_job_user_id_open"
+
+
+def get_open_analysis_job(db: Session, user_id: uuid.UUID) -> Optional[AnalysisJob]:
+    """获取用户未完成(pending/running)的任务"""
+    return (
+        db.query(AnalysisJob)
+        .filter(
+            AnalysisJob.user_id == user_id,
+            AnalysisJob.status.in_([AnalysisJob.PENDING, AnalysisJob.RUNNING]),
+        )
+        .first()
+    )
+
+
+def _is_open_job_conflict(e: IntegrityError) -> bool:
+    diag = getattr(e.orig, "diag", None)
+    return getattr(diag, "constraint_name", None) == OPEN_JOB_INDEX
+
+
+def enqueue_analysis_job(
+    db: Session, user_id: uuid.UUID, force: bool = False
+) -> AnalysisJob:
+    """
+    为用户创建分析任务；若该用户已有未完成的任务则直接返回该任务，force 为真时
+    把还没开始的任务改为强制重新分析。每个用户最多一个未完成的任务由部分唯一索引
+    保证，并发请求中插入失败的一方返回另一方创建的任务。
+    """
+    while True:
+        existing_job = get_open_analysis_job(db, user_id)
+        if existing_job is not None:
+            if force and not existing_job.force:
+                db.query(AnalysisJob).filter(
+                    AnalysisJob.id == existing_job.id,
+                    AnalysisJob.status == AnalysisJob.PENDING,
+                ).update({AnalysisJob.force: True}, synchronize_session=False)
+                db.commit()
+                db.refresh(existing_job)
+            return existing_job
+
+        db_job = AnalysisJob(
+            user_id=user_id,
+            force=force,
+            status=AnalysisJob.PENDING,
+            max_attempts=settings.analysis_job_max_attempts,
+        )
+        db.add(db_job)
+        try:
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            if not _is_open_job_conflict(e):
+                raise
+            continue
+        db.refresh(db_job)
+        return db_job
+
+
+def _retry_delay(attempts: int) -> float:
+    # 指数退避，避免限流等临时错误时立即重试
+    delay = settings.analysis_job_retry_backoff * (2 ** max(attempts - 1, 0))
+    return min(delay, settings.analysis_job_retry_max_delay)
+
+
+def claim_next_analysis_job(
+    db: Session, worker_id: str, lease_seconds: int
+) -> Optional[AnalysisJob]:
+    """
+    领取下一个待处理任务(见 app.crud.job_queue)；失败后等待重试的任务
+    到 available_at 之后才会被领取
+    """
+    fail_expired_jobs(db, AnalysisJob)
+    job = claim_next_job(
+        db,
+        AnalysisJob,
+        worker_id,
+        lease_seconds,
+        or_(
+            AnalysisJob.available_at.is_(None),
+            AnalysisJob.available_at <= func.now(),
+        ),
+        commit=False,
+    )
+    if job is not None:
+        job.started_at = datetime.now(timezone.utc)
+    db.commit()
+    if job is not None:
+        db.refresh(job)
+    return job
+
+
+def extend_analysis_job_lease(
+    db: Session, job_id: uuid.UUID, worker_id: str, lease_seconds: int
+) -> bool:
+    """续租；任务已不属于该worker时返回False"""
+    return extend_job_lease(db, AnalysisJob, job_id, worker_id, lease_seconds)
+
+
+def complete_analysis_job(
+    db: Session,
+    job_id: uuid.UUID,
+    worker_id: str,
+    analysis_id: uuid.UUID,
+    from_cache: bool = False,
+) -> bool:
+    """记录任务的分析结果并标记完成；只有持有租约的worker才能完成任务"""
+    return complete_job(
+        db,
+        AnalysisJob,
+        job_id,
+        worker_id,
+        analysis_id=analysis_id,
+        from_cache=from_cache,
+    )
+
+
+def fail_analysis_job(
+    db: Session, job_id: uuid.UUID, worker_id: str, error: str, retry: bool = True
+) -> Optional[AnalysisJob]:
+    """
+    记录任务失败；retry 为真且还有重试次数时放回队列，按指数退避延迟到
+    available_at 之后再执行，否则标记为failed
+    """
+    job = fail_job(
+        db, AnalysisJob, job_id, worker_id, error, retry=retry, commit=False
+    )
+    if job is not None and job.status == AnalysisJob.PENDING:
+        job.available_at = datetime.now(timezone.utc) + timedelta(
+            seconds=_retry_delay(job.attempts)
+        )
+    db.commit()
+    if job is not None:
+        db.refresh(job)
+    return job
+
+
+def release_analysis_job(db: Session, job_id: uuid.UUID, worker_id: str) -> bool:
+    """worker停止时把正在执行的任务放回队列，不计入尝试次数"""
+    updated = (
+        db.query(AnalysisJob)
+        .filter(
+            AnalysisJob.id == job_id,
+            AnalysisJob.status == AnalysisJob.RUNNING,
+            AnalysisJob.locked_by == worker_id,
+        )
+        .update(
+            {
+                AnalysisJob.status: AnalysisJob.PENDING,
+                AnalysisJob.attempts: AnalysisJob.attempts - 1,
+                AnalysisJob.locked_by: None,
+                AnalysisJob.locked_until: None,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return updated == 1
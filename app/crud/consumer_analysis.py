@@ -5,6 +5,7 @@ from sqlalchemy import desc
 
 from app.models.consumer_analysis import ConsumerAnalysis
 from app.schemas.consumer_analysis import ConsumerAnalysisCreate
+from app.utils.pagination import paginate
 
 
 def create_consumer_analysis(
@@ -15,6 +16,7 @@ def create_consumer_analysis(
         user_id=analysis_in.user_id,
         analysis_data=analysis_in.analysis_data,
         raw_response=analysis_in.raw_response,
+        data_fingerprint=analysis_in.data_fingerprint,
     )
     db.add(db_analysis)
     db.commit()
@@ -34,18 +36,28 @@ def get_latest_user_analysis(
     )
 
 
+def get_cached_analysis(
+    db: Session, user_id: uuid.UUID, data_fingerprint: str
+) -> Optional[ConsumerAnalysis]:
+    """用户最新的分析记录基于相同的发票数据时返回该记录，否则返回None"""
+    latest = get_latest_user_analysis(db, user_id)
+    if latest is not None and latest.data_fingerprint == data_fingerprint:
+        return latest
+    return None
+
+
 def get_user_analyses(
-    db: Session, user_id: uuid.UUID, skip: int = 0, limit: int = 10
+    db: Session,
+    user_id: uuid.UUID,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
 ) -> List[ConsumerAnalysis]:
     """获取用户的所有分析记录"""
-    return (
-        db.query(ConsumerAnalysis)
-        .filter(ConsumerAnalysis.user_id == user_id)
-        .order_by(desc(ConsumerAnalysis.created_at))
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+    query = db.query(ConsumerAnalysis).filter(ConsumerAnalysis.user_id == user_id)
+    return paginate(
+        query, ConsumerAnalysis, skip=skip, limit=limit, cursor=cursor
+    ).all()
 
 
 def get_analysis(db: Session, analysis_id: uuid.UUID) -> Optional[ConsumerAnalysis]:
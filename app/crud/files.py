@@ -1,9 +1,16 @@
-from typing import List, Optional
+from contextlib import suppress
+from typing import Dict, Iterable, List, Optional, Sequence
+import os
 import uuid
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
+from app.crud.ocr_job import enqueue_ocr_jobs
+from app.crud.spending_summary import apply_invoice_to_summary
 from app.models.files import File
 from app.schemas.files import FileCreate, FileUpdate
+from app.utils.pagination import paginate
+from app.utils.upload_storage import StoredUpload, place_upload, discard_upload
 
 
 def get_file(db: Session, file_id: uuid.UUID) -> Optional[File]:
@@ -11,11 +18,14 @@ def get_file(db: Session, file_id: uuid.UUID) -> Optional[File]:
 
 
 def get_user_files(
-    db: Session, user_id: uuid.UUID, skip: int = 0, limit: int = 100
+    db: Session,
+    user_id: uuid.UUID,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
 ) -> List[File]:
-    return (
-        db.query(File).filter(File.user_id == user_id).offset(skip).limit(limit).all()
-    )
+    query = db.query(File).filter(File.user_id == user_id)
+    return paginate(query, File, skip=skip, limit=limit, cursor=cursor).all()
 
 
 def create_file(db: Session, file_in: FileCreate) -> File:
@@ -25,9 +35,11 @@ def create_file(db: Session, file_in: FileCreate) -> File:
         file_path=file_in.file_path,
         file_size=file_in.file_size,
         file_type=file_in.file_type,
+        content_hash=file_in.content_hash,
         user_id=file_in.user_id,
         is_active=file_in.is_active,
         is_processed=file_in.is_processed,
+        processing_timings=file_in.processing_timings,
     )
     db.add(db_file)
     db.commit()
@@ -35,6 +47,56 @@ def create_file(db: Session, file_in: FileCreate) -> File:
     return db_file
 
 
+def create_files(
+    db: Session, files_in: Sequence[FileCreate], commit: bool = True
+) -> List[File]:
+    """批量创建文件记录，插入合并为一条多行INSERT"""
+    db_files = [
+        File(id=uuid.uuid4(), **file_in.model_dump()) for file_in in files_in
+    ]
+    db.add_all(db_files)
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+    return db_files
+
+
+def create_files_with_ocr_jobs(
+    db: Session, files_in: Sequence[FileCreate], uploads: Sequence[StoredUpload] = ()
+) -> List[File]:
+    """
+    在一个事务中创建多个文件记录并为它们加入OCR任务队列。
+
+    uploads 是这些记录对应的、还在临时路径上的上传文件：在同一事务中对它们的内容哈希
+    加锁后移动到最终路径，与删除相同内容的文件互斥。事务失败时删除本次新放置的文件，
+    此时仍持有锁，不会有其他记录引用它们。
+    """
+    placed = []
+    try:
+        lock_content_hashes(db, [upload.content_hash for upload in uploads])
+        for upload in uploads:
+            if place_upload(upload):
+                placed.append(upload.file_path)
+        db_files = create_files(db, files_in, commit=False)
+        file_ids = [db_file.id for db_file in db_files]
+        enqueue_ocr_jobs(db, file_ids, commit=False)
+        db.commit()
+    except BaseException:
+        for file_path in placed:
+            with suppress(OSError):
+                os.remove(file_path)
+        db.rollback()
+        raise
+    finally:
+        for upload in uploads:
+            discard_upload(upload)
+
+    # 提交后对象已过期，用一次查询重新加载而不是逐个刷新
+    loaded = {f.id: f for f in db.query(File).filter(File.id.in_(file_ids))}
+    return [loaded[file_id] for file_id in file_ids]
+
+
 def update_file(db: Session, file_id: uuid.UUID, file_in: FileUpdate) -> Optional[File]:
 
     db_file = get_file(db, file_id)
@@ -52,11 +114,54 @@ def update_file(db: Session, file_id: uuid.UUID, file_in: FileUpdate) -> Optiona
     return db_file
 
 
-def delete_file(db: Session, file_id: uuid.UUID) -> Optional[File]:
+def save_processing_timings(
+    db: Session, file_id: uuid.UUID, timings: Dict[str, float]
+) -> None:
+    """保存文件各处理阶段的耗时"""
+    db.query(File).filter(File.id == file_id).update(
+        {File.processing_timings: timings}, synchronize_session=False
+    )
+    db.commit()
+
+
+def is_file_path_shared(db: Session, file_path: str, file_id: uuid.UUID) -> bool:
+    """相同内容的上传共用同一个磁盘文件，检查是否还有其他记录引用该路径"""
+    return (
+        db.query(File.id)
+        .filter(File.file_path == file_path, File.id != file_id)
+        .first()
+        is not None
+    )
+
+
+# pg_advisory_xact_lock(int, int) 的第一个键，与单键形式的用户汇总锁互不冲突
+CONTENT_HASH_LOCK_NAMESPACE = 1
+
+
+def lock_content_hashes(db: Session, content_hashes: Iterable[Optional[str]]):
+    """
+    相同内容的上传共用同一个磁盘文件。放置上传文件、删除文件时对内容哈希加事务级
+    advisory锁(按固定顺序，避免死锁)，事务提交或回滚时释放
+    """
+    for content_hash in sorted({h for h in content_hashes if h}):
+        key = int.from_bytes(bytes.fromhex(content_hash[:8]), "big", signed=True)
+        db.execute(select(func.pg_advisory_xact_lock(CONTENT_HASH_LOCK_NAMESPACE, key)))
+
+
+def delete_file(db: Session, file_id: uuid.UUID, commit: bool = True) -> Optional[File]:
     db_file = get_file(db, file_id)
     if not db_file:
         return None
 
+    # 发票随文件一起删除，先将其从用户消费汇总中移出
+    if db_file.invoice is not None:
+        apply_invoice_to_summary(
+            db, db_file.invoice, db_file.invoice.items, sign=-1
+        )
+
     db.delete(db_file)
-    db.commit()
+    if commit:
+        db.commit()
+    else:
+        db.flush()
     return db_file
@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 
 from app.models.invitation import Invitation
 from app.schemas.invitation import InvitationCreate
+from app.utils.pagination import paginate
 
 
 def generate_invitation_code(length: int = 10) -> str:
@@ -51,7 +52,8 @@ def mark_invitation_as_used(
 
 
 def get_all_invitations(
-    db: Session, skip: int = 0, limit: int = 100
+    db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
 ) -> List[Invitation]:
-    """Get all invitations"""
-    return db.query(Invitation).offset(skip).limit(limit).all()
+    """Get all invitations, newest first"""
+    query = db.query(Invitation)
+    return paginate(query, Invitation, skip=skip, limit=limit, cursor=cursor).all()
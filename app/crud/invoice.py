@@ -1,9 +1,19 @@
-from typing import List, Optional
+from typing import List, Optional, Sequence
+import hashlib
 import uuid
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
+from app.crud.invoice_item import create_invoice_items
+from app.crud.spending_summary import apply_invoice_to_summary
+from app.models.files import File
 from app.models.invoice import Invoice
 from app.schemas.invoice import InvoiceCreate, InvoiceUpdate
+from app.schemas.invoice_item import InvoiceItemBase
+from app.utils.pagination import paginate
+
+# 影响用户消费汇总的发票字段
+SUMMARY_FIELDS = {"total", "brand", "date"}
 
 
 def get_invoice(db: Session, invoice_id: uuid.UUID) -> Optional[Invoice]:
@@ -16,22 +26,55 @@ def get_invoice_by_file(db: Session, file_id: uuid.UUID) -> Optional[Invoice]:
     return db.query(Invoice).filter(Invoice.file_id == file_id).first()
 
 
-def get_user_invoices(
-    db: Session, user_id: uuid.UUID, skip: int = 0, limit: int = 100
-) -> List[Invoice]:
-    """获取用户的所有发票"""
+def get_processed_invoice_by_content_hash(
+    db: Session, content_hash: str
+) -> Optional[Invoice]:
+    """获取内容相同的文件已处理过的发票"""
     return (
         db.query(Invoice)
+        .join(File, Invoice.file_id == File.id)
+        .filter(File.content_hash == content_hash, Invoice.is_processed.is_(True))
+        .order_by(Invoice.updated_at.desc())
+        .first()
+    )
+
+
+def get_user_invoices(
+    db: Session,
+    user_id: uuid.UUID,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> List[Invoice]:
+    """获取用户的所有发票，按上传时间倒序"""
+    query = db.query(Invoice).filter(Invoice.user_id == user_id)
+    return paginate(query, Invoice, skip=skip, limit=limit, cursor=cursor).all()
+
+
+def get_invoice_fingerprint(db: Session, user_id: uuid.UUID) -> str:
+    """
+    用户发票数据的指纹，由发票数量、最后更新时间和总金额计算，
+    发票被新增、修改或删除后都会变化
+    """
+    count, last_updated, total = (
+        db.query(
+            func.count(Invoice.id),
+            func.max(Invoice.updated_at),
+            func.sum(Invoice.total),
+        )
         .filter(Invoice.user_id == user_id)
-        .offset(skip)
-        .limit(limit)
-        .all()
+        .one()
     )
+    raw = f"{count}|{last_updated.isoformat() if last_updated else ''}|{total or 0}"
+    return hashlib.sha256(raw.encode()).hexdigest()
 
 
-def create_invoice(db: Session, invoice_in: InvoiceCreate) -> Invoice:
-    """创建新发票"""
+def create_invoice(
+    db: Session, invoice_in: InvoiceCreate, commit: bool = True
+) -> Invoice:
+    """创建新发票，commit=False 时只flush，由调用方提交事务"""
     db_invoice = Invoice(
+        id=uuid.uuid4(),
         file_id=invoice_in.file_id,
         user_id=invoice_in.user_id,
         markt_name=invoice_in.markt_name,
@@ -51,11 +94,36 @@ def create_invoice(db: Session, invoice_in: InvoiceCreate) -> Invoice:
         is_processed=invoice_in.is_processed,
     )
     db.add(db_invoice)
-    db.commit()
-    db.refresh(db_invoice)
+    if commit:
+        db.commit()
+        db.refresh(db_invoice)
+    else:
+        db.flush()
     return db_invoice
 
 
+def create_invoice_with_items(
+    db: Session, invoice_in: InvoiceCreate, items_in: Sequence[InvoiceItemBase]
+) -> uuid.UUID:
+    """
+    在一个事务中创建发票、批量插入全部商品项目、更新用户消费汇总并将文件标记为已处理，
+    提交次数与商品数量无关。返回新发票的ID。
+    """
+    try:
+        db_invoice = create_invoice(db, invoice_in, commit=False)
+        invoice_id = db_invoice.id
+        create_invoice_items(db, invoice_id, items_in, commit=False)
+        apply_invoice_to_summary(db, db_invoice, items_in)
+        db.query(File).filter(File.id == invoice_in.file_id).update(
+            {File.is_processed: True}, synchronize_session=False
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return invoice_id
+
+
 def update_invoice(
     db: Session, invoice_id: uuid.UUID, invoice_in: InvoiceUpdate
 ) -> Optional[Invoice]:
@@ -65,10 +133,19 @@ def update_invoice(
         return None
 
     update_data = invoice_in.model_dump(exclude_unset=True)
+
+    # 汇总相关的字段变化时，先按旧值移出汇总，再按新值计入
+    summary_changed = bool(SUMMARY_FIELDS & update_data.keys())
+    if summary_changed:
+        apply_invoice_to_summary(db, db_invoice, db_invoice.items, sign=-1)
+
     for field, value in update_data.items():
         setattr(db_invoice, field, value)
 
     db.add(db_invoice)
+    if summary_changed:
+        db.flush()
+        apply_invoice_to_summary(db, db_invoice, db_invoice.items)
     db.commit()
     db.refresh(db_invoice)
     return db_invoice
@@ -80,6 +157,7 @@ def delete_invoice(db: Session, invoice_id: uuid.UUID) -> Optional[Invoice]:
     if not db_invoice:
         return None
 
+    apply_invoice_to_summary(db, db_invoice, db_invoice.items, sign=-1)
     db.delete(db_invoice)
     db.commit()
     return db_invoice
@@ -1,7 +1,11 @@
+import uuid
+from typing import Sequence
+
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from app.models.invoice_item import InvoiceItem
-from app.schemas.invoice_item import InvoiceItemCreate
+from app.schemas.invoice_item import InvoiceItemBase, InvoiceItemCreate
 
 
 def create_invoice_item(db: Session, item_in: InvoiceItemCreate):
@@ -17,3 +21,32 @@ def create_invoice_item(db: Session, item_in: InvoiceItemCreate):
     db.commit()
     db.refresh(db_item)
     return db_item
+
+
+def create_invoice_items(
+    db: Session,
+    invoice_id: uuid.UUID,
+    items_in: Sequence[InvoiceItemBase],
+    commit: bool = True,
+) -> int:
+    """用一条多行INSERT批量创建发票项目，返回插入的数量"""
+    if not items_in:
+        return 0
+
+    db.execute(
+        insert(InvoiceItem),
+        [
+            {
+                "id": uuid.uuid4(),
+                "name": item_in.name,
+                "quantity": item_in.quantity,
+                "unit_price": item_in.unit_price,
+                "total_price": item_in.total_price,
+                "invoice_id": invoice_id,
+            }
+            for item_in in items_in
+        ],
+    )
+    if commit:
+        db.commit()
+    return len(items_in)
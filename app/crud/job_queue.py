@@ -0,0 +1,167 @@
+"""
+数据库任务队列(ocr_job、analysis_job)的公共操作
+
+任务表都有 status / attempts / max_attempts / last_error / locked_by / locked_until /
+finished_at 列以及 PENDING / RUNNING / DONE / FAILED 状态常量。worker 用
+SELECT ... FOR UPDATE SKIP LOCKED 领取任务并持有租约(locked_until)，处理期间续租；
+租约过期(worker崩溃)的running任务会被重新领取，直到超过最大尝试次数。
+各队列特有的部分(入队、失败后的处理等)在 app.crud.ocr_job 和 app.crud.analysis_job 中。
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import List
+import uuid
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+
+def fail_expired_jobs(db: Session, model) -> List:
+    """把租约过期且已用完重试次数的任务标记为失败，返回这些任务，不提交"""
+    return db.scalars(
+        update(model)
+        .where(
+            model.status == model.RUNNING,
+            model.locked_until < func.now(),
+            model.attempts >= model.max_attempts,
+        )
+        .values(
+            status=model.FAILED,
+            last_error="lease expired",
+            locked_by=None,
+            locked_until=None,
+            finished_at=func.now(),
+        )
+        .returning(model),
+        execution_options={"synchronize_session": False},
+    ).all()
+
+
+def claim_next_job(
+    db: Session,
+    model,
+    worker_id: str,
+    lease_seconds: int,
+    *pending_criteria,
+    commit: bool = True,
+):
+    """
+    领取下一个任务：pending的任务(还需满足 pending_criteria)或租约过期的running任务，
+    按创建时间排序。多个worker并发领取时每个任务只会被一个worker拿到，没有任务时返回None。
+    """
+    job = (
+        db.query(model)
+        .filter(
+            or_(
+                and_(model.status == model.PENDING, *pending_criteria),
+                and_(
+                    model.status == model.RUNNING,
+                    model.locked_until < func.now(),
+                ),
+            ),
+            model.attempts < model.max_attempts,
+        )
+        .order_by(model.created_at)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if job is not None:
+        job.status = model.RUNNING
+        job.attempts += 1
+        job.locked_by = worker_id
+        job.locked_until = datetime.now(timezone.utc) + timedelta(seconds=lease_seconds)
+        db.add(job)
+
+    if commit:
+        db.commit()
+        if job is not None:
+            db.refresh(job)
+    return job
+
+
+def extend_job_lease(
+    db: Session, model, job_id: uuid.UUID, worker_id: str, lease_seconds: int
+) -> bool:
+    """续租；任务已不属于该worker时返回False"""
+    updated = (
+        db.query(model)
+        .filter(
+            model.id == job_id,
+            model.status == model.RUNNING,
+            model.locked_by == worker_id,
+        )
+        .update(
+            {
+                model.locked_until: datetime.now(timezone.utc)
+                + timedelta(seconds=lease_seconds)
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return updated == 1
+
+
+def complete_job(
+    db: Session, model, job_id: uuid.UUID, worker_id: str, **values
+) -> bool:
+    """标记任务完成并写入 values；只有持有租约的worker才能完成任务"""
+    updated = (
+        db.query(model)
+        .filter(
+            model.id == job_id,
+            model.status == model.RUNNING,
+            model.locked_by == worker_id,
+        )
+        .update(
+            {
+                model.status: model.DONE,
+                model.locked_by: None,
+                model.locked_until: None,
+                model.last_error: None,
+                model.finished_at: func.now(),
+                **{getattr(model, key): value for key, value in values.items()},
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return updated == 1
+
+
+def fail_job(
+    db: Session,
+    model,
+    job_id: uuid.UUID,
+    worker_id: str,
+    error: str,
+    retry: bool = True,
+    commit: bool = True,
+):
+    """
+    记录任务失败；retry 为真且还有重试次数时放回队列(pending)，否则标记为failed。
+    任务已不属于该worker时返回None。
+    """
+    job = (
+        db.query(model)
+        .filter(model.id == job_id, model.locked_by == worker_id)
+        .with_for_update()
+        .first()
+    )
+    if job is not None:
+        job.last_error = error
+        job.locked_by = None
+        job.locked_until = None
+        if retry and job.attempts < job.max_attempts:
+            job.status = model.PENDING
+        else:
+            job.status = model.FAILED
+            job.finished_at = datetime.now(timezone.utc)
+        db.add(job)
+
+    if commit:
+        db.commit()
+        if job is not None:
+            db.refresh(job)
+    return job
@@ -0,0 +1,115 @@
+from typing import Optional, Sequence
+import uuid
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.job_queue import (
+    claim_next_job,
+    complete_job,
+    extend_job_lease,
+    fail_expired_jobs,
+    fail_job,
+)
+from app.models.files import File
+from app.models.ocr_job import OcrJob
+
+
+def get_ocr_job(db: Session, job_id: uuid.UUID) -> Optional[OcrJob]:
+    return db.query(OcrJob).filter(OcrJob.id == job_id).first()
+
+
+def enqueue_ocr_job(db: Session, file_id: uuid.UUID) -> OcrJob:
+    """为文件创建OCR任务；若该文件已有未完成的任务则直接返回该任务"""
+    existing_job = (
+        db.query(OcrJob)
+        .filter(
+            OcrJob.file_id == file_id,
+            OcrJob.status.in_([OcrJob.PENDING, OcrJob.RUNNING]),
+        )
+        .first()
+    )
+    if existing_job:
+        return existing_job
+
+    db_job = OcrJob(
+        file_id=file_id,
+        status=OcrJob.PENDING,
+        max_attempts=settings.ocr_job_max_attempts,
+    )
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+
+def enqueue_ocr_jobs(
+    db: Session, file_ids: Sequence[uuid.UUID], commit: bool = True
+) -> int:
+    """为多个文件批量创建OCR任务(已有未完成任务的文件跳过)，返回新建的任务数量"""
+    if not file_ids:
+        return 0
+
+    busy = {
+        file_id
+        for (file_id,) in db.query(OcrJob.file_id).filter(
+            OcrJob.file_id.in_(file_ids),
+            OcrJob.status.in_([OcrJob.PENDING, OcrJob.RUNNING]),
+        )
+    }
+    new_ids = [file_id for file_id in dict.fromkeys(file_ids) if file_id not in busy]
+    if new_ids:
+        db.execute(
+            insert(OcrJob),
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "file_id": file_id,
+                    "status": OcrJob.PENDING,
+                    "attempts": 0,
+                    "max_attempts": settings.ocr_job_max_attempts,
+                }
+                for file_id in new_ids
+            ],
+        )
+    if commit:
+        db.commit()
+    return len(new_ids)
+
+
+def claim_next_ocr_job(
+    db: Session, worker_id: str, lease_seconds: int
+) -> Optional[OcrJob]:
+    """
+    领取下一个待处理任务(见 app.crud.job_queue)。
+
+    租约过期且已用完重试次数的任务标记为失败，与worker中处理失败的任务一样，
+    文件也标记为已处理，不会一直停留在处理中。
+    """
+    expired_file_ids = [job.file_id for job in fail_expired_jobs(db, OcrJob)]
+    if expired_file_ids:
+        db.query(File).filter(File.id.in_(expired_file_ids)).update(
+            {File.is_processed: True}, synchronize_session=False
+        )
+
+    return claim_next_job(db, OcrJob, worker_id, lease_seconds)
+
+
+def extend_ocr_job_lease(
+    db: Session, job_id: uuid.UUID, worker_id: str, lease_seconds: int
+) -> bool:
+    """续租；任务已不属于该worker时返回False"""
+    return extend_job_lease(db, OcrJob, job_id, worker_id, lease_seconds)
+
+
+def complete_ocr_job(db: Session, job_id: uuid.UUID, worker_id: str) -> bool:
+    """标记任务完成；只有持有租约的worker才能完成任务"""
+    return complete_job(db, OcrJob, job_id, worker_id)
+
+
+def fail_ocr_job(
+    db: Session, job_id: uuid.UUID, worker_id: str, error: str
+) -> Optional[OcrJob]:
+    """记录任务失败；还有重试次数时放回队列，否则标记为failed"""
+    return fail_job(db, OcrJob, job_id, worker_id, error)
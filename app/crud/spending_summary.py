@@ -0,0 +1,229 @@
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import uuid
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.invoice import Invoice
+from app.models.invoice_item import InvoiceItem
+from app.models.spending_summary import UserItemStat, UserSpendingSummary
+
+UNKNOWN_BRAND = "unknown"
+
+
+def _lock_user_summary(db: Session, user_id: uuid.UUID):
+    # 事务级advisory锁，同一用户的汇总更新串行执行，事务结束时自动释放
+    key = int.from_bytes(user_id.bytes[:8], "big", signed=True)
+    db.execute(select(func.pg_advisory_xact_lock(key)))
+
+
+def _item_key(name: str) -> str:
+    return name.strip().upper()[:255]
+
+
+def _brand_key(invoice: Invoice) -> str:
+    return invoice.brand or UNKNOWN_BRAND
+
+
+def _month_key(invoice: Invoice) -> Optional[str]:
+    return invoice.date.strftime("%Y-%m") if invoice.date else None
+
+
+def _bump(bucket: Dict[str, Any], key: str, count: int, total: float):
+    entry = bucket.get(key) or {"count": 0, "total": 0.0}
+    count = entry["count"] + count
+    if count <= 0:
+        bucket.pop(key, None)
+    else:
+        bucket[key] = {"count": count, "total": round(entry["total"] + total, 2)}
+
+
+def _aggregate_items(items: Iterable[Any]) -> Dict[str, Tuple[int, float]]:
+    stats: Dict[str, List] = defaultdict(lambda: [0, 0.0])
+    for item in items:
+        stat = stats[_item_key(item.name)]
+        stat[0] += 1
+        stat[1] += item.total_price or 0.0
+    return {name: (count, total) for name, (count, total) in stats.items()}
+
+
+def _upsert_item_stats(
+    db: Session, user_id: uuid.UUID, stats: Dict[str, Tuple[int, float]], sign: int
+):
+    if not stats:
+        return
+
+    statement = insert(UserItemStat).values(
+        [
+            {
+                "user_id": user_id,
+                "name": name,
+                "purchase_count": sign * count,
+                "total_spent": sign * total,
+            }
+            for name, (count, total) in stats.items()
+        ]
+    )
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[UserItemStat.user_id, UserItemStat.name],
+            set_={
+                "purchase_count": UserItemStat.purchase_count
+                + statement.excluded.purchase_count,
+                "total_spent": UserItemStat.total_spent + statement.excluded.total_spent,
+            },
+        )
+    )
+    if sign < 0:
+        db.query(UserItemStat).filter(
+            UserItemStat.user_id == user_id, UserItemStat.purchase_count <= 0
+        ).delete(synchronize_session=False)
+
+
+def _get_locked_summary(
+    db: Session, user_id: uuid.UUID
+) -> Optional[UserSpendingSummary]:
+    _lock_user_summary(db, user_id)
+    return (
+        db.query(UserSpendingSummary)
+        .filter(UserSpendingSummary.user_id == user_id)
+        .populate_existing()
+        .first()
+    )
+
+
+def apply_invoice_to_summary(
+    db: Session, invoice: Invoice, items: Iterable[Any], sign: int = 1
+):
+    """
+    在调用方的事务中把一张发票计入(sign=1)或移出(sign=-1)用户的消费汇总，不提交。
+
+    items 为该发票的商品(需要 name 和 total_price 属性)。用户还没有汇总时不做增量：
+    计入时直接按全部历史重建(当前事务中已写入的发票也会被计入)，移出时留给下次读取时重建。
+    """
+    summary = _get_locked_summary(db, invoice.user_id)
+    if summary is None:
+        if sign > 0:
+            rebuild_spending_summary(db, invoice.user_id, lock=False)
+        return
+
+    item_stats = _aggregate_items(items)
+    item_count = sum(count for count, _ in item_stats.values())
+    total = invoice.total or 0.0
+
+    summary.invoice_count += sign
+    summary.item_count += sign * item_count
+    summary.total_spent = round(summary.total_spent + sign * total, 2)
+
+    # JSON列需要赋值新对象才会被标记为已修改
+    by_brand = dict(summary.by_brand or {})
+    _bump(by_brand, _brand_key(invoice), sign, sign * total)
+    summary.by_brand = by_brand
+
+    month = _month_key(invoice)
+    if month:
+        by_month = dict(summary.by_month or {})
+        _bump(by_month, month, sign, sign * total)
+        summary.by_month = by_month
+
+    db.add(summary)
+    db.flush()
+    _upsert_item_stats(db, invoice.user_id, item_stats, sign)
+
+
+def rebuild_spending_summary(
+    db: Session, user_id: uuid.UUID, lock: bool = True
+) -> UserSpendingSummary:
+    """根据用户的全部发票重建消费汇总，不提交"""
+    if lock:
+        _lock_user_summary(db, user_id)
+
+    db.query(UserItemStat).filter(UserItemStat.user_id == user_id).delete(
+        synchronize_session=False
+    )
+
+    summary = (
+        db.query(UserSpendingSummary)
+        .filter(UserSpendingSummary.user_id == user_id)
+        .populate_existing()
+        .first()
+    ) or UserSpendingSummary(user_id=user_id)
+
+    invoices = (
+        db.query(Invoice.brand, Invoice.date, Invoice.total)
+        .filter(Invoice.user_id == user_id)
+        .all()
+    )
+    by_brand: Dict[str, Any] = {}
+    by_month: Dict[str, Any] = {}
+    for invoice in invoices:
+        total = invoice.total or 0.0
+        _bump(by_brand, _brand_key(invoice), 1, total)
+        month = _month_key(invoice)
+        if month:
+            _bump(by_month, month, 1, total)
+
+    items = (
+        db.query(InvoiceItem.name, InvoiceItem.total_price)
+        .join(Invoice, InvoiceItem.invoice_id == Invoice.id)
+        .filter(Invoice.user_id == user_id)
+        .yield_per(1000)
+    )
+    item_stats = _aggregate_items(items)
+
+    summary.invoice_count = len(invoices)
+    summary.item_count = sum(count for count, _ in item_stats.values())
+    summary.total_spent = round(sum(i.total or 0.0 for i in invoices), 2)
+    summary.by_brand = by_brand
+    summary.by_month = by_month
+    db.add(summary)
+    db.flush()
+
+    _upsert_item_stats(db, user_id, item_stats, 1)
+    return summary
+
+
+def get_spending_summary(db: Session, user_id: uuid.UUID) -> UserSpendingSummary:
+    """获取用户的消费汇总，不存在时(汇总表创建之前的历史数据)重建并提交"""
+    summary = (
+        db.query(UserSpendingSummary)
+        .filter(UserSpendingSummary.user_id == user_id)
+        .first()
+    )
+    if summary is not None:
+        return summary
+
+    try:
+        summary = _get_locked_summary(db, user_id)
+        if summary is None:
+            summary = rebuild_spending_summary(db, user_id, lock=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return summary
+
+
+def get_top_items(
+    db: Session, user_id: uuid.UUID, limit: int = 10
+) -> List[UserItemStat]:
+    """获取用户最常购买的商品"""
+    return (
+        db.query(UserItemStat)
+        .filter(UserItemStat.user_id == user_id)
+        .order_by(UserItemStat.purchase_count.desc(), UserItemStat.name)
+        .limit(limit)
+        .all()
+    )
+
+
+def get_item_stats(db: Session, user_id: uuid.UUID) -> List[Tuple[str, int, float]]:
+    """获取用户全部商品的 (商品名, 购买次数, 金额)"""
+    return [
+        tuple(row)
+        for row in db.query(
+            UserItemStat.name, UserItemStat.purchase_count, UserItemStat.total_spent
+        ).filter(UserItemStat.user_id == user_id)
+    ]
@@ -7,6 +7,8 @@ from app.models.users import Users
 from app.schemas.user import UserCreate, UserUpdate
 from app.utils.password import get_password_hash
 from app.crud.invitation import get_invitation_by_code, mark_invitation_as_used
+from app.utils.pagination import paginate
+from app.utils.user_cache import invalidate_user
 
 
 def get_user(db: Session, user_id: uuid.UUID) -> Optional[Users]:
@@ -23,9 +25,11 @@ def get_user_by_username(db: Session, username: str) -> Optional[Users]:
     return db.query(Users).filter(Users.username == username).first()
 
 
-def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[Users]:
+def get_users(
+    db: Session, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+) -> List[Users]:
 
-    return db.query(Users).offset(skip).limit(limit).all()
+    return paginate(db.query(Users), Users, skip=skip, limit=limit, cursor=cursor).all()
 
 
 def create_user(db: Session, user_in: UserCreate) -> Users:
@@ -80,6 +84,7 @@ def update_user(
     user = get_user(db, user_id)
     if not user:
         raise ValueError("User not found")
+    old_username = user.username
 
     if isinstance(user_in, dict):
         update_data = user_in
@@ -98,6 +103,8 @@ def update_user(
     db.add(user)
     db.commit()
     db.refresh(user)
+    invalidate_user(old_username)
+    invalidate_user(user.username)
     return user
 
 
@@ -109,6 +116,7 @@ def delete_user(db: Session, user_id: uuid.UUID) -> Users:
 
     db.delete(user)
     db.commit()
+    invalidate_user(user.username)
     return user
 
 
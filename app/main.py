@@ -1,12 +1,40 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from app.core.config import settings
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth, registration, user, files, ai_analysis, invitation, admin
+from app.utils.pagination import NEXT_CURSOR_HEADER
+from app.routers import (
+    auth,
+    registration,
+    user,
+    files,
+    ai_analysis,
+    invitation,
+    admin,
+    metrics,
+)
+from app.utils.analysis_jobs import analysis_workers
+from app.utils.chatgpt_client import close_http_client, open_http_client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # OpenAI请求共用一个HTTP客户端，连接在请求之间复用
+    await open_http_client()
+    # 执行排队的消费分析任务，同时进行的OpenAI调用不超过worker数量
+    analysis_workers.start(settings.analysis_worker_count)
+    try:
+        yield
+    finally:
+        await analysis_workers.stop()
+        await close_http_client()
 
 
 app = FastAPI(
     title="Intelligence Spend API",
     version=settings.api_version,
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -16,6 +44,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=settings.cors_methods_list,
     allow_headers=settings.cors_headers_list,
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 
@@ -27,3 +56,5 @@ app.include_router(ai_analysis.router, prefix=settings.api_prefix)
 app.include_router(invitation.router, prefix=settings.api_prefix)
 
 app.include_router(admin.router, prefix=settings.api_prefix)
+
+app.include_router(metrics.router)
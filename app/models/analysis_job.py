@@ -0,0 +1,67 @@
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.sql import func
+import uuid
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+
+from app.models.base import Base
+
+
+class AnalysisJob(Base):
+    """
+    消费分析任务队列 - 由API进程中的分析worker领取(租约)并调用OpenAI
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True)
+
+    user_id = Column(
+        UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    # 为真时不复用已有的分析结果
+    force = Column(Boolean, default=False, nullable=False)
+
+    # 任务状态: pending / running / done / failed
+    status = Column(String(20), default=PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=2, nullable=False)
+    last_error = Column(Text, nullable=True)
+    # 失败后放回队列的任务在这个时间之前不会被领取(退避)
+    available_at = Column(DateTime(timezone=True), nullable=True)
+
+    # 租约: 领取任务的worker及租约到期时间
+    locked_by = Column(String(100), nullable=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+
+    # 任务完成后的分析结果，from_cache 表示复用了发票数据未变化时的已有结果
+    analysis_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("consumer_analysis.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+    analysis = relationship("ConsumerAnalysis")
+    from_cache = Column(Boolean, default=False, nullable=False)
+
+    # 时间戳
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_analysis_job_status_created_at", "status", "created_at"),
+        Index("ix_analysis_job_user_id", "user_id"),
+        # 每个用户最多一个未完成的任务，并发创建时只有一个能插入
+        Index(
+            "uq_analysis_job_user_id_open",
+            "user_id",
+            unique=True,
+            postgresql_where=status.in_([PENDING, RUNNING]),
+        ),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, String, Text, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, DateTime, String, Text, ForeignKey, JSON, Boolean, Index
 from sqlalchemy.sql import func
 import uuid
 from sqlalchemy.dialects.postgresql import UUID
@@ -21,6 +21,15 @@ class ConsumerAnalysis(Base):
     # 分析结果
     analysis_data = Column(JSON, nullable=False)  # ChatGPT分析的结构化结果
     raw_response = Column(Text, nullable=True)  # ChatGPT的原始响应
+    # 分析时用户发票数据的指纹，数据没有变化时直接复用这次的结果
+    data_fingerprint = Column(String(64), nullable=True)
 
     # 时间戳
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+    # 获取用户最新的分析记录
+    __table_args__ = (
+        Index("ix_consumer_analysis_user_id_created_at", user_id, created_at.desc()),
+    )
@@ -1,7 +1,7 @@
-from sqlalchemy import Boolean, Column, DateTime, Integer, String, Text, ForeignKey
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, String, Text, ForeignKey
 from sqlalchemy.sql import func
 import uuid
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import relationship
 
 from app.models.base import Base
@@ -15,17 +15,26 @@ class File(Base):
     file_path = Column(String(512), nullable=False)
     file_size = Column(Integer, nullable=False)  # 单位:字节
     file_type = Column(String(100), nullable=False)  # MIME类型
+    content_hash = Column(String(64), nullable=True, index=True)  # 文件内容SHA-256
 
     is_active = Column(Boolean, default=True, nullable=False)
     is_processed = Column(Boolean, default=False, nullable=False)
+    processing_timings = Column(JSONB, nullable=True)  # 各处理阶段耗时(秒)
 
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     user = relationship("Users", back_populates="files")
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
     updated_at = Column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
     invoice = relationship(
         "Invoice", back_populates="file", uselist=False, cascade="all, delete-orphan"
     )
+    ocr_jobs = relationship(
+        "OcrJob", back_populates="file", cascade="all, delete-orphan"
+    )
+
+    __table_args__ = (Index("ix_file_user_id_created_at", user_id, created_at.desc()),)
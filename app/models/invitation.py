@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, DateTime, Integer, String
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, String
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -13,7 +13,13 @@ class Invitation(Base):
     code = Column(String, unique=True, index=True, nullable=False)
     email = Column(String, nullable=True)  # Optional: pre-assign to specific email
     is_used = Column(Boolean, default=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
     used_at = Column(DateTime(timezone=True), nullable=True)
 
     used_by = relationship("Users", uselist=False, back_populates="invitation")
+
+    __table_args__ = (
+        Index("ix_invitations_created_at_id", created_at.desc(), id.desc()),
+    )
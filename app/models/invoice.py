@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, DateTime, String, Text, ForeignKey, Float
+from sqlalchemy import Boolean, Column, DateTime, String, Text, ForeignKey, Float, Index
 from sqlalchemy.sql import func
 import uuid
 from sqlalchemy.dialects.postgresql import UUID
@@ -37,7 +37,9 @@ class Invoice(Base):
     is_processed = Column(Boolean, default=False, nullable=False)
 
     # 关系
-    file_id = Column(UUID(as_uuid=True), ForeignKey("file.id"), nullable=False)
+    file_id = Column(
+        UUID(as_uuid=True), ForeignKey("file.id"), nullable=False, unique=True, index=True
+    )
     file = relationship("File", back_populates="invoice")
 
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
@@ -49,7 +51,15 @@ class Invoice(Base):
     )
 
     # 时间戳
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
     updated_at = Column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
+
+    # 按用户查询发票并按日期倒序排列
+    __table_args__ = (
+        Index("ix_invoice_user_id_date", user_id, date.desc()),
+        Index("ix_invoice_user_id_created_at", user_id, created_at.desc()),
+    )
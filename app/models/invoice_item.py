@@ -15,5 +15,7 @@ class InvoiceItem(Base):
     unit_price = Column(Float, nullable=True)
     total_price = Column(Float, nullable=False)
 
-    invoice_id = Column(UUID(as_uuid=True), ForeignKey("invoice.id"), nullable=False)
+    invoice_id = Column(
+        UUID(as_uuid=True), ForeignKey("invoice.id"), nullable=False, index=True
+    )
     invoice = relationship("Invoice", back_populates="items")
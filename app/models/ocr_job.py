@@ -0,0 +1,47 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.sql import func
+import uuid
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
+
+from app.models.base import Base
+
+
+class OcrJob(Base):
+    """
+    OCR任务队列 - 由独立的worker进程领取(租约)并处理
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True)
+
+    file_id = Column(
+        UUID(as_uuid=True), ForeignKey("file.id", ondelete="CASCADE"), nullable=False
+    )
+    file = relationship("File", back_populates="ocr_jobs")
+
+    # 任务状态: pending / running / done / failed
+    status = Column(String(20), default=PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=3, nullable=False)
+    last_error = Column(Text, nullable=True)
+
+    # 租约: 领取任务的worker及租约到期时间
+    locked_by = Column(String(100), nullable=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+
+    # 时间戳
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_ocr_job_status_created_at", "status", "created_at"),
+        Index("ix_ocr_job_file_id", "file_id"),
+    )
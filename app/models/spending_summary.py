@@ -0,0 +1,50 @@
+from sqlalchemy import JSON, Column, DateTime, Float, ForeignKey, Index, Integer, String
+from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.models.base import Base
+
+
+class UserSpendingSummary(Base):
+    """
+    用户消费汇总 - 保存发票时增量更新，分析时无需读取全部历史发票
+    """
+
+    user_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+
+    invoice_count = Column(Integer, default=0, nullable=False)
+    item_count = Column(Integer, default=0, nullable=False)
+    total_spent = Column(Float, default=0.0, nullable=False)
+
+    # {"REWE": {"count": 3, "total": 42.5}}
+    by_brand = Column(JSON, nullable=False, default=dict)
+    # {"2025-04": {"count": 3, "total": 42.5}}
+    by_month = Column(JSON, nullable=False, default=dict)
+
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+
+class UserItemStat(Base):
+    """
+    用户按商品名(大写)统计的购买次数和金额，用于获取最常购买的商品
+    """
+
+    user_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    name = Column(String(255), primary_key=True)
+
+    purchase_count = Column(Integer, default=0, nullable=False)
+    total_spent = Column(Float, default=0.0, nullable=False)
+
+    __table_args__ = (
+        Index("ix_user_item_stat_user_id_purchase_count", user_id, purchase_count.desc()),
+    )
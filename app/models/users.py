@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, DateTime, Integer, String, Text, ForeignKey
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, String, Text, ForeignKey
 from sqlalchemy.sql import func
 import uuid
 from sqlalchemy.dialects.postgresql import UUID
@@ -28,7 +28,9 @@ class Users(Base):
     is_verified = Column(Boolean, default=False, nullable=False)
 
     # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
     updated_at = Column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
@@ -45,3 +47,6 @@ class Users(Base):
     invitation_id = Column(Integer, ForeignKey("invitations.id"), nullable=True)
 
     invitation = relationship("Invitation", back_populates="used_by")
+
+    # 用户列表的游标分页
+    __table_args__ = (Index("ix_users_created_at_id", created_at.desc(), id.desc()),)
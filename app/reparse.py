@@ -0,0 +1,256 @@
+"""
+批量重新解析已保存的发票
+
+解析规则改进后，用已保存的 Invoice.ocr_text 重新提取发票字段和商品项目，
+不重新执行OCR。发票按 (user_id, created_at, id) 分批读取，文本在进程池中并行解析，
+每批的发票更新、商品项目替换和受影响用户的消费汇总重建在同一个事务中提交。
+每批提交后把进度写入检查点文件，中断后再次运行会从上次提交的位置继续。
+
+    python -m app.reparse                        # 从检查点继续(没有检查点时从头开始)
+    python -m app.reparse --restart --workers 8  # 忽略检查点，重新处理全部发票
+    python -m app.reparse --dry-run              # 只统计会变化的发票，不写入数据库
+
+解析结果与数据库中完全相同的发票不会被改写。
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import insert, tuple_, update
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.config import settings
+from app.core.db import SessionLocal, engine
+from app.crud.spending_summary import rebuild_spending_summary
+from app.models.invoice import Invoice
+from app.models.invoice_item import InvoiceItem
+from app.utils.invoice_pipeline import build_invoice_items
+from app.utils.ocr_cache import INVOICE_FIELDS
+from app.utils.receipt_parsers import extract_invoice_data
+
+# 独立运行时需要导入全部模型，关系映射才能完成配置
+from app.models.consumer_analysis import ConsumerAnalysis  # noqa: F401
+from app.models.invitation import Invitation  # noqa: F401
+from app.models.users import Users  # noqa: F401
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT = "reparse.checkpoint.json"
+STAT_KEYS = ("scanned", "changed", "unchanged", "failed")
+
+
+def _init_worker():
+    # fork出来的子进程不能复用父进程的数据库连接
+    engine.dispose(close=False)
+
+
+def parse_text(text: str) -> Optional[Dict[str, Any]]:
+    """在子进程中解析一张发票的OCR文本，失败时返回None"""
+    try:
+        return extract_invoice_data(text)
+    except Exception as e:
+        logger.error(f"解析发票文本失败: {str(e)}")
+        return None
+
+
+def load_checkpoint(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {"cursor": None, "stats": dict.fromkeys(STAT_KEYS, 0), "done": False}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path: str, state: Dict[str, Any]):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def fetch_batch(db: Session, cursor: Optional[List[str]], batch_size: int):
+    """按 (user_id, created_at, id) 顺序读取下一批有OCR文本的发票"""
+    query = db.query(
+        Invoice.id, Invoice.user_id, Invoice.created_at, Invoice.ocr_text
+    ).filter(Invoice.ocr_text.isnot(None))
+    if cursor:
+        user_id, created_at, invoice_id = cursor
+        query = query.filter(
+            tuple_(Invoice.user_id, Invoice.created_at, Invoice.id)
+            > (
+                uuid.UUID(user_id),
+                datetime.fromisoformat(created_at),
+                uuid.UUID(invoice_id),
+            )
+        )
+    return (
+        query.order_by(Invoice.user_id, Invoice.created_at, Invoice.id)
+        .limit(batch_size)
+        .all()
+    )
+
+
+def _item_key(item) -> str:
+    return repr((item.name, item.quantity, item.unit_price, item.total_price))
+
+
+def apply_batch(
+    db: Session,
+    rows: Sequence[Any],
+    results: Sequence[Optional[Dict[str, Any]]],
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """
+    把一批解析结果写回数据库并提交：发票字段批量UPDATE，发生变化的发票的商品项目
+    整体替换，受影响用户的消费汇总重建。返回本批的统计。
+    """
+    stats = dict.fromkeys(STAT_KEYS, 0)
+    stats["scanned"] = len(rows)
+
+    invoices = {
+        invoice.id: invoice
+        for invoice in db.query(Invoice)
+        .options(selectinload(Invoice.items))
+        .filter(Invoice.id.in_([row.id for row in rows]))
+    }
+
+    now = datetime.now(timezone.utc)
+    updates = []
+    new_items = []
+    changed_users = set()
+    for row, parsed in zip(rows, results):
+        invoice = invoices.get(row.id)
+        if parsed is None or invoice is None:
+            stats["failed"] += 1
+            continue
+
+        fields = {field: parsed.get(field) for field in INVOICE_FIELDS}
+        items = build_invoice_items(parsed.get("items") or [])
+        if fields == {field: getattr(invoice, field) for field in INVOICE_FIELDS} and (
+            sorted(map(_item_key, items)) == sorted(map(_item_key, invoice.items))
+        ):
+            stats["unchanged"] += 1
+            continue
+
+        stats["changed"] += 1
+        updates.append({"id": invoice.id, "updated_at": now, **fields})
+        new_items.extend(
+            {"id": uuid.uuid4(), "invoice_id": invoice.id, **item.model_dump()}
+            for item in items
+        )
+        changed_users.add(invoice.user_id)
+
+    try:
+        if updates and not dry_run:
+            db.execute(update(Invoice), updates)
+            db.query(InvoiceItem).filter(
+                InvoiceItem.invoice_id.in_([u["id"] for u in updates])
+            ).delete(synchronize_session=False)
+            if new_items:
+                db.execute(insert(InvoiceItem), new_items)
+            for user_id in changed_users:
+                rebuild_spending_summary(db, user_id)
+            db.commit()
+        else:
+            db.rollback()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.expunge_all()
+
+    return stats
+
+
+def reparse(
+    workers: int, batch_size: int, checkpoint_path: str, restart: bool, dry_run: bool
+):
+    state = (
+        {"cursor": None, "stats": dict.fromkeys(STAT_KEYS, 0), "done": False}
+        if restart
+        else load_checkpoint(checkpoint_path)
+    )
+    if state["done"]:
+        logger.info(f"检查点 {checkpoint_path} 显示已全部处理完成，使用 --restart 重新开始")
+        return
+    if state["cursor"]:
+        logger.info(f"从检查点继续: 已处理 {state['stats']['scanned']} 张发票")
+
+    started = time.monotonic()
+    scanned = 0
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker
+    ) as pool, SessionLocal() as db:
+        while True:
+            rows = fetch_batch(db, state["cursor"], batch_size)
+            if not rows:
+                break
+
+            chunksize = max(1, len(rows) // (workers * 4))
+            results = list(
+                pool.map(parse_text, [row.ocr_text for row in rows], chunksize=chunksize)
+            )
+            batch_stats = apply_batch(db, rows, results, dry_run=dry_run)
+
+            last = rows[-1]
+            state["cursor"] = [
+                str(last.user_id),
+                last.created_at.isoformat(),
+                str(last.id),
+            ]
+            for key, value in batch_stats.items():
+                state["stats"][key] += value
+            if not dry_run:
+                save_checkpoint(checkpoint_path, state)
+
+            scanned += len(rows)
+            rate = scanned / (time.monotonic() - started)
+            logger.info(
+                f"已处理 {state['stats']['scanned']} 张发票 "
+                f"(变化 {state['stats']['changed']}，失败 {state['stats']['failed']})，"
+                f"{rate:.0f} 张/秒"
+            )
+
+    state["done"] = True
+    if not dry_run:
+        save_checkpoint(checkpoint_path, state)
+    logger.info(f"重新解析完成: {state['stats']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Re-run receipt parsing on stored OCR text"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.ocr_worker_count,
+        help="number of parser processes",
+    )
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument(
+        "--restart", action="store_true", help="ignore an existing checkpoint"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="count changes without writing"
+    )
+    args = parser.parse_args()
+    reparse(
+        max(args.workers, 1),
+        max(args.batch_size, 1),
+        args.checkpoint,
+        args.restart,
+        args.dry_run,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+import json
 import uuid
 
 
-from app.core.db import get_db
+from app.core.db import SessionLocal, get_db
 from app.auth import get_current_active_user
 from app.models.users import Users as UserModel
 
@@ -12,31 +15,94 @@ from app.utils.consumer_data_extractor import ConsumerDataExtractor
 from app.utils.chatgpt_client import ChatGPTClient
 from app.crud.consumer_analysis import (
     create_consumer_analysis,
+    get_cached_analysis,
     get_latest_user_analysis,
     get_user_analyses,
     get_analysis,
 )
+from app.crud.analysis_job import enqueue_analysis_job, get_analysis_job
+from app.crud.invoice import get_invoice_fingerprint
+from app.models.consumer_analysis import ConsumerAnalysis as ConsumerAnalysisModel
 from app.schemas.consumer_analysis import (
     ConsumerAnalysis as ConsumerAnalysisSchema,
     ConsumerAnalysisCreate,
 )
+from app.schemas.analysis_job import AnalysisJob as AnalysisJobSchema
+from app.utils.analysis_jobs import analysis_workers
+from app.utils.metrics import registry
+from app.utils.pagination import set_next_cursor
 
 router = APIRouter(prefix="/ai", tags=["AI Analysis"])
 
+analysis_cache_requests = registry.counter(
+    "ai_analysis_cache_requests_total",
+    "Consumer analysis requests by whether a stored analysis was reused",
+    ["result"],
+)
+
+
+def _analysis_response(
+    db_analysis: ConsumerAnalysisModel, from_cache: bool
+) -> Dict[str, Any]:
+    return {
+        "analysis_id": str(db_analysis.id),
+        "created_at": db_analysis.created_at.isoformat(),
+        "analysis": db_analysis.analysis_data,
+        "from_cache": from_cache,
+    }
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _save_analysis(analysis_in: ConsumerAnalysisCreate) -> ConsumerAnalysisModel:
+    # 流式响应结束时请求的数据库会话已经关闭，使用单独的会话保存
+    with SessionLocal() as db:
+        return create_consumer_analysis(db, analysis_in)
 
-@router.post("/analyze-consumer-data", response_model=Dict[str, Any])
-async def analyze_consumer_data(
-    db: Session = Depends(get_db),
-    current_user: UserModel = Depends(get_current_active_user),
-):
 
-    data_extractor = ConsumerDataExtractor(current_user.id, db)
-    consumer_data = data_extractor.extract_data()
+async def _prepare_analysis(
+    db: Session, user_id: uuid.UUID, force: bool
+) -> Tuple[str, Optional[ConsumerAnalysisModel], Optional[Dict[str, Any]]]:
+    """
+    返回 (数据指纹, 可以复用的分析记录, 用于分析的消费数据)，
+    有可以复用的记录时不提取消费数据
+    """
+    # 数据库操作在线程池中执行，等待OpenAI响应时不占用线程
+    fingerprint = await run_in_threadpool(get_invoice_fingerprint, db, user_id)
+    if not force:
+        cached = await run_in_threadpool(get_cached_analysis, db, user_id, fingerprint)
+        if cached is not None:
+            analysis_cache_requests.inc(result="hit")
+            return fingerprint, cached, None
+    analysis_cache_requests.inc(result="forced" if force else "miss")
+
+    data_extractor = ConsumerDataExtractor(user_id, db)
+    consumer_data = await run_in_threadpool(data_extractor.extract_data)
 
     if "error" in consumer_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=consumer_data["error"]
         )
+    return fingerprint, None, consumer_data
+
+
+@router.post("/analyze-consumer-data", response_model=Dict[str, Any])
+async def analyze_consumer_data(
+    force: bool = False,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_active_user),
+):
+    """
+    分析用户的消费数据。发票数据自最近一次分析以来没有变化时直接返回该次结果
+    (from_cache 为真)，不调用OpenAI；force=true 时总是重新分析。
+    """
+    fingerprint, cached, consumer_data = await _prepare_analysis(
+        db, current_user.id, force
+    )
+    if cached is not None:
+        return _analysis_response(cached, from_cache=True)
 
     chatgpt_client = ChatGPTClient()
     analysis_result = await chatgpt_client.analyze_consumer_data(consumer_data)
@@ -51,32 +117,139 @@ async def analyze_consumer_data(
         user_id=current_user.id,
         analysis_data=analysis_result["analysis"],
         raw_response=analysis_result.get("raw_response"),
+        data_fingerprint=fingerprint,
     )
 
-    db_analysis = create_consumer_analysis(db, analysis_create)
+    db_analysis = await run_in_threadpool(
+        create_consumer_analysis, db, analysis_create
+    )
+
+    return _analysis_response(db_analysis, from_cache=False)
+
+
+@router.post("/analyze-consumer-data/stream")
+async def analyze_consumer_data_stream(
+    force: bool = False,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_active_user),
+):
+    """
+    analyze-consumer-data 的流式版本，模型生成的内容以 Server-Sent Events 实时返回：
+
+        event: delta   data: {"content": "..."}    生成的文本片段
+        event: done    data: 与非流式接口相同的结果，分析已保存
+        event: error   data: {"detail": "..."}
+
+    可以复用已有分析时只返回一个 done 事件。客户端中途断开时分析不会被保存。
+    """
+    fingerprint, cached, consumer_data = await _prepare_analysis(
+        db, current_user.id, force
+    )
+    user_id = current_user.id
+    chatgpt_client = ChatGPTClient() if cached is None else None
+
+    async def events():
+        if cached is not None:
+            yield _sse("done", _analysis_response(cached, from_cache=True))
+            return
+
+        async for event in chatgpt_client.stream_consumer_analysis(consumer_data):
+            if "delta" in event:
+                yield _sse("delta", {"content": event["delta"]})
+            elif "error" in event:
+                yield _sse("error", {"detail": event["error"]})
+                return
+            else:
+                analysis_create = ConsumerAnalysisCreate(
+                    user_id=user_id,
+                    analysis_data=event["analysis"],
+                    raw_response=event.get("raw_response"),
+                    data_fingerprint=fingerprint,
+                )
+                db_analysis = await run_in_threadpool(_save_analysis, analysis_create)
+                yield _sse("done", _analysis_response(db_analysis, from_cache=False))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # 禁止代理(如nginx)缓冲事件
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post(
+    "/analyses",
+    response_model=AnalysisJobSchema,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def create_analysis_job(
+    request: Request,
+    response: Response,
+    force: bool = False,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_active_user),
+):
+    """
+    创建消费分析任务并立即返回，分析由后台worker执行。用 Location 中的
+    GET /ai/analyses/{job_id} 查询状态，status 为 done 时结果在 analysis 中，
+    为 failed 时错误在 last_error 中。已有未完成的任务时返回该任务。
+    """
+    job = await run_in_threadpool(enqueue_analysis_job, db, current_user.id, force)
+    analysis_workers.notify()
+
+    response.headers["Location"] = str(
+        request.url_for("get_analysis_job_status", job_id=job.id)
+    )
+    return job
 
-    return {
-        "analysis_id": str(db_analysis.id),
-        "created_at": db_analysis.created_at.isoformat(),
-        "analysis": db_analysis.analysis_data,
-        "from_cache": False,
-    }
+
+@router.get("/analyses/{job_id}", response_model=AnalysisJobSchema)
+def get_analysis_job_status(
+    job_id: uuid.UUID,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_active_user),
+):
+    """get analysis job status and result"""
+    job = get_analysis_job(db, job_id)
+
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"analysis job {job_id} not exists",
+        )
+
+    if job.user_id != current_user.id and not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="you have no permission to access this analysis job",
+        )
+
+    return job
 
 
 @router.get("/consumer-analyses", response_model=List[ConsumerAnalysisSchema])
-async def get_analysis_history(
+def get_analysis_history(
+    response: Response,
     skip: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user),
 ):
 
-    analyses = get_user_analyses(db, current_user.id, skip=skip, limit=limit)
+    try:
+        analyses = get_user_analyses(
+            db, current_user.id, skip=skip, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    set_next_cursor(response, analyses, limit)
     return analyses
 
 
 @router.get("/consumer-analyses/{analysis_id}", response_model=ConsumerAnalysisSchema)
-async def get_analysis_by_id(
+def get_analysis_by_id(
     analysis_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user),
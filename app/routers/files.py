@@ -1,39 +1,47 @@
 import os
-import shutil
 import uuid
 import logging
-from typing import List
+from typing import List, Optional
 
 from fastapi import (
     APIRouter,
     Depends,
-    File,
-    UploadFile,
     HTTPException,
+    Request,
+    Response,
     status,
-    BackgroundTasks,
 )
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app.auth import get_current_active_user
 
+from app.core.config import settings
 from app.core.db import get_db
 from app.models.users import Users as UserModel
 from app.crud.files import (
-    create_file,
+    create_files_with_ocr_jobs,
     get_user_files,
     get_file,
     update_file,
     delete_file,
+    is_file_path_shared,
+    lock_content_hashes,
+)
+from app.schemas.files import (
+    File as FileSchema,
+    FileCreate,
+    FileUpdate,
+    FileUploadResult,
 )
-from app.schemas.files import File as FileSchema, FileCreate, FileUpdate
 
-from app.utils.inovice_processor import InvoiceProcessor
-from app.crud.invoice import create_invoice, get_invoice_by_file, get_user_invoices
-from app.schemas.invoice import InvoiceCreate, Invoice as InvoiceSchema
+from app.crud.invoice import get_invoice_by_file, get_user_invoices
+from app.schemas.invoice import Invoice as InvoiceSchema
 
-from app.crud.invoice_item import create_invoice_item
-from app.schemas.invoice_item import InvoiceItemCreate
+from app.crud.ocr_job import enqueue_ocr_job
+from app.utils.inovice_processor import artifact_paths
+from app.utils.pagination import set_next_cursor
+from app.utils.upload_storage import RejectedUpload, UploadRejected, receive_uploads
 
 router = APIRouter(prefix="/files", tags=["files"])
 
@@ -44,72 +52,190 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 logger = logging.getLogger(__name__)
 
 
-@router.post("/upload", response_model=FileSchema, status_code=status.HTTP_201_CREATED)
+# 请求体由 receive_uploads 流式解析，这里只为OpenAPI文档声明格式
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+
+@router.post(
+    "/upload",
+    response_model=FileSchema,
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra=UPLOAD_REQUEST_BODY,
+)
 async def upload_file(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
+    request: Request,
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user),
 ):
 
-    # 验证文件类型
-    if file.content_type not in ["application/pdf", "image/jpeg", "image/png"]:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="只支持PDF和图片文件"
-        )
-
-    # 创建唯一文件名
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_location = os.path.join(UPLOAD_DIR, unique_filename)
-
-    # 保存文件
+    # 边接收边写入磁盘(按内容哈希命名，相同文件只保存一份)，
+    # 超过大小限制或文件内容与声明的类型不符时立即中止
     try:
-        with open(file_location, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        uploads = await receive_uploads(
+            request, UPLOAD_DIR, max_bytes=settings.upload_max_bytes
+        )
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"无法保存文件: {str(e)}",
         )
-    finally:
-        file.file.close()
-
-    # 获取文件大小
-    file_size = os.path.getsize(file_location)
+    stored = uploads[0]
 
     # 创建文件记录
     file_data = FileCreate(
-        filename=unique_filename,
-        original_filename=file.filename,
-        file_path=file_location,
-        file_size=file_size,
-        file_type=file.content_type,
+        filename=stored.filename,
+        original_filename=stored.original_filename,
+        file_path=stored.file_path,
+        file_size=stored.file_size,
+        file_type=stored.content_type,
+        content_hash=stored.content_hash,
         user_id=current_user.id,
+        processing_timings={"upload_write": round(stored.write_seconds, 4)},
     )
 
-    db_file = create_file(db, file_data)
+    # 移动到最终路径、创建文件记录并加入OCR任务队列(由worker进程处理)，
+    # 数据库操作在线程池中执行，不阻塞事件循环
+    db_files = await run_in_threadpool(
+        create_files_with_ocr_jobs, db, [file_data], [stored]
+    )
+    return db_files[0]
+
+
+BATCH_UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["files"],
+                    "properties": {
+                        "files": {
+                            "type": "array",
+                            "items": {"type": "string", "format": "binary"},
+                        }
+                    },
+                }
+            }
+        },
+    }
+}
+
+
+@router.post(
+    "/upload/batch",
+    response_model=List[FileUploadResult],
+    status_code=status.HTTP_201_CREATED,
+    openapi_extra=BATCH_UPLOAD_REQUEST_BODY,
+)
+async def upload_files(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: UserModel = Depends(get_current_active_user),
+):
+    """
+    一次上传多个文件(字段名 files)。每个文件单独检查大小和类型，被拒绝的文件
+    不影响其他文件；保存下来的文件在一个事务中写入数据库并加入OCR任务队列。
+    按上传顺序返回每个文件的结果，没有任何文件被保存时返回400。
+    """
+    try:
+        uploads = await receive_uploads(
+            request,
+            UPLOAD_DIR,
+            max_bytes=settings.upload_max_bytes,
+            field_name="files",
+            max_files=settings.upload_batch_max_files,
+            skip_rejected=True,
+        )
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"无法保存文件: {str(e)}",
+        )
 
-    # 添加后台任务处理文件
-    background_tasks.add_task(process_file_background, db_file.id, db)
+    stored = [upload for upload in uploads if not isinstance(upload, RejectedUpload)]
+    files_in = [
+        FileCreate(
+            filename=upload.filename,
+            original_filename=upload.original_filename,
+            file_path=upload.file_path,
+            file_size=upload.file_size,
+            file_type=upload.content_type,
+            content_hash=upload.content_hash,
+            user_id=current_user.id,
+            processing_timings={"upload_write": round(upload.write_seconds, 4)},
+        )
+        for upload in stored
+    ]
+    db_files = iter(
+        await run_in_threadpool(create_files_with_ocr_jobs, db, files_in, stored)
+    )
 
-    return db_file
+    results = []
+    for upload in uploads:
+        if isinstance(upload, RejectedUpload):
+            results.append(
+                FileUploadResult(
+                    original_filename=upload.original_filename,
+                    status_code=upload.status_code,
+                    detail=upload.detail,
+                )
+            )
+        else:
+            results.append(
+                FileUploadResult(
+                    original_filename=upload.original_filename,
+                    status_code=status.HTTP_201_CREATED,
+                    file=FileSchema.model_validate(next(db_files)),
+                )
+            )
+
+    if not stored:
+        response.status_code = status.HTTP_400_BAD_REQUEST
+    return results
 
 
 @router.get("/me", response_model=List[FileSchema])
-async def read_user_files(
+def read_user_files(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user),
 ):
 
-    files = get_user_files(db, current_user.id, skip=skip, limit=limit)
+    try:
+        files = get_user_files(
+            db, current_user.id, skip=skip, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    set_next_cursor(response, files, limit)
     return files
 
 
 @router.get("/{file_id}", response_model=FileSchema)
-async def read_file(
+def read_file(
     file_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user),
@@ -128,7 +254,7 @@ async def read_file(
 
 
 @router.delete("/{file_id}", response_model=FileSchema)
-async def remove_file(
+def remove_file(
     file_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user),
@@ -142,106 +268,33 @@ async def remove_file(
     if file.user_id != current_user.id and not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="no permission to access this file")
 
-    # delete file from disk
-    try:
-        if os.path.exists(file.file_path):
-            os.remove(file.file_path)
-    except Exception as e:
-        logger.error(f"delete file  {file.file_path} get error: {str(e)}")
-
-    # delete file record from database
-    deleted_file = delete_file(db, file_id)
-    return deleted_file
-
-
-# inovce processor routes
-
-
-# TODO: let invoice process separate from file upload
-async def process_file_background(file_id: uuid.UUID, db: Session):
-
-    file = get_file(db, file_id)
-    if not file:
-        return
-
+    # the content hash lock keeps an upload of the same content from
+    # reusing the file on disk while it is being removed
     try:
-
-        existing_invoice = get_invoice_by_file(db, file_id)
-        if existing_invoice:
-            logger.info(f"文件 {file_id} 的发票记录已存在，跳过处理")
-            return
-
-        processor = InvoiceProcessor(file.file_path)
-
-        invoice_data = processor.process()
-
-        items = invoice_data.pop("items", [])
-        logger.info(f"从OCR中提取到 {len(items)} 个商品项目")
-
-        invoice_create = InvoiceCreate(
-            file_id=file_id,
-            user_id=file.user_id,
-            ocr_text=processor.extracted_text,
-            is_processed=True,
-            **{
-                k: v
-                for k, v in invoice_data.items()
-                if k
-                in [
-                    "markt_name",
-                    "store_address",
-                    "brand",
-                    "telephone",
-                    "uid_number",
-                    "markt_id",
-                    "receipt_nr",
-                    "document_nr",
-                    "date",
-                    "time",
-                    "payment_method",
-                    "total",
-                ]
-            },
-        )
-
-        invoice = create_invoice(db, invoice_create)
-        logger.info(f"成功创建发票记录 ID: {invoice.id}")
-
-        try:
-            if not items:
-                logger.warning("没有提取到任何商品项目")
-
-            for idx, item_data in enumerate(items):
+        lock_content_hashes(db, [file.content_hash])
+        shared = is_file_path_shared(db, file.file_path, file_id)
+        deleted_file = delete_file(db, file_id, commit=False)
+
+        # delete file and its cached OCR artifacts from disk,
+        # unless another upload with the same content uses them
+        if not shared:
+            for path in [file.file_path, *artifact_paths(file.file_path)]:
                 try:
-                    if "name" in item_data and "total_price" in item_data:
-                        item_create = InvoiceItemCreate(
-                            invoice_id=invoice.id,
-                            name=item_data["name"],
-                            quantity=item_data.get("quantity"),
-                            unit_price=item_data.get("unit_price"),
-                            total_price=item_data["total_price"],
-                        )
-                        create_invoice_item(db, item_create)
-                        logger.info(f"成功创建商品项目 {idx+1}: {item_data['name']}")
-                    else:
-                        logger.warning(f"商品项目 {idx+1} 缺少必要字段: {item_data}")
+                    if os.path.exists(path):
+                        os.remove(path)
                 except Exception as e:
-                    logger.error(f"创建商品项目 {idx+1} 时出错: {str(e)}")
-        except Exception as e:
-            logger.error(f"处理商品项目时出错: {str(e)}")
+                    logger.error(f"delete file  {path} get error: {str(e)}")
 
-        # 更新文件状态为已处理
-        update_file(db, file_id, FileUpdate(is_processed=True))
-
-    except Exception as e:
-        logger.error(f"处理文件 {file_id} 时出错: {str(e)}")
-        # 如果发生错误，仍然将文件标记为已处理，但记录错误信息
-        update_file(db, file_id, FileUpdate(is_processed=True))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return deleted_file
 
 
 # 添加新的API路由获取发票数据
 @router.get("/{file_id}/invoice", response_model=InvoiceSchema)
-async def get_file_invoice(
+def get_file_invoice(
     file_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user),
@@ -262,9 +315,8 @@ async def get_file_invoice(
 
 
 @router.post("/{file_id}/process", response_model=FileSchema)
-async def process_file(
+def process_file(
     file_id: uuid.UUID,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user),
 ):
@@ -278,18 +330,27 @@ async def process_file(
 
     update_file(db, file_id, FileUpdate(is_processed=False))
 
-    background_tasks.add_task(process_file_background, file_id, db)
+    enqueue_ocr_job(db, file_id)
 
     return file
 
 
 @router.get("/invoices/me", response_model=List[InvoiceSchema])
-async def read_user_invoices(
+def read_user_invoices(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user),
 ):
 
-    invoices = get_user_invoices(db, current_user.id, skip=skip, limit=limit)
+    try:
+        invoices = get_user_invoices(
+            db, current_user.id, skip=skip, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    set_next_cursor(response, invoices, limit)
     return invoices
@@ -1,6 +1,6 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 
 from app.auth import get_current_active_superuser
@@ -11,6 +11,7 @@ from app.crud.invitation import (
     get_invitation_by_code,
 )
 from app.schemas.invitation import Invitation, InvitationCreate
+from app.utils.pagination import set_next_cursor
 
 router = APIRouter(tags=["invitations"])
 
@@ -29,13 +30,21 @@ def create_new_invitation(
 
 @router.get("/invitations", response_model=List[Invitation])
 def read_invitations(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_active_superuser),
 ):
     """Get all invitation codes (admin only)"""
-    return get_all_invitations(db, skip=skip, limit=limit)
+    try:
+        invitations = get_all_invitations(db, skip=skip, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    set_next_cursor(response, invitations, limit)
+    return invitations
 
 
 @router.post(
@@ -1,7 +1,8 @@
-from typing import List
+from typing import List, Optional
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app.auth import get_current_active_user, get_current_active_superuser
@@ -9,6 +10,8 @@ from app.core.db import get_db
 from app.crud.user import get_user, get_users, update_user, delete_user
 from app.schemas.user import User, UserUpdate
 from app.models.users import Users as UserModel
+from app.utils.pagination import set_next_cursor
+from app.utils.password import get_password_hash_async
 
 router = APIRouter(tags=["users"])
 
@@ -26,15 +29,22 @@ async def update_user_me(
     current_user: UserModel = Depends(get_current_active_user),
 ):
 
+    update_data = user_in.dict(exclude_unset=True)
+    if update_data.get("password"):
+        # 在密码线程池中计算哈希，不阻塞事件循环
+        update_data["hashed_password"] = await get_password_hash_async(
+            update_data.pop("password")
+        )
+
     try:
-        user = update_user(db, current_user.id, user_in)
+        user = await run_in_threadpool(update_user, db, current_user.id, update_data)
         return user
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.delete("/me", response_model=User)
-async def delete_user_me(
+def delete_user_me(
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user),
 ):
@@ -48,19 +58,26 @@ async def delete_user_me(
 
 # Admin routes
 @router.get("/users", response_model=List[User])
-async def read_users(
+def read_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_superuser),
 ):
 
-    users = get_users(db, skip=skip, limit=limit)
+    try:
+        users = get_users(db, skip=skip, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    set_next_cursor(response, users, limit)
     return users
 
 
 @router.get("/users/{user_id}", response_model=User)
-async def read_user(
+def read_user(
     user_id: uuid.UUID,
     db: Session = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_superuser),
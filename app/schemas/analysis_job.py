@@ -0,0 +1,27 @@
+from datetime import datetime
+from typing import Optional
+import uuid
+from pydantic import BaseModel
+
+from app.schemas.consumer_analysis import ConsumerAnalysis
+
+
+class AnalysisJob(BaseModel):
+
+    id: uuid.UUID
+    status: str
+    force: bool
+    attempts: int
+    last_error: Optional[str] = None
+    # 失败后等待重试的任务，下一次执行的最早时间
+    available_at: Optional[datetime] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    # 任务完成(status 为 done)后才有
+    analysis_id: Optional[uuid.UUID] = None
+    from_cache: bool = False
+    analysis: Optional[ConsumerAnalysis] = None
+
+    model_config = {"from_attributes": True}
@@ -13,6 +13,7 @@ class ConsumerAnalysisBase(BaseModel):
 class ConsumerAnalysisCreate(ConsumerAnalysisBase):
 
     user_id: uuid.UUID
+    data_fingerprint: Optional[str] = None
 
 
 class ConsumerAnalysisInDBBase(ConsumerAnalysisBase):
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 import uuid
 from pydantic import BaseModel, Field
 
@@ -16,8 +16,10 @@ class FileCreate(FileBase):
 
     file_path: str
     user_id: uuid.UUID
+    content_hash: Optional[str] = None
     is_active: bool = True
     is_processed: bool = False
+    processing_timings: Optional[Dict[str, float]] = None
 
 
 class FileUpdate(BaseModel):
@@ -31,8 +33,10 @@ class FileInDBBase(FileBase):
     id: uuid.UUID
     file_path: str
     user_id: uuid.UUID
+    content_hash: Optional[str] = None
     is_active: bool
     is_processed: bool
+    processing_timings: Optional[Dict[str, float]] = None
     created_at: datetime
     updated_at: datetime
 
@@ -46,3 +50,12 @@ class File(FileInDBBase):
 class FileInDB(FileInDBBase):
 
     pass
+
+
+class FileUploadResult(BaseModel):
+    """批量上传中单个文件的结果，被拒绝时 file 为空"""
+
+    original_filename: str
+    status_code: int
+    detail: Optional[str] = None
+    file: Optional[File] = None
@@ -0,0 +1,228 @@
+"""
+消费分析任务的worker
+
+POST /ai/analyses 只把任务写入 analysis_job 表并立即返回任务id，客户端通过
+GET /ai/analyses/{id} 查询状态和结果。每个API进程在 lifespan 中启动
+settings.analysis_worker_count 个协程，从表中领取任务(租约与 OCR 任务相同，
+FOR UPDATE SKIP LOCKED)并调用OpenAI：同时进行的分析数量有上限，等待LLM响应时
+也不占用处理请求的worker。多个API进程共同消费同一个队列，进程退出时正在执行的
+任务放回队列，崩溃时在租约过期后被重新领取。
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.db import SessionLocal
+from app.crud.analysis_job import (
+    claim_next_analysis_job,
+    complete_analysis_job,
+    extend_analysis_job_lease,
+    fail_analysis_job,
+    release_analysis_job,
+)
+from app.crud.consumer_analysis import create_consumer_analysis, get_cached_analysis
+from app.crud.invoice import get_invoice_fingerprint
+from app.models.analysis_job import AnalysisJob
+from app.schemas.consumer_analysis import ConsumerAnalysisCreate
+from app.utils.chatgpt_client import ChatGPTClient
+from app.utils.consumer_data_extractor import ConsumerDataExtractor
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+analysis_jobs_finished = registry.counter(
+    "analysis_jobs_total",
+    "Consumer analysis jobs by outcome (done, cached, retried, failed)",
+    ["result"],
+)
+analysis_job_wait_seconds = registry.histogram(
+    "analysis_job_wait_seconds",
+    "Time consumer analysis jobs spent queued before a worker picked them up",
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+
+
+class AnalysisJobError(Exception):
+    """重试也不会成功的错误(例如用户没有发票数据)，任务直接标记为failed"""
+
+
+def _prepare(
+    user_id: uuid.UUID, force: bool
+) -> Tuple[str, Optional[uuid.UUID], Optional[Dict[str, Any]]]:
+    """返回 (数据指纹, 可以复用的分析id, 用于分析的消费数据)"""
+    with SessionLocal() as db:
+        fingerprint = get_invoice_fingerprint(db, user_id)
+        if not force:
+            cached = get_cached_analysis(db, user_id, fingerprint)
+            if cached is not None:
+                return fingerprint, cached.id, None
+
+        consumer_data = ConsumerDataExtractor(user_id, db).extract_data()
+        if "error" in consumer_data:
+            raise AnalysisJobError(consumer_data["error"])
+        return fingerprint, None, consumer_data
+
+
+def _save_analysis(analysis_in: ConsumerAnalysisCreate) -> uuid.UUID:
+    with SessionLocal() as db:
+        return create_consumer_analysis(db, analysis_in).id
+
+
+def _with_session(func, *args, **kwargs):
+    with SessionLocal() as db:
+        return func(db, *args, **kwargs)
+
+
+@asynccontextmanager
+async def _lease_heartbeat(job_id: uuid.UUID, worker_id: str):
+    """在分析期间定期续租，防止等待LLM时任务被其他worker重复领取"""
+    lease_seconds = settings.analysis_job_lease_seconds
+
+    async def renew():
+        while True:
+            await asyncio.sleep(max(lease_seconds / 3, 1))
+            try:
+                if not await run_in_threadpool(
+                    _with_session,
+                    extend_analysis_job_lease,
+                    job_id,
+                    worker_id,
+                    lease_seconds,
+                ):
+                    logger.warning(f"分析任务 {job_id} 的租约已丢失")
+                    return
+            except Exception as e:
+                logger.error(f"分析任务 {job_id} 续租失败: {str(e)}")
+
+    task = asyncio.create_task(renew())
+    try:
+        yield
+    finally:
+        task.cancel()
+
+
+async def run_analysis_job(job: AnalysisJob, worker_id: str):
+    job_id, user_id = job.id, job.user_id
+    logger.info(f"worker {worker_id} 开始分析任务 {job_id} (用户 {user_id})")
+    if job.created_at is not None and job.started_at is not None:
+        analysis_job_wait_seconds.observe(
+            (job.started_at - job.created_at).total_seconds()
+        )
+
+    try:
+        async with _lease_heartbeat(job_id, worker_id):
+            fingerprint, cached_id, consumer_data = await run_in_threadpool(
+                _prepare, user_id, job.force
+            )
+            if cached_id is not None:
+                analysis_id, from_cache = cached_id, True
+            else:
+                result = await ChatGPTClient().analyze_consumer_data(consumer_data)
+                if "error" in result:
+                    raise RuntimeError(result["error"])
+                analysis_id = await run_in_threadpool(
+                    _save_analysis,
+                    ConsumerAnalysisCreate(
+                        user_id=user_id,
+                        analysis_data=result["analysis"],
+                        raw_response=result.get("raw_response"),
+                        data_fingerprint=fingerprint,
+                    ),
+                )
+                from_cache = False
+    except asyncio.CancelledError:
+        # 应用关闭，任务放回队列由其他进程(或重启后)继续执行
+        await run_in_threadpool(_with_session, release_analysis_job, job_id, worker_id)
+        raise
+    except Exception as e:
+        logger.error(f"分析任务 {job_id} 出错: {str(e)}")
+        failed_job = await run_in_threadpool(
+            _with_session,
+            fail_analysis_job,
+            job_id,
+            worker_id,
+            str(e),
+            retry=not isinstance(e, AnalysisJobError),
+        )
+        if failed_job is not None:
+            analysis_jobs_finished.inc(
+                result="failed" if failed_job.status == AnalysisJob.FAILED else "retried"
+            )
+        return
+
+    if await run_in_threadpool(
+        _with_session, complete_analysis_job, job_id, worker_id, analysis_id, from_cache
+    ):
+        analysis_jobs_finished.inc(result="cached" if from_cache else "done")
+    else:
+        logger.warning(f"分析任务 {job_id} 完成时租约已不属于 {worker_id}")
+
+
+class AnalysisWorkerPool:
+    """在当前事件循环中运行的一组分析worker协程"""
+
+    def __init__(self):
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self, worker_count: int):
+        if self._tasks or worker_count <= 0:
+            return
+        self._wakeup = asyncio.Event()
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks = [
+            asyncio.create_task(self._run(f"{prefix}:analysis-{index}"))
+            for index in range(worker_count)
+        ]
+        logger.info(f"已启动 {worker_count} 个分析worker")
+
+    async def stop(self):
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._wakeup = None
+
+    def notify(self):
+        """有新任务入队，唤醒空闲的worker，不必等到下一次轮询"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _wait_for_jobs(self):
+        try:
+            await asyncio.wait_for(
+                self._wakeup.wait(), settings.analysis_job_poll_interval
+            )
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _run(self, worker_id: str):
+        while True:
+            try:
+                job = await run_in_threadpool(
+                    _with_session,
+                    claim_next_analysis_job,
+                    worker_id,
+                    settings.analysis_job_lease_seconds,
+                )
+                if job is None:
+                    await self._wait_for_jobs()
+                    continue
+                await run_analysis_job(job, worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"分析worker {worker_id} 出错: {str(e)}")
+                await asyncio.sleep(settings.analysis_job_poll_interval)
+
+
+analysis_workers = AnalysisWorkerPool()
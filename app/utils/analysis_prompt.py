@@ -0,0 +1,153 @@
+"""
+消费分析提示词
+
+提示词只包含预先汇总好的数据(总计、按类别、按商店、按月份、最常购买的商品)和
+少量最近的发票，以紧凑的JSON序列化。数据部分从最详细的级别开始逐级精简，
+直到整个提示词的估算token数不超过 OPENAI_PROMPT_TOKEN_BUDGET，
+因此请求大小(以及LLM的延迟和费用)不随用户的历史数据增长。
+"""
+
+import json
+import logging
+import math
+import re
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 字母按约4个字符一个token，数字每3位一个token，连续的符号(JSON的 ":[ 等)
+# 约2个一个token，对英文、德文和JSON的估算略高于实际值
+_TOKEN_PATTERN = re.compile(r"[^\W\d_]+|\d{1,3}|[^\w\s]+|_+")
+
+
+def estimate_tokens(text: str) -> int:
+    """本地估算文本的token数量"""
+    tokens = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        if piece[0].isalpha():
+            tokens += math.ceil(len(piece) / 4)
+        elif piece[0].isdigit():
+            tokens += 1
+        else:
+            tokens += math.ceil(len(piece) / 2)
+    return tokens
+
+
+class DetailLevel(NamedTuple):
+    recent_invoices: int
+    items_per_invoice: int
+    top_items: int
+    months: int
+    stores: int
+
+
+# 从详细到精简，使用第一个不超过预算的级别
+DETAIL_LEVELS = (
+    DetailLevel(recent_invoices=5, items_per_invoice=20, top_items=30, months=12, stores=10),
+    DetailLevel(recent_invoices=5, items_per_invoice=10, top_items=20, months=12, stores=8),
+    DetailLevel(recent_invoices=3, items_per_invoice=10, top_items=15, months=12, stores=6),
+    DetailLevel(recent_invoices=2, items_per_invoice=5, top_items=10, months=6, stores=5),
+    DetailLevel(recent_invoices=0, items_per_invoice=0, top_items=10, months=6, stores=5),
+    DetailLevel(recent_invoices=0, items_per_invoice=0, top_items=5, months=3, stores=3),
+)
+
+OTHER_STORES = "other"
+
+PROMPT_TEMPLATE = """you are a professional financial analyst and consumer advisor, good at analyzing shopping data and providing insights and suggestions.
+
+Shopping data as compact JSON, amounts in EUR. Lists of [name, count, total] give the number of purchases and the amount spent:
+{data}
+
+Please pay special attention to the following aspects:
+1. Basic consumption pattern analysis: overall consumption, average consumption amount, shopping frequency, etc.
+2. Product analysis: most frequently purchased products and their category distribution
+- by_category is a rough keyword-based grouping; refine it based on product names where useful
+3. Consumption habit insights: consumption habit analysis based on shopping time, store selection, etc.
+4. Personalized suggestions: how to optimize consumption, possible money-saving strategies, etc.
+
+Please return the analysis results in JSON format with the following structure:
+{{"basic_analysis": {{"spending_pattern": "Describe overall consumption patterns", "avg_spending": "average consumption amount", "shopping_frequency": "frequency of shopping"}}, "items_analysis": {{"frequently_bought": ["most frequently bought products"], "possible_categories": {{"category description": "Proportion/Number of products"}}}}, "shopping_habits": {{"preferred_stores": ["Preferred Store"], "time_patterns": "model of shopping time"}}, "recommendations": ["suggestion 1", "suggestion 2", "..."]}}
+"""
+
+
+def _compact(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _rows(bucket: Dict[str, Dict[str, Any]]) -> List[List[Any]]:
+    return [[key, entry["count"], entry["total"]] for key, entry in bucket.items()]
+
+
+def _top_stores(by_brand: Dict[str, Dict[str, Any]], limit: int) -> List[List[Any]]:
+    # 超出数量的商店合并为一行，总计保持不变
+    rows = sorted(_rows(by_brand), key=lambda row: row[2], reverse=True)
+    if len(rows) <= limit:
+        return rows
+    rest = rows[limit - 1 :]
+    return rows[: limit - 1] + [
+        [OTHER_STORES, sum(row[1] for row in rest), round(sum(row[2] for row in rest), 2)]
+    ]
+
+
+def _recent_invoice(invoice: Dict[str, Any], item_limit: int) -> Dict[str, Any]:
+    items = invoice.get("items") or []
+    compact = {
+        "date": invoice.get("date"),
+        "time": invoice.get("time"),
+        "store": invoice.get("store"),
+        "total": invoice.get("total"),
+        "payment": invoice.get("payment_method"),
+        "items": [
+            [item["name"], item.get("quantity"), item.get("total_price")]
+            for item in items[:item_limit]
+        ],
+    }
+    if len(items) > item_limit:
+        compact["more_items"] = len(items) - item_limit
+    return compact
+
+
+def summarize(consumer_data: Dict[str, Any], level: DetailLevel) -> Dict[str, Any]:
+    """按给定的详细程度生成提示词中的数据部分"""
+    summary = consumer_data["summary"]
+    months = sorted(_rows(summary.get("by_month") or {}))[-level.months :]
+    data = {
+        "totals": {
+            "invoices": summary["total_invoices"],
+            "items": summary["total_items"],
+            "spent": summary["total_spent"],
+        },
+        "by_category": sorted(
+            _rows(summary.get("by_category") or {}), key=lambda row: row[2], reverse=True
+        ),
+        "by_store": _top_stores(summary.get("by_brand") or {}, level.stores),
+        "by_month": months,
+        "top_items": summary.get("top_items", [])[: level.top_items],
+    }
+    if level.recent_invoices:
+        data["recent_invoices"] = [
+            _recent_invoice(invoice, level.items_per_invoice)
+            for invoice in consumer_data.get("invoices", [])[: level.recent_invoices]
+        ]
+    return data
+
+
+def build_analysis_prompt(
+    consumer_data: Dict[str, Any], token_budget: Optional[int] = None
+) -> str:
+    """生成不超过 token_budget(默认 OPENAI_PROMPT_TOKEN_BUDGET)的分析提示词"""
+    if token_budget is None:
+        token_budget = settings.openai_prompt_token_budget
+
+    for level in DETAIL_LEVELS:
+        prompt = PROMPT_TEMPLATE.format(data=_compact(summarize(consumer_data, level)))
+        tokens = estimate_tokens(prompt)
+        if tokens <= token_budget:
+            break
+    else:
+        logger.warning(f"分析提示词约 {tokens} tokens，超过预算 {token_budget}")
+
+    logger.info(f"分析提示词约 {tokens} tokens (预算 {token_budget})")
+    return prompt
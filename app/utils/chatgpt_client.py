@@ -1,165 +1,282 @@
 import logging
 import json
 import os
-from typing import Dict, Any
+import random
+import time
+import weakref
+from contextlib import asynccontextmanager, nullcontext
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Dict, Any, Optional
 import httpx
 import asyncio
 
+from app.core.config import settings
+from app.utils.analysis_prompt import build_analysis_prompt
+from app.utils.metrics import registry
+
 logger = logging.getLogger(__name__)
 
+# 限流和服务端临时错误，可以重试
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRY_EXCEPTIONS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+
+openai_retries = registry.counter(
+    "openai_request_retries_total",
+    "OpenAI requests retried after a rate limit, server error or network error",
+    ["reason"],
+)
+
+# 应用生命周期内共享的客户端(连接池和keep-alive)，在 FastAPI lifespan 中创建和关闭
+_shared_client: Optional[httpx.AsyncClient] = None
+_shared_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# 每个事件循环一个信号量，限制同时进行的OpenAI请求数量
+_request_semaphores = weakref.WeakKeyDictionary()
+
+
+def _create_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(
+            settings.openai_read_timeout, connect=settings.openai_connect_timeout
+        ),
+        limits=httpx.Limits(
+            max_connections=settings.openai_max_connections,
+            max_keepalive_connections=settings.openai_max_connections,
+        ),
+    )
+
+
+async def open_http_client():
+    """创建共享的HTTP客户端，在应用启动时调用"""
+    global _shared_client, _shared_loop
+    if _shared_client is None:
+        _shared_client = _create_http_client()
+        _shared_loop = asyncio.get_running_loop()
+
+
+async def close_http_client():
+    """关闭共享的HTTP客户端和其中的连接，在应用关闭时调用"""
+    global _shared_client, _shared_loop
+    if _shared_client is not None:
+        await _shared_client.aclose()
+        _shared_client = None
+        _shared_loop = None
+
+
+@asynccontextmanager
+async def _http_session():
+    # 没有经过lifespan启动(脚本等)时，临时创建一个客户端
+    if _shared_client is not None and _shared_loop is asyncio.get_running_loop():
+        yield _shared_client
+    else:
+        async with _create_http_client() as client:
+            yield client
+
+
+def _get_request_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaphore = _request_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max(settings.openai_max_concurrency, 1))
+        _request_semaphores[loop] = semaphore
+    return semaphore
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """解析 Retry-After 响应头(秒数或HTTP日期)，没有或无法解析时返回None"""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff_delay(attempt: int) -> float:
+    # 指数退避加随机抖动，避免大量请求同时重试
+    delay = settings.openai_retry_backoff * (2**attempt)
+    return min(delay + random.uniform(0, delay / 2), settings.openai_retry_max_delay)
+
+
+async def post_with_retries(
+    client: httpx.AsyncClient, url: str, stream: bool = False, **kwargs
+) -> httpx.Response:
+    """
+    发送POST请求，遇到429/5xx或网络错误时按指数退避重试，最多 OPENAI_MAX_RETRIES 次；
+    响应带有 Retry-After 时按其等待(不超过 OPENAI_RETRY_MAX_DELAY)。
+    重试次数用完后返回最后一次的响应或抛出最后一次的异常。
+
+    stream 为真时只读取响应头，调用方负责读取并关闭返回的响应；
+    流式响应开始后不会再重试。流式响应的读取时间远长于等待响应头，调用方需要在
+    读取完整个响应之前一直持有 _get_request_semaphore()，这里不再获取。
+    """
+    for attempt in range(settings.openai_max_retries + 1):
+        last_attempt = attempt == settings.openai_max_retries
+        try:
+            async with nullcontext() if stream else _get_request_semaphore():
+                response = await client.send(
+                    client.build_request("POST", url, **kwargs), stream=stream
+                )
+        except RETRY_EXCEPTIONS as e:
+            if last_attempt:
+                raise
+            reason, delay = type(e).__name__, _backoff_delay(attempt)
+        else:
+            if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                return response
+            if stream:
+                await response.aclose()
+            reason = str(response.status_code)
+            retry_after = _retry_after(response)
+            delay = (
+                min(retry_after, settings.openai_retry_max_delay)
+                if retry_after is not None
+                else _backoff_delay(attempt)
+            )
+
+        openai_retries.inc(reason=reason)
+        logger.warning(f"OpenAI请求失败({reason})，{delay:.1f} 秒后第 {attempt + 1} 次重试")
+        await asyncio.sleep(delay)
+
+
+def parse_analysis_content(content: str) -> Dict[str, Any]:
+    """从模型的回答中取出JSON结果，没有JSON时把文本作为分析内容返回"""
+    try:
+        if content.startswith("{") and content.endswith("}"):
+            return json.loads(content)
+
+        # 尝试提取JSON部分
+        json_start = content.find("{")
+        json_end = content.rfind("}") + 1
+        if json_start >= 0 and json_end > json_start:
+            return json.loads(content[json_start:json_end])
+    except json.JSONDecodeError:
+        pass
+    return {"analysis_text": content}
+
+
+def _error_message(response: httpx.Response) -> Optional[str]:
+    try:
+        return response.json().get("error", {}).get("message")
+    except ValueError:
+        return response.text
+
 
 class ChatGPTClient:
     """与ChatGPT API交互的客户端"""
 
     def __init__(self, api_key=None):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
-        self.api_url = "https://api.openai.com/v1/chat/completions"
+        self.api_url = settings.openai_api_url
         if not self.api_key:
             logger.error("未设置OpenAI API密钥")
             raise ValueError("未设置OpenAI API密钥")
 
+    def _request_kwargs(self, consumer_data: Dict[str, Any], stream: bool = False):
+        # 构建提示词
+        prompt = self._build_analysis_prompt(consumer_data)
+
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+        }
+
+        payload = {
+            "model": settings.openai_model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "你是一位专业的财务分析师和消费顾问，擅长分析购物数据并提供洞察和建议。",
+                },
+                {"role": "user", "content": prompt},
+            ],
+            "temperature": 0.7,
+            "max_tokens": settings.openai_max_completion_tokens,
+        }
+        if stream:
+            payload["stream"] = True
+
+        return {"headers": headers, "json": payload}
+
     async def analyze_consumer_data(
         self, consumer_data: Dict[str, Any]
     ) -> Dict[str, Any]:
 
         try:
-            # 构建提示词
-            prompt = self._build_analysis_prompt(consumer_data)
-
-            # 准备API请求
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}",
-            }
-
-            payload = {
-                "model": "gpt-3.5-turbo-16k",  # 使用支持更长上下文的模型
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "你是一位专业的财务分析师和消费顾问，擅长分析购物数据并提供洞察和建议。",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-                "temperature": 0.7,
-            }
-
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    self.api_url, headers=headers, json=payload
-                )
+            request_kwargs = self._request_kwargs(consumer_data)
 
-                response_data = response.json()
+            async with _http_session() as client:
+                response = await post_with_retries(client, self.api_url, **request_kwargs)
 
                 if response.status_code != 200:
-                    logger.error(f"ChatGPT API请求失败: {response_data}")
-                    return {
-                        "error": f"API请求失败: {response_data.get('error', {}).get('message')}"
-                    }
-
-                analysis_result = response_data["choices"][0]["message"]["content"]
-
-                try:
+                    logger.error(f"ChatGPT API请求失败: {response.text}")
+                    return {"error": f"API请求失败: {_error_message(response)}"}
 
-                    if analysis_result.startswith("{") and analysis_result.endswith(
-                        "}"
-                    ):
-                        result_json = json.loads(analysis_result)
-                    else:
-                        # 尝试提取JSON部分
-                        json_start = analysis_result.find("{")
-                        json_end = analysis_result.rfind("}") + 1
-                        if json_start >= 0 and json_end > json_start:
-                            result_json = json.loads(
-                                analysis_result[json_start:json_end]
-                            )
-                        else:
-                            # 如果没有JSON格式，将文本作为分析内容返回
-                            result_json = {"analysis_text": analysis_result}
-                except json.JSONDecodeError:
-                    result_json = {"analysis_text": analysis_result}
-
-                return {"analysis": result_json, "raw_response": analysis_result}
+                analysis_result = response.json()["choices"][0]["message"]["content"]
+                return {
+                    "analysis": parse_analysis_content(analysis_result),
+                    "raw_response": analysis_result,
+                }
 
         except Exception as e:
             logger.error(f"调用ChatGPT API分析数据时出错: {str(e)}")
             return {"error": f"分析过程中出错: {str(e)}"}
 
-    def _build_analysis_prompt(self, consumer_data: Dict[str, Any]) -> str:
+    async def stream_consumer_analysis(
+        self, consumer_data: Dict[str, Any]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        以流式(stream=true)请求分析，依次产生 {"delta": 文本片段}，结束时产生
+        与 analyze_consumer_data 相同的 {"analysis", "raw_response"}；
+        出错时产生 {"error"} 并结束。
 
-        # 修改简化数据结构
-        simplified_data = {
-            "summary": consumer_data["summary"],
-            "invoices_count": len(consumer_data["invoices"]),
-            "recent_invoices": consumer_data["invoices"][:5],  # 只包含最近5份发票
-        }
+        在整个流式响应读取完之前都占用一个 OPENAI_MAX_CONCURRENCY 名额。
+        """
+        parts = []
+        try:
+            request_kwargs = self._request_kwargs(consumer_data, stream=True)
 
-        all_items = []
-        item_counts = {}
-
-        for invoice in consumer_data["invoices"]:
-            for item in invoice.get("items", []):
-                all_items.append(
-                    {
-                        "name": item["name"],
-                        "total_price": item["total_price"],
-                        "date": invoice["date"],
-                    }
+            async with _http_session() as client, _get_request_semaphore():
+                response = await post_with_retries(
+                    client, self.api_url, stream=True, **request_kwargs
                 )
+                try:
+                    if response.status_code != 200:
+                        await response.aread()
+                        logger.error(f"ChatGPT API请求失败: {response.text}")
+                        yield {"error": f"API请求失败: {_error_message(response)}"}
+                        return
+
+                    # 每个事件为一行 "data: {...}"，以 "data: [DONE]" 结束
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:") :].strip()
+                        if data == "[DONE]":
+                            break
+                        choices = json.loads(data).get("choices") or [{}]
+                        delta = (choices[0].get("delta") or {}).get("content")
+                        if delta:
+                            parts.append(delta)
+                            yield {"delta": delta}
+                finally:
+                    await response.aclose()
 
-                item_name = item["name"].strip().upper()
-                if item_name not in item_counts:
-                    item_counts[item_name] = 0
-                item_counts[item_name] += 1
-
-        top_items = sorted(item_counts.items(), key=lambda x: x[1], reverse=True)
-
-        simplified_data["all_items"] = all_items
-        simplified_data["item_counts"] = top_items[:10]  # 前10个最常购买的商品
-
-        # 构建提示词，明确强调商品数据
-        prompt = f"""
-you are a professional financial analyst and consumer advisor, good at analyzing shopping data and providing insights and suggestions.
-
-shopping data:
-
-- summary of invoice: {consumer_data['summary']['total_invoices']}
-- summary of items: {consumer_data['summary']['total_items']}
-- summart of spent: {consumer_data['summary']['total_spent']} 欧元
-
-Items purchased and frequency:
-{json.dumps(simplified_data['item_counts'], indent=2, ensure_ascii=False)}
-
-Recent invoice details:
-{json.dumps(simplified_data['recent_invoices'], indent=2, ensure_ascii=False)}
-
-Please pay special attention to the following aspects:
-1. Basic consumption pattern analysis: overall consumption, average consumption amount, shopping frequency, etc.
-2. Product analysis: most frequently purchased products and their category distribution
-- Please infer possible categories based on product names (such as fruits and vegetables, meat, beverages, etc.)
-3. Consumption habit insights: consumption habit analysis based on shopping time, store selection, etc.
-4. Personalized suggestions: how to optimize consumption, possible money-saving strategies, etc.
-
-Please return the analysis results in JSON format with the following structure:
-{{
-  "basic_analysis": {{
-    "spending_pattern": "Describe overall consumption patterns",
-    "avg_spending": "average consumption amount",
-    "shopping_frequency": "frequency of shopping",
-  }},
-  "items_analysis": {{
-    "frequently_bought": ["most frequently bought products"],
-    "possible_categories": {{"category decription": "Proportion/Number of products"}}
-  }},
-  "shopping_habits": {{
-    "preferred_stores": ["Preferred Store"],
-    "time_patterns": "model of shopping time",
-  }},
-  "recommendations": [
-    "suggestion 1",
-    "suggestion 2",
-    "..."
-  ]
-}}
-"""
-        return prompt
+        except Exception as e:
+            logger.error(f"调用ChatGPT API分析数据时出错: {str(e)}")
+            yield {"error": f"分析过程中出错: {str(e)}"}
+            return
+
+        analysis_result = "".join(parts)
+        yield {
+            "analysis": parse_analysis_content(analysis_result),
+            "raw_response": analysis_result,
+        }
+
+    def _build_analysis_prompt(self, consumer_data: Dict[str, Any]) -> str:
+        return build_analysis_prompt(consumer_data)
@@ -1,17 +1,22 @@
 import logging
 from typing import Dict, Any, List
 import json
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 import uuid
 
+from app.crud.spending_summary import get_item_stats, get_spending_summary, get_top_items
+from app.utils.item_categories import aggregate_by_category
 from app.models.invoice import Invoice
-from app.models.invoice_item import InvoiceItem
 
 logger = logging.getLogger(__name__)
 
 
 class ConsumerDataExtractor:
 
+    # 除汇总数据外只读取最近的几张发票，提示词最终包含多少由 token 预算决定
+    recent_invoice_limit = 5
+    top_item_limit = 30
+
     def __init__(self, user_id, db: Session):
         self.user_id = user_id
         self.db = db
@@ -20,38 +25,21 @@ class ConsumerDataExtractor:
 
         try:
 
-            invoices = (
-                self.db.query(Invoice)
-                .filter(Invoice.user_id == self.user_id)
-                .order_by(Invoice.date.desc())
-                .all()
-            )
+            summary = get_spending_summary(self.db, self.user_id)
 
-            if not invoices:
+            if not summary.invoice_count:
                 logger.warning(f"用户 {self.user_id} 没有发票记录")
                 return {"error": "没有找到发票数据"}
 
-            invoice_ids = [invoice.id for invoice in invoices]
-
-            items = (
-                self.db.query(InvoiceItem)
-                .filter(InvoiceItem.invoice_id.in_(invoice_ids))
+            invoices = (
+                self.db.query(Invoice)
+                .options(selectinload(Invoice.items))
+                .filter(Invoice.user_id == self.user_id)
+                .order_by(Invoice.date.desc())
+                .limit(self.recent_invoice_limit)
                 .all()
             )
 
-            items_by_invoice = {}
-            for item in items:
-                if item.invoice_id not in items_by_invoice:
-                    items_by_invoice[item.invoice_id] = []
-                items_by_invoice[item.invoice_id].append(
-                    {
-                        "name": item.name,
-                        "quantity": item.quantity,
-                        "unit_price": item.unit_price,
-                        "total_price": item.total_price,
-                    }
-                )
-
             formatted_invoices = []
             for invoice in invoices:
                 invoice_data = {
@@ -62,25 +50,41 @@ class ConsumerDataExtractor:
                     "store_address": invoice.store_address,
                     "total": invoice.total,
                     "payment_method": invoice.payment_method,
-                    "items": items_by_invoice.get(invoice.id, []),
+                    "items": [
+                        {
+                            "name": item.name,
+                            "quantity": item.quantity,
+                            "unit_price": item.unit_price,
+                            "total_price": item.total_price,
+                        }
+                        for item in invoice.items
+                    ],
                 }
                 formatted_invoices.append(invoice_data)
 
-            total_spent = sum(i.total for i in invoices if i.total is not None)
-            total_items = len(items)
+            top_items = get_top_items(self.db, self.user_id, self.top_item_limit)
+            by_category = aggregate_by_category(get_item_stats(self.db, self.user_id))
 
             consumer_data = {
                 "user_id": str(self.user_id),
                 "invoices": formatted_invoices,
                 "summary": {
-                    "total_invoices": len(invoices),
-                    "total_items": total_items,
-                    "total_spent": round(total_spent, 2),
+                    "total_invoices": summary.invoice_count,
+                    "total_items": summary.item_count,
+                    "total_spent": round(summary.total_spent, 2),
+                    "by_brand": summary.by_brand,
+                    "by_month": summary.by_month,
+                    "by_category": by_category,
+                    "top_items": [
+                        [stat.name, stat.purchase_count, round(stat.total_spent, 2)]
+                        for stat in top_items
+                    ],
                 },
             }
 
             logger.info(
-                f"已提取用户 {self.user_id} 的 {len(invoices)} 份发票和 {total_items} 个商品项"
+                f"已提取用户 {self.user_id} 的消费汇总({summary.invoice_count} 份发票)"
+                f"和最近 {len(invoices)} 份发票"
             )
             return consumer_data
 
@@ -0,0 +1,111 @@
+"""
+图片发票的OCR
+
+照片先用 Pillow 预处理(灰度、纠偏、二值化)，再通过标准输入交给 tesseract，
+一次调用同时得到文本和每个单词的位置(TSV输出)，不生成中间PDF或临时文件。
+"""
+
+import csv
+import io
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# 纠偏时搜索的角度范围和步长(度)
+DESKEW_MAX_ANGLE = 5.0
+DESKEW_STEP = 0.5
+# 估计倾斜角度时先缩小到这个宽度，角度搜索的开销与原图大小无关
+DESKEW_SAMPLE_WIDTH = 800
+
+TESSERACT_ARGS = ["tesseract", "stdin", "stdout", "-l", "deu+eng", "--psm", "4", "tsv"]
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """按Otsu方法计算灰度图的二值化阈值"""
+    histogram = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = gray.size
+    weights = np.cumsum(histogram)
+    means = np.cumsum(histogram * np.arange(256))
+    background = weights[:-1]
+    foreground = total - background
+    valid = (background > 0) & (foreground > 0)
+    if not valid.any():
+        return 128
+    mean_background = means[:-1] / np.where(valid, background, 1)
+    mean_foreground = (means[-1] - means[:-1]) / np.where(valid, foreground, 1)
+    variance = background * foreground * (mean_background - mean_foreground) ** 2
+    return int(np.argmax(np.where(valid, variance, -1)))
+
+
+def estimate_skew(binary: Image.Image) -> float:
+    """
+    估计文字行的倾斜角度：把图片按候选角度旋转，文字行水平时
+    每行黑色像素数的方差最大。
+    """
+    if binary.width > DESKEW_SAMPLE_WIDTH:
+        height = max(1, round(binary.height * DESKEW_SAMPLE_WIDTH / binary.width))
+        binary = binary.resize((DESKEW_SAMPLE_WIDTH, height))
+    ink = ImageOps.invert(binary)
+
+    best_angle, best_score = 0.0, -1.0
+    steps = int(DESKEW_MAX_ANGLE / DESKEW_STEP)
+    for step in range(-steps, steps + 1):
+        angle = step * DESKEW_STEP
+        rows = np.asarray(ink.rotate(angle, expand=True), dtype=np.float64).sum(axis=1)
+        score = float(np.var(rows))
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def preprocess_image(image: Image.Image) -> Image.Image:
+    """灰度化、纠偏和二值化，返回黑字白底的图片"""
+    gray = ImageOps.autocontrast(ImageOps.grayscale(ImageOps.exif_transpose(image)))
+    threshold = otsu_threshold(np.asarray(gray))
+    binary = gray.point(lambda value: 255 if value > threshold else 0)
+
+    angle = estimate_skew(binary)
+    if angle:
+        binary = binary.rotate(angle, expand=True, fillcolor=255)
+    return binary.convert("1")
+
+
+def encode_png(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def parse_tesseract_tsv(tsv: str) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    解析 tesseract 的TSV输出，返回按行拼接的文本和单词列表，
+    每个单词包含 text, left, top, width, height, conf, line。
+    """
+    words = []
+    lines: List[List[str]] = []
+    line_numbers: Dict[Tuple[int, int, int, int], int] = {}
+    for row in csv.DictReader(io.StringIO(tsv), delimiter="\t", quoting=csv.QUOTE_NONE):
+        text = (row.get("text") or "").strip()
+        if row.get("level") != "5" or not text:
+            continue
+        key = tuple(
+            int(row[name]) for name in ("page_num", "block_num", "par_num", "line_num")
+        )
+        if key not in line_numbers:
+            line_numbers[key] = len(lines)
+            lines.append([])
+        line = line_numbers[key]
+        lines[line].append(text)
+        words.append(
+            {
+                "text": text,
+                "left": int(row["left"]),
+                "top": int(row["top"]),
+                "width": int(row["width"]),
+                "height": int(row["height"]),
+                "conf": float(row["conf"]),
+                "line": line,
+            }
+        )
+    return "\n".join(" ".join(line) for line in lines), words
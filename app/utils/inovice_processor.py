@@ -1,131 +1,392 @@
 import os
+import fcntl
 import subprocess
-import re
 import json
-from datetime import datetime
 import pdfplumber
 import logging
-from typing import Dict, Any
+import re
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+
+from PIL import Image
+
+from app.core.config import settings
+from app.utils.image_ocr import (
+    TESSERACT_ARGS,
+    encode_png,
+    parse_tesseract_tsv,
+    preprocess_image,
+)
+from app.utils.metrics import registry
+from app.utils.receipt_parsers import extract_invoice_data
+from app.utils.stage_timings import StageTimings
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+text_layer_probes = registry.counter(
+    "pdf_text_layer_probes_total",
+    "PDF uploads checked for an existing text layer before OCR",
+    ["result"],
+)
+
+
+def _fast_path_ratio(values) -> Optional[float]:
+    probes = values.get("pdf_text_layer_probes_total", {})
+    usable = probes.get(("usable",), 0)
+    total = usable + probes.get(("unusable",), 0)
+    return round(usable / total, 4) if total else None
+
+
+registry.derived_gauge(
+    "pdf_text_layer_fast_path_ratio",
+    "Share of PDF uploads parsed from their own text layer without OCR",
+    _fast_path_ratio,
+)
+
+# pdfplumber 对没有Unicode映射的字形输出 (cid:123)
+_CID_PATTERN = re.compile(r"\(cid:\d+\)")
+
+
+def is_usable_text_layer(text: str) -> bool:
+    """文字层是否可以直接解析：字符足够多、含有数字，且不是无法映射的字形编码"""
+    if not text:
+        return False
+    chars = [c for c in _CID_PATTERN.sub("\ufffd", text) if not c.isspace()]
+    if len(chars) < settings.pdf_text_layer_min_chars:
+        return False
+    if not any(c.isdigit() for c in chars):
+        return False
+    unreadable = sum(1 for c in chars if c == "\ufffd" or not c.isprintable())
+    return unreadable / len(chars) < 0.05
+
+
+def _run_command(
+    args: List[str], timeout: Optional[float], input_data: Optional[bytes] = None
+) -> str:
+    result = subprocess.run(
+        args,
+        input=input_data,
+        capture_output=True,
+        timeout=timeout,
+    )
+    stdout = result.stdout.decode(errors="replace")
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(
+            result.returncode,
+            args,
+            output=stdout,
+            stderr=result.stderr.decode(errors="replace"),
+        )
+    return stdout
+
+
+def empty_invoice_data() -> Dict[str, Any]:
+    return {
+        "markt_name": None,
+        "store_address": None,
+        "telephone": None,
+        "uid_number": None,
+        "items": [],
+        "total": None,
+        "date": None,
+        "time": None,
+        "payment_method": None,
+        "receipt_nr": None,
+        "document_nr": None,
+        "brand": None,
+        "markt_id": None,
+    }
+
+
+def parse_invoice_text(text: str) -> Dict[str, Any]:
+    """从文本中提取发票字段和商品项目，没有提取到的字段为None"""
+    invoice_data = empty_invoice_data()
+    if not text:
+        logger.warning("no text extracted from the invoice")
+        return invoice_data
+
+    invoice_data.update(extract_invoice_data(text))
+    logger.info(f"共提取到 {len(invoice_data['items'])} 个商品项目")
+    return invoice_data
+
+
+def artifact_paths(file_path: str) -> List[str]:
+    """
+    处理过程中在上传文件旁边缓存的中间结果(OCR后的PDF、提取的文本、图片OCR的单词位置)
+    以及锁文件
+    """
+    base_path = os.path.splitext(file_path)[0]
+    return [
+        f"{base_path}_ocr.pdf",
+        f"{base_path}_ocr.txt",
+        f"{base_path}_ocr_words.json",
+        f"{base_path}_ocr.lock",
+    ]
+
+
+@contextmanager
+def ocr_lock(file_path: str):
+    """
+    对上传文件旁边的锁文件加 flock，同一个磁盘文件(相同内容的上传)同一时间只有一个
+    进程在处理。等锁和处理期间不占用数据库连接，持有锁的进程退出时锁自动释放。
+    """
+    lock_path = artifact_paths(file_path)[-1]
+    while True:
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            # 等锁期间锁文件可能随上传文件一起被删除，锁住的是已删除的文件时重新打开
+            try:
+                current = os.path.samestat(os.fstat(fd), os.stat(lock_path))
+            except FileNotFoundError:
+                current = False
+        except BaseException:
+            os.close(fd)
+            raise
+        if current:
+            break
+        os.close(fd)
+
+    try:
+        yield
+    finally:
+        os.close(fd)
+
+
+def _temp_path(path: str) -> str:
+    # 每次写入使用唯一的临时文件，完成后 os.replace 到最终路径，
+    # 并发或中途被杀掉的写入不会留下不完整的缓存
+    base_path, extension = os.path.splitext(path)
+    return f"{base_path}.{uuid.uuid4().hex}.tmp{extension}"
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _write_cache(path: str, content: str):
+    tmp_path = _temp_path(path)
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.error(f"failed to write cache {path}: {str(e)}")
+        _remove_file(tmp_path)
 
-class InvoiceProcessor:
 
-    def __init__(self, file_path: str):
+class InvoiceProcessor:
+    """
+    发票处理分为几个可以单独调用的阶段：
+
+        probe_text_layer()  PDF已有可用文字层(电子小票)时直接取文本，跳过OCR
+        ocr_pdf()       PDF的OCR (ocrmypdf)，再用 extract_text() 提取文本
+        extract_text()  用 pdfplumber 从PDF中提取文本
+        ocr_image()     图片预处理后直接用 tesseract 识别，返回文本和单词位置
+        parse()         用解析规则从文本中提取发票字段和商品项目
+
+    OCR成功后生成的PDF、文本和单词位置都缓存在上传文件旁边(文件按内容哈希命名，
+    所以缓存可以在相同内容的文件之间共享)。缓存文件先写到唯一的临时路径，成功后
+    才替换到最终路径。get_text() 优先使用已缓存的文本，后续步骤失败重试或解析规则
+    升级时不需要重新OCR。图片的单词位置用 load_word_boxes() 读取。
+
+    各阶段的耗时记录在 timings 中(见 app.utils.stage_timings)。
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        timeout: Optional[float] = None,
+        timings: Optional[StageTimings] = None,
+    ):
         self.file_path = file_path
+        self.timeout = timeout if timeout is not None else settings.ocr_timeout_seconds
         self.file_extension = os.path.splitext(file_path)[1].lower()
-        self.ocr_output_path = None
+        self.ocr_output_path, self.text_path, self.word_boxes_path, _ = artifact_paths(
+            file_path
+        )
+        self.ocr_succeeded = False
+        self.used_text_layer = False
+        self.timings = timings if timings is not None else StageTimings()
         self.extracted_text = ""
-        self.extracted_data = {
-            "markt_name": None,
-            "store_address": None,
-            "telephone": None,
-            "uid_number": None,
-            "items": [],
-            "total": None,
-            "date": None,
-            "time": None,
-            "payment_method": None,
-            "receipt_nr": None,
-            "document_nr": None,
-            "brand": None,
-            "markt_id": None,
-        }
+        self.extracted_data = empty_invoice_data()
+
+    def _is_supported(self) -> bool:
+        if self.file_extension in [".pdf", ".jpg", ".jpeg", ".png"]:
+            return True
+        logger.error(f"not support file type: {self.file_extension}")
+        return False
 
     def process(self) -> Dict[str, Any]:
 
         try:
-
-            if self.file_extension == ".pdf":
-                self._process_pdf()
-            elif self.file_extension in [".jpg", ".jpeg", ".png"]:
-                self._process_image()
-            else:
-                logger.error(f"not support file type: {self.file_extension}")
+            if not self._is_supported():
                 return self.extracted_data
 
-            if self.extracted_text:
-                self._extract_invoice_data()
-
-            return self.extracted_data
+            self.get_text()
+            return self.parse(self.extracted_text)
 
         except Exception as e:
             logger.error(f"error processing invoice: {str(e)}")
             return self.extracted_data
 
-    def _process_pdf(self):
+    def get_text(self) -> str:
+        """返回发票文本：有缓存时直接读取，否则执行OCR和文本提取"""
+        text = self.load_text()
+        if text is None:
+            text = self.probe_text_layer()
+        if text is None:
+            if self.file_extension == ".pdf":
+                text = self.ocr_pdf()
+            else:
+                text, word_boxes = self.ocr_image()
+                self.save_word_boxes(word_boxes)
+            self.save_text(text)
+        self.extracted_text = text
+        return text
+
+    def load_text(self) -> Optional[str]:
+        """读取缓存的文本，没有缓存时返回None"""
+        try:
+            with open(self.text_path, encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+        logger.info(f"使用缓存的文本 {self.text_path}")
+        return text
+
+    def save_text(self, text: str):
+        """缓存提取的文本；OCR失败时的降级结果不缓存，下次仍会重新OCR"""
+        if not text or not (self.ocr_succeeded or self.used_text_layer):
+            return
+        _write_cache(self.text_path, text)
 
-        base_path = os.path.splitext(self.file_path)[0]
-        self.ocr_output_path = f"{base_path}_ocr.pdf"
+    def load_word_boxes(self) -> Optional[List[Dict[str, Any]]]:
+        """读取缓存的图片OCR单词位置(见 parse_tesseract_tsv)，没有缓存时返回None"""
+        try:
+            with open(self.word_boxes_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save_word_boxes(self, word_boxes: List[Dict[str, Any]]):
+        if word_boxes and self.ocr_succeeded:
+            _write_cache(self.word_boxes_path, json.dumps(word_boxes, ensure_ascii=False))
+
+    def probe_text_layer(self) -> Optional[str]:
+        """
+        直接读取PDF自带的文字层。文本可用时返回文本，否则返回None，需要执行OCR。
+        """
+        if self.file_extension != ".pdf":
+            return None
+
+        with self.timings.time("text_layer"):
+            text = self._read_pdf_text(self.file_path)
+        if not is_usable_text_layer(text):
+            text_layer_probes.inc(result="unusable")
+            return None
+
+        text_layer_probes.inc(result="usable")
+        logger.info(f"PDF已有可用文字层，跳过OCR: {self.file_path}")
+        self.used_text_layer = True
+        self.save_text(text)
+        return text
+
+    def _cached_ocr_output(self) -> bool:
+        if os.path.exists(self.ocr_output_path) and os.path.getsize(self.ocr_output_path):
+            logger.info(f"使用缓存的OCR结果 {self.ocr_output_path}")
+            self.ocr_succeeded = True
+            return True
+        return False
+
+    def _discard_cached_ocr_output(self):
+        # 缓存的OCR结果提取不到文本(例如旧版本中途被中断的输出)，删除后重新OCR
+        logger.warning(f"缓存的OCR结果无法使用，重新OCR: {self.ocr_output_path}")
+        self.ocr_succeeded = False
+        _remove_file(self.ocr_output_path)
+
+    def ocr_pdf(self) -> str:
+        """对PDF执行OCR并提取文本，OCR失败时从原文件提取"""
+        if self._cached_ocr_output():
+            text = self.extract_text(self.ocr_output_path)
+            if text:
+                return text
+            self._discard_cached_ocr_output()
+        return self.extract_text(self._process_pdf())
+
+    def parse(self, text: str) -> Dict[str, Any]:
+        """从文本中提取发票字段和商品项目"""
+        self.extracted_text = text
+        with self.timings.time("parse"):
+            self.extracted_data = parse_invoice_text(text)
+        return self.extracted_data
+
+    def _ocrmypdf_args(self, output_path: str) -> List[str]:
+        return [
+            "ocrmypdf",
+            "--skip-text",
+            "--deskew",
+            "--clean",
+            "--language",
+            "deu+eng",
+            self.file_path,
+            output_path,
+        ]
 
+    def _process_pdf(self) -> str:
+        # ocrmypdf写到临时文件，成功后才替换到缓存路径
+        tmp_path = _temp_path(self.ocr_output_path)
         try:
 
-            result = subprocess.run(
-                [
-                    "ocrmypdf",
-                    "--skip-text",
-                    "--deskew",
-                    "--clean",
-                    "--language",
-                    "deu+eng",
-                    self.file_path,
-                    self.ocr_output_path,
-                ],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
+            with self.timings.time("ocrmypdf"):
+                stdout = _run_command(self._ocrmypdf_args(tmp_path), self.timeout)
+            os.replace(tmp_path, self.ocr_output_path)
 
-            logger.info(f"ocr process successful: {result.stdout}")
+            logger.info(f"ocr process successful: {stdout}")
+            self.ocr_succeeded = True
+            return self.ocr_output_path
 
-            self._extract_text_from_pdf(self.ocr_output_path)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+            logger.error(f"ocr process failed: {getattr(e, 'stderr', None) or e}")
 
-        except subprocess.CalledProcessError as e:
-            logger.error(f"ocr process failed: {e.stderr}")
+            return self.file_path
+        finally:
+            _remove_file(tmp_path)
 
-            self._extract_text_from_pdf(self.file_path)
+    def _load_image_png(self) -> bytes:
+        with self.timings.time("image_preprocess"), Image.open(self.file_path) as image:
+            return encode_png(preprocess_image(image))
 
-    def _process_image(self):
+    def _read_tesseract_output(self, tsv: str) -> Tuple[str, List[Dict[str, Any]]]:
+        text, word_boxes = parse_tesseract_tsv(tsv)
+        self.ocr_succeeded = True
+        logger.info(f"image ocr successful, {len(word_boxes)} words")
+        return text, word_boxes
 
-        base_path = os.path.splitext(self.file_path)[0]
-        temp_pdf_path = f"{base_path}_temp.pdf"
-        self.ocr_output_path = f"{base_path}_ocr.pdf"
+    def ocr_image(self) -> Tuple[str, List[Dict[str, Any]]]:
+        """预处理图片并用 tesseract 识别，返回文本和单词位置，失败时都为空"""
 
         try:
+            png = self._load_image_png()
+            with self.timings.time("tesseract"):
+                tsv = _run_command(TESSERACT_ARGS, self.timeout, input_data=png)
+            return self._read_tesseract_output(tsv)
+
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+            logger.error(f"image process failed: {getattr(e, 'stderr', None) or e}")
+            return "", []
 
-            result = subprocess.run(
-                ["convert", self.file_path, temp_pdf_path],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-
-            result = subprocess.run(
-                [
-                    "ocrmypdf",
-                    "--deskew",
-                    "--clean",
-                    "--language",
-                    "deu+eng",
-                    temp_pdf_path,
-                    self.ocr_output_path,
-                ],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-
-            self._extract_text_from_pdf(self.ocr_output_path)
-
-            if os.path.exists(temp_pdf_path):
-                os.remove(temp_pdf_path)
-
-        except subprocess.CalledProcessError as e:
-            logger.error(f"image process failed: {e.stderr}")
-
-    def _extract_text_from_pdf(self, pdf_path):
+    def extract_text(self, pdf_path: str) -> str:
+        """从PDF的文字层提取文本，失败时返回空字符串"""
+        with self.timings.time("pdfplumber"):
+            return self._read_pdf_text(pdf_path)
+
+    def _read_pdf_text(self, pdf_path: str) -> str:
 
         try:
             text_parts = []
@@ -134,227 +395,9 @@ class InvoiceProcessor:
                     text = page.extract_text() or ""
                     text_parts.append(text)
 
-            self.extracted_text = "\n".join(text_parts)
-            logger.info(
-                f"text extracted successful,total {len(self.extracted_text)} characters"
-            )
+            text = "\n".join(text_parts)
+            logger.info(f"text extracted successful,total {len(text)} characters")
+            return text
         except Exception as e:
             logger.error(f"text extracted failed: {str(e)}")
-
-    def _extract_invoice_data(self):
-
-        if not self.extracted_text:
-            logger.warning("no text extracted from the invoice")
-            return
-
-        text = self.extracted_text
-
-        if re.search(r"REWE", text, re.IGNORECASE):
-            self.extracted_data["brand"] = "REWE"
-        elif re.search(r"Kaufland", text, re.IGNORECASE):
-            self.extracted_data["brand"] = "Kaufland"
-        elif re.search(r"ALDI", text, re.IGNORECASE):
-            self.extracted_data["brand"] = "ALDI"
-        elif re.search(r"LIDL", text, re.IGNORECASE):
-            self.extracted_data["brand"] = "LIDL"
-        elif re.search(r"Edeka", text, re.IGNORECASE):
-            self.extracted_data["brand"] = "Edeka"
-
-        markt_match = re.search(r"REWE\s+([A-Za-z0-9\s.\-]+)(?=\n|$)", text)
-        if markt_match:
-            self.extracted_data["markt_name"] = markt_match.group(1).strip()
-
-        address_match = re.search(
-            r"(?<=\n)([A-Za-zäöüÄÖÜß\s.\-]+\s\d+[\s,]*\n\d{5}\s+[A-Za-zäöüÄÖÜß\s.\-]+)",
-            text,
-        )
-        if address_match:
-            self.extracted_data["store_address"] = address_match.group(1).strip()
-
-        phone_match = re.search(
-            r"(?:Tel|Telefon|Tel\.)[:\s]+([0-9\s/\-+]+)", text, re.IGNORECASE
-        )
-        if phone_match:
-            self.extracted_data["telephone"] = phone_match.group(1).strip()
-
-        uid_match = re.search(
-            r"(?:UID-Nr|USt-IdNr|Steuernummer)[:\s.]+([A-Z0-9\s]+)", text, re.IGNORECASE
-        )
-        if uid_match:
-            self.extracted_data["uid_number"] = uid_match.group(1).strip()
-
-        markt_id_match = re.search(
-            r"(?:Markt-ID|Filial-ID|Markt)[:\s]+(\d+)", text, re.IGNORECASE
-        )
-        if markt_id_match:
-            self.extracted_data["markt_id"] = markt_id_match.group(1).strip()
-
-        receipt_match = re.search(
-            r"(?:Bon-Nr|Bon|Beleg)[:\s.]+([A-Z0-9\-]+)", text, re.IGNORECASE
-        )
-        if receipt_match:
-            self.extracted_data["receipt_nr"] = receipt_match.group(1).strip()
-
-        doc_match = re.search(
-            r"(?:Beleg-Nr|Belegnummer)[:\s.]+([A-Z0-9\-]+)", text, re.IGNORECASE
-        )
-        if doc_match and not self.extracted_data["receipt_nr"]:
-            self.extracted_data["document_nr"] = doc_match.group(1).strip()
-
-        date_match = re.search(r"(\d{1,2})[\.-](\d{1,2})[\.-](\d{2,4})", text)
-        if date_match:
-            day, month, year = date_match.groups()
-            if len(year) == 2:
-                year = "20" + year
-            try:
-                self.extracted_data["date"] = datetime(int(year), int(month), int(day))
-            except ValueError:
-                pass
-
-        time_match = re.search(r"(\d{1,2}):(\d{2})(?:\s*Uhr)?", text)
-        if time_match:
-            self.extracted_data["time"] = f"{time_match.group(1)}:{time_match.group(2)}"
-
-        payment_methods = [
-            "EC-Cash",
-            "Girocard",
-            "Kreditkarte",
-            "Mastercard",
-            "Visa",
-            "American Express",
-            "BAR",
-            "Bar",
-            "Bargeld",
-        ]
-        for method in payment_methods:
-            if re.search(rf"\b{method}\b", text, re.IGNORECASE):
-                self.extracted_data["payment_method"] = method
-                break
-
-        total_match = re.search(
-            r"(?:SUMME|Summe|Gesamtbetrag|Gesamt|Total)[:\s]*(\d+[,.]\d{2})",
-            text,
-            re.IGNORECASE,
-        )
-        if total_match:
-            try:
-                self.extracted_data["total"] = float(
-                    total_match.group(1).replace(",", ".")
-                )
-            except ValueError:
-                pass
-
-        self._extract_items_rewe()
-
-    def _extract_items_rewe(self):
-
-        lines = self.extracted_text.split("\n")
-        items = []
-
-        start_markers = [
-            r"^\s*\d+\s+Artikel",
-            r"Ihre\s+Einkäufe",
-            r"^Pos\.\s+Artikel",
-            r"Artikelbezeichnung",
-            r"mit Pick & Go",
-            r"UID Nr\.",
-            r"EUR$",
-        ]
-
-        end_markers = [
-            r"^\s*SUMME\s+EUR",
-            r"^\s*Gesamtbetrag",
-            r"^\s*Summe\s+EUR",
-            r"^\s*zu zahlen",
-            r"^-{6,}",
-        ]
-
-        start_index = -1
-        end_index = -1
-
-        for i, line in enumerate(lines):
-            for pattern in start_markers:
-                if re.search(pattern, line, re.IGNORECASE):
-                    start_index = i
-                    logger.info(f"找到商品区域开始标记: '{line}' at line {i}")
-                    break
-            if start_index != -1:
-                break
-
-        if start_index != -1:
-            start_index += 1
-
-        if start_index != -1:
-            for i in range(start_index + 1, len(lines)):
-                for pattern in end_markers:
-                    if re.search(pattern, lines[i], re.IGNORECASE):
-                        end_index = i
-                        logger.info(f"找到商品区域结束标记: '{lines[i]}' at line {i}")
-                        break
-                if end_index != -1:
-                    break
-
-        if start_index == -1:
-            logger.warning("未找到商品区域开始标记")
-        if end_index == -1:
-            logger.warning("未找到商品区域结束标记")
-
-        if start_index != -1 and end_index != -1:
-            logger.info(f"商品区域范围: {start_index} 到 {end_index-1}")
-
-            logger.debug("商品区域内容:")
-            for i in range(start_index, end_index):
-                logger.debug(f"  行 {i}: {lines[i]}")
-
-            for i in range(start_index, end_index):
-                line = lines[i].strip()
-                if not line or re.search(r"www\.|http|^EUR$", line, re.IGNORECASE):
-                    continue
-
-                rewe_item_match = re.search(
-                    r"(.+?)\s+(\d+[,.]\d{1,2})\s*([A-Z])$", line
-                )
-                if rewe_item_match:
-                    name, price, tax_category = rewe_item_match.groups()
-                    items.append(
-                        {
-                            "name": name.strip(),
-                            "total_price": float(price.replace(",", ".")),
-                        }
-                    )
-                    logger.info(f"匹配到REWE商品: {name.strip()}, 价格: {price}")
-                    continue
-
-                item_match = re.search(
-                    r"(.+?)\s+(\d+(?:[,.]\d+)?)\s*[xX]\s*(\d+[,.]\d{2})\s+(\d+[,.]\d{2})",
-                    line,
-                )
-                if item_match:
-                    name, quantity, unit_price, total_price = item_match.groups()
-                    items.append(
-                        {
-                            "name": name.strip(),
-                            "quantity": float(quantity.replace(",", ".")),
-                            "unit_price": float(unit_price.replace(",", ".")),
-                            "total_price": float(total_price.replace(",", ".")),
-                        }
-                    )
-                    continue
-
-                price_match = re.search(r"(.+?)\s+(\d+[,.]\d{2})$", line)
-                if price_match:
-                    name, price = price_match.groups()
-
-                    if not re.search(
-                        r"MwSt\.|Rabatt|Pfand|Steuer|Netto|Brutto", name, re.IGNORECASE
-                    ):
-                        items.append(
-                            {
-                                "name": name.strip(),
-                                "total_price": float(price.replace(",", ".")),
-                            }
-                        )
-                        continue
-
-        logger.info(f"共提取到 {len(items)} 个商品项目")
-        self.extracted_data["items"] = items
+            return ""
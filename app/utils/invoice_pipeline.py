@@ -0,0 +1,142 @@
+import logging
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy.orm import Session
+
+from app.crud.files import get_file, save_processing_timings, update_file
+from app.crud.invoice import create_invoice_with_items, get_invoice_by_file
+from app.models.files import File
+from app.schemas.files import FileUpdate
+from app.schemas.invoice import InvoiceCreate
+from app.schemas.invoice_item import InvoiceItemBase
+from app.utils.inovice_processor import (
+    InvoiceProcessor,
+    ocr_lock,
+    parse_invoice_text,
+)
+from app.utils.ocr_cache import INVOICE_FIELDS, lookup_ocr_result, store_ocr_result
+from app.utils.stage_timings import StageTimings
+
+logger = logging.getLogger(__name__)
+
+
+def build_invoice_items(items: Sequence[Dict[str, Any]]) -> List[InvoiceItemBase]:
+    """把解析出的商品项目转换为 InvoiceItemBase，跳过缺少名称或总价的项目"""
+    items_in = []
+    for idx, item_data in enumerate(items):
+        if "name" in item_data and "total_price" in item_data:
+            items_in.append(
+                InvoiceItemBase(
+                    name=item_data["name"],
+                    quantity=item_data.get("quantity"),
+                    unit_price=item_data.get("unit_price"),
+                    total_price=item_data["total_price"],
+                )
+            )
+        else:
+            logger.warning(f"商品项目 {idx+1} 缺少必要字段: {item_data}")
+    return items_in
+
+
+def ingest(db: Session, file_id: uuid.UUID) -> Optional[File]:
+    """读取待处理的文件记录；文件不存在或已经有发票时返回None"""
+    file = get_file(db, file_id)
+    if not file:
+        return None
+
+    existing_invoice = get_invoice_by_file(db, file_id)
+    if existing_invoice:
+        logger.info(f"文件 {file_id} 的发票记录已存在，跳过处理")
+        update_file(db, file_id, FileUpdate(is_processed=True))
+        return None
+
+    return file
+
+
+def extract_text(file: File, timings: Optional[StageTimings] = None) -> str:
+    """OCR和文本提取，已缓存文本时直接返回缓存"""
+    return InvoiceProcessor(file.file_path, timings=timings).get_text()
+
+
+def parse(ocr_text: str, timings: Optional[StageTimings] = None) -> Dict[str, Any]:
+    """从文本中解析发票字段和商品项目"""
+    timings = timings if timings is not None else StageTimings()
+    with timings.time("parse"):
+        return parse_invoice_text(ocr_text)
+
+
+def persist(
+    db: Session, file: File, ocr_text: str, invoice_data: Dict[str, Any]
+) -> uuid.UUID:
+    """在一个事务中保存发票、全部商品项目并将文件标记为已处理"""
+    items = invoice_data.get("items") or []
+    logger.info(f"从OCR中提取到 {len(items)} 个商品项目")
+
+    invoice_create = InvoiceCreate(
+        file_id=file.id,
+        user_id=file.user_id,
+        ocr_text=ocr_text,
+        is_processed=True,
+        **{k: v for k, v in invoice_data.items() if k in INVOICE_FIELDS},
+    )
+
+    if not items:
+        logger.warning("没有提取到任何商品项目")
+
+    items_in = build_invoice_items(items)
+
+    invoice_id = create_invoice_with_items(db, invoice_create, items_in)
+    logger.info(f"成功创建发票记录 ID: {invoice_id}，包含 {len(items_in)} 个商品项目")
+    return invoice_id
+
+
+def process_file(db: Session, file_id: uuid.UUID):
+    """
+    对上传的文件执行完整的处理流程，由OCR worker调用：
+
+        ingest -> extract_text (OCR + 文本提取) -> parse -> persist
+
+    各阶段可以单独调用，各阶段耗时保存在 File.processing_timings。
+
+    OCR结果和文本缓存在上传文件旁边，某一步失败后重试时已完成的OCR不会重新执行。
+    相同内容的文件共用磁盘文件和这些缓存，按磁盘文件加锁(ocr_lock)逐个处理，
+    排在后面的任务拿到锁时直接复用前一个任务的结果。等锁和OCR期间不持有数据库事务。
+    """
+
+    file = get_file(db, file_id)
+    if not file:
+        return
+    file_path = file.file_path
+    db.commit()
+
+    with ocr_lock(file_path):
+        # 拿到锁之后再检查，同一文件的另一个任务可能已经保存了发票
+        file = ingest(db, file_id)
+        if file is None:
+            return
+
+        timings = StageTimings()
+
+        # 相同内容的文件已经处理过时直接复用OCR和解析结果
+        cached = lookup_ocr_result(db, file.content_hash) if file.content_hash else None
+
+        # 文件记录脱离会话，结束读取用的事务，OCR期间连接归还连接池
+        db.expunge(file)
+        db.commit()
+
+        if cached is not None:
+            ocr_text, invoice_data = cached
+            logger.info(f"文件 {file_id} 命中OCR缓存，跳过OCR")
+        else:
+            ocr_text = extract_text(file, timings)
+            invoice_data = parse(ocr_text, timings)
+            if file.content_hash:
+                store_ocr_result(file.content_hash, ocr_text, invoice_data)
+
+        with timings.time("persist"):
+            persist(db, file, ocr_text, invoice_data)
+
+    processing_timings = {**(file.processing_timings or {}), **timings.timings}
+    save_processing_timings(db, file_id, processing_timings)
+    logger.info(f"文件 {file_id} 处理耗时(秒): {processing_timings}")
@@ -0,0 +1,82 @@
+"""
+按商品名中的关键词给商品归类
+
+小票上只有商品名，没有类别。这里用常见的德语关键词粗略归类，用于在分析提示词中
+提供按类别的汇总；没有匹配的商品归入 OTHER_CATEGORY。规则按顺序匹配，
+先匹配到的类别优先(例如 TOMATENMARK 属于 Vorrat 而不是 Obst & Gemüse)。
+"""
+
+from typing import Any, Dict, Iterable, Tuple
+
+OTHER_CATEGORY = "Sonstiges"
+
+CATEGORY_KEYWORDS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("Pfand", ("PFAND", "LEERGUT")),
+    (
+        "Drogerie & Haushalt",
+        ("SPUEL", "SPÜL", "WASCH", "SEIFE", "SHAMPOO", "DUSCH", "ZAHN",
+         "TOILETTEN", "KUECHENROLLE", "KÜCHENROLLE", "TASCHENTUCH", "TUETE", "TÜTE",
+         "MUELLBEUTEL", "MÜLLBEUTEL", "REINIGER", "DEO"),
+    ),
+    (
+        "Vorrat",
+        ("NUDEL", "PASTA", "SPAGHETTI", "PENNE", "FUSILLI", "REIS", "MEHL", "ZUCKER",
+         "OEL", "ÖL", "SALZ", "MUESLI", "MÜSLI", "HAFER", "TOMATENMARK", "PASSATA",
+         "SOSSE", "SAUCE", "KETCHUP", "SENF", "ESSIG", "KONSERVE", "LINSEN", "BOHNEN"),
+    ),
+    (
+        "Getränke",
+        ("WASSER", "SAFT", "COLA", "BIER", "PILS", "WEIN", "KAFFEE", "TEE", "LIMO",
+         "SPRUDEL", "SCHORLE", "MATE", "SMOOTHIE", "ENERGY"),
+    ),
+    (
+        "Milchprodukte & Eier",
+        ("MILCH", "JOGHURT", "JOGURT", "KAESE", "KÄSE", "QUARK", "BUTTER", "SAHNE",
+         "EIER", "SKYR", "MOZZARELLA", "GOUDA", "FETA", "FRISCHKAESE", "SCHMAND"),
+    ),
+    (
+        "Fleisch & Fisch",
+        ("HAEHNCHEN", "HÄHNCHEN", "HUHN", "PUTE", "RIND", "SCHWEIN", "HACK", "WURST",
+         "SALAMI", "SCHINKEN", "SPECK", "LACHS", "THUNFISCH", "FISCH", "GARNELE"),
+    ),
+    (
+        "Backwaren",
+        ("BROT", "BROETCHEN", "BRÖTCHEN", "BAGUETTE", "TOAST", "CROISSANT", "BREZEL",
+         "LAUGEN", "KUCHEN", "SEMMEL"),
+    ),
+    (
+        "Süßwaren & Snacks",
+        ("SCHOKO", "CHIPS", "KEKS", "GUMMI", "BONBON", "NUSS", "NUESSE", "NÜSSE",
+         "RIEGEL", "POPCORN", "CRACKER"),
+    ),
+    (
+        "Obst & Gemüse",
+        ("BANANE", "APFEL", "AEPFEL", "ÄPFEL", "BIRNE", "TRAUBE", "ZITRONE", "ORANGE",
+         "MANDARINE", "KIWI", "BEERE", "AVOCADO", "MANGO", "TOMATE", "GURKE",
+         "KARTOFFEL", "ZWIEBEL", "PAPRIKA", "SALAT", "MOEHRE", "MÖHRE", "KAROTTE",
+         "BROKKOLI", "ZUCCHINI", "PILZ", "CHAMPIGNON", "KNOBLAUCH", "SPINAT", "LAUCH"),
+    ),
+)
+
+
+def categorize(name: str) -> str:
+    """返回商品所属的类别"""
+    upper_name = name.upper()
+    for category, keywords in CATEGORY_KEYWORDS:
+        if any(keyword in upper_name for keyword in keywords):
+            return category
+    return OTHER_CATEGORY
+
+
+def aggregate_by_category(
+    item_stats: Iterable[Tuple[str, int, float]]
+) -> Dict[str, Dict[str, Any]]:
+    """把 (商品名, 购买次数, 金额) 按类别汇总为 {"类别": {"count": 3, "total": 4.5}}"""
+    by_category: Dict[str, Dict[str, Any]] = {}
+    for name, count, total in item_stats:
+        entry = by_category.setdefault(categorize(name), {"count": 0, "total": 0.0})
+        entry["count"] += count
+        entry["total"] += total or 0.0
+    for entry in by_category.values():
+        entry["total"] = round(entry["total"], 2)
+    return by_category
@@ -0,0 +1,229 @@
+"""
+进程内指标，以 Prometheus 文本格式输出。
+
+OCR worker 运行在独立进程中；设置 METRICS_DIR 后，各进程通过 flush() 把自己的
+快照写入该目录，API 进程的 /metrics 会把所有快照合并后输出。
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+
+class Counter:
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def snapshot(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Histogram:
+    """
+    累积分桶的直方图。快照中每个桶、_sum 和 _count 都是独立的可累加序列，
+    键为 标签值 + (序列名, le)，因此可以和计数器一样跨进程相加合并。
+    """
+
+    type = "histogram"
+
+    DEFAULT_BUCKETS = (
+        0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+    )
+
+    def __init__(
+        self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _le(bound: float) -> str:
+        return "+Inf" if bound == float("inf") else repr(float(bound))
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            for bound in self.buckets:
+                if value <= bound:
+                    bucket = key + ("bucket", self._le(bound))
+                    self._values[bucket] = self._values.get(bucket, 0) + 1
+            for series, amount in (("sum", value), ("count", 1)):
+                series_key = key + (series, "")
+                self._values[series_key] = self._values.get(series_key, 0) + amount
+
+    def snapshot(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self, values: Dict[LabelValues, float]) -> List[str]:
+        lines = []
+        label_sets = sorted({key[:-2] for key in values})
+        for labels in label_sets:
+            for bound in self.buckets:
+                le = self._le(bound)
+                lines.append(
+                    f"{self.name}_bucket"
+                    f"{_format_labels(self.labelnames + ('le',), labels + (le,))} "
+                    f"{values.get(labels + ('bucket', le), 0)}"
+                )
+            for series in ("sum", "count"):
+                lines.append(
+                    f"{self.name}_{series}{_format_labels(self.labelnames, labels)} "
+                    f"{values.get(labels + (series, ''), 0)}"
+                )
+        return lines
+
+
+class DerivedGauge:
+    """在输出时根据(合并后的)其他指标计算出的值，例如命中率"""
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        func: Callable[[Dict[str, Dict[LabelValues, float]]], Optional[float]],
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames=(),
+        buckets=Histogram.DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def derived_gauge(self, name: str, documentation: str, func) -> DerivedGauge:
+        return self._register(DerivedGauge(name, documentation, func))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> Dict[str, Dict[LabelValues, float]]:
+        return {
+            name: metric.snapshot()
+            for name, metric in self._metrics.items()
+            if isinstance(metric, (Counter, Histogram))
+        }
+
+    def flush(self):
+        """把当前进程的快照写入 METRICS_DIR，未配置时不做任何事"""
+        if not settings.metrics_dir:
+            return
+        try:
+            os.makedirs(settings.metrics_dir, exist_ok=True)
+            data = {
+                name: [[list(key), value] for key, value in values.items()]
+                for name, values in self.snapshot().items()
+            }
+            path = os.path.join(settings.metrics_dir, f"{os.getpid()}.json")
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"failed to flush metrics: {str(e)}")
+
+    def collect(self) -> Dict[str, Dict[LabelValues, float]]:
+        """合并当前进程与 METRICS_DIR 中其他进程的快照"""
+        merged = self.snapshot()
+        if not settings.metrics_dir or not os.path.isdir(settings.metrics_dir):
+            return merged
+
+        own_file = f"{os.getpid()}.json"
+        for filename in os.listdir(settings.metrics_dir):
+            if not filename.endswith(".json") or filename == own_file:
+                continue
+            try:
+                with open(os.path.join(settings.metrics_dir, filename)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, values in data.items():
+                target = merged.setdefault(name, {})
+                for key, value in values:
+                    key = tuple(key)
+                    target[key] = target.get(key, 0) + value
+        return merged
+
+    def render(self) -> str:
+        values = self.collect()
+        lines: List[str] = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            if isinstance(metric, DerivedGauge):
+                value = metric.func(values)
+                if value is not None:
+                    lines.append(f"{name} {value}")
+                continue
+            if isinstance(metric, Histogram):
+                lines.extend(metric.render(values.get(name, {})))
+                continue
+            for key, value in sorted(values.get(name, {}).items()):
+                lines.append(f"{name}{_format_labels(metric.labelnames, key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: LabelValues) -> str:
+    if not labelnames:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,138 @@
+import copy
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud.invoice import get_processed_invoice_by_content_hash
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+INVOICE_FIELDS = [
+    "markt_name",
+    "store_address",
+    "brand",
+    "telephone",
+    "uid_number",
+    "markt_id",
+    "receipt_nr",
+    "document_nr",
+    "date",
+    "time",
+    "payment_method",
+    "total",
+]
+
+cache_requests = registry.counter(
+    "ocr_cache_requests_total",
+    "OCR result cache lookups by content hash",
+    ["result"],
+)
+
+
+def _hit_ratio(values) -> Optional[float]:
+    requests = values.get("ocr_cache_requests_total", {})
+    hits = requests.get(("hit",), 0)
+    total = hits + requests.get(("miss",), 0)
+    return round(hits / total, 4) if total else None
+
+
+registry.derived_gauge(
+    "ocr_cache_hit_ratio", "Share of OCR cache lookups that were hits", _hit_ratio
+)
+
+
+class OcrResultCache:
+    """
+    以文件内容SHA-256为键的OCR结果LRU缓存，按缓存文本的总大小限制容量。
+
+    值为 (ocr_text, invoice_data)，读写时都会深拷贝，调用方可以随意修改返回值。
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[str, Dict[str, Any], int]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, content_hash: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(content_hash)
+            if entry is None:
+                return None
+            self._entries.move_to_end(content_hash)
+        ocr_text, invoice_data, _ = entry
+        return ocr_text, copy.deepcopy(invoice_data)
+
+    def put(self, content_hash: str, ocr_text: str, invoice_data: Dict[str, Any]):
+        size = _estimate_size(ocr_text, invoice_data)
+        if size > self.max_bytes:
+            return
+
+        entry = (ocr_text, copy.deepcopy(invoice_data), size)
+        with self._lock:
+            old_entry = self._entries.pop(content_hash, None)
+            if old_entry is not None:
+                self.current_bytes -= old_entry[2]
+            self._entries[content_hash] = entry
+            self.current_bytes += size
+
+            # 淘汰最久未使用的条目
+            while self.current_bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+def _estimate_size(ocr_text: str, invoice_data: Dict[str, Any]) -> int:
+    items = invoice_data.get("items") or []
+    return len(ocr_text.encode("utf-8")) + 64 * len(INVOICE_FIELDS) + 128 * len(items)
+
+
+ocr_result_cache = OcrResultCache(settings.ocr_cache_max_bytes)
+
+
+def lookup_ocr_result(
+    db: Session, content_hash: str
+) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    先查进程内LRU缓存，再查数据库中同内容文件已保存的发票；
+    两处都没有时返回None，调用方需要执行完整的OCR流程。
+    """
+    cached = ocr_result_cache.get(content_hash)
+    if cached is None:
+        invoice = get_processed_invoice_by_content_hash(db, content_hash)
+        if invoice is not None and invoice.ocr_text:
+            invoice_data = {field: getattr(invoice, field) for field in INVOICE_FIELDS}
+            invoice_data["items"] = [
+                {
+                    "name": item.name,
+                    "quantity": item.quantity,
+                    "unit_price": item.unit_price,
+                    "total_price": item.total_price,
+                }
+                for item in invoice.items
+            ]
+            ocr_result_cache.put(content_hash, invoice.ocr_text, invoice_data)
+            cached = invoice.ocr_text, invoice_data
+
+    cache_requests.inc(result="hit" if cached is not None else "miss")
+    return cached
+
+
+def store_ocr_result(content_hash: str, ocr_text: str, invoice_data: Dict[str, Any]):
+    if ocr_text:
+        ocr_result_cache.put(content_hash, ocr_text, invoice_data)
@@ -0,0 +1,61 @@
+"""
+基于 (created_at, id) 的游标分页
+
+列表按 created_at、id 倒序排列，下一页的游标编码了当前页最后一条记录的
+(created_at, id)，查询时用行比较直接定位，不需要跳过前面的记录。
+分页的表上 created_at 都是 NOT NULL，否则游标无法编码，NULL 的排序也会打乱行比较。
+下一页的游标通过响应头 X-Next-Cursor 返回，最后一页时不返回该响应头。
+没有传游标时仍然支持 skip/limit。
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Sequence, Tuple
+
+from fastapi import Response
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, id: Any) -> str:
+    payload = json.dumps([created_at.isoformat(), str(id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """解析游标，格式不正确时抛出 ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def paginate(
+    query: Query, model, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+) -> Query:
+    """按 (created_at, id) 倒序排列并应用游标或 skip/limit"""
+    query = query.order_by(model.created_at.desc(), model.id.desc())
+
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        try:
+            id = model.id.type.python_type(id)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+        query = query.filter(tuple_(model.created_at, model.id) < (created_at, id))
+    else:
+        query = query.offset(skip)
+
+    return query.limit(limit)
+
+
+def set_next_cursor(response: Response, rows: Sequence[Any], limit: int):
+    """当前页已满时把最后一条记录编码成下一页的游标写入响应头"""
+    if limit > 0 and len(rows) == limit:
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
@@ -1,7 +1,34 @@
+"""
+密码哈希
+
+bcrypt 每次计算都要消耗数百毫秒CPU。异步路由应使用 *_async 版本，计算在一个
+有界线程池中进行(bcrypt 计算时会释放GIL)，不阻塞事件循环，同时最多只占用
+PASSWORD_HASH_WORKERS 个CPU。同步版本供同步路由和脚本使用。
+
+工作因子由 PASSWORD_BCRYPT_ROUNDS 决定。修改后，旧哈希在用户下次登录时
+由 verify_and_update_password 透明地按新的工作因子重新计算。
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
 from passlib.context import CryptContext
 
+from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min/max与默认值相同，工作因子不同的哈希都会被标记为需要更新
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.password_bcrypt_rounds,
+    bcrypt__min_rounds=settings.password_bcrypt_rounds,
+    bcrypt__max_rounds=settings.password_bcrypt_rounds,
+)
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers, thread_name_prefix="password"
+)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -12,3 +39,28 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
 
     return pwd_context.hash(password)
+
+
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """验证密码，工作因子已变化时同时返回新的哈希，否则第二项为None"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+async def _run(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run(get_password_hash, password)
+
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    return await _run(verify_and_update_password, plain_password, hashed_password)
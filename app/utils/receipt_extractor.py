@@ -0,0 +1,403 @@
+"""
+小票字段提取引擎
+
+所有正则在导入时编译一次，各零售商的解析器(见 receipt_parsers)用这里的
+HeaderGrammar / ItemGrammar 组合出自己的语法。
+
+表头字段不再对每个字段分别搜索全文：
+
+- 以关键词开头的字段(电话、UID、Bon/Beleg、合计、支付方式等)：先把文本转成小写，
+  用一个只含字面量分支的触发词正则扫描一遍(可以走 sre 的字面量快速路径)，
+  再在命中位置上用字段原本的正则做锚定匹配；
+- 不以关键词开头的地址、日期和时间各自搜索一次。
+
+每个字段取最早的匹配，结果与对每个字段分别 re.search 完全一致。
+"""
+
+import logging
+import re
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_METHODS = [
+    "EC-Cash",
+    "Girocard",
+    "Kreditkarte",
+    "Mastercard",
+    "Visa",
+    "American Express",
+    "BAR",
+    "Bar",
+    "Bargeld",
+]
+
+# 小写化后与 re.IGNORECASE 语义不一致的字符(ı、ſ 在忽略大小写时等同于 i、s)
+_UNSAFE_CASEFOLD_RE = re.compile("[ıſ]")
+
+
+def lower_for_scan(text: str) -> Optional[str]:
+    """
+    返回用于字面量扫描的小写文本；小写化会改变字符位置或与 re.IGNORECASE
+    语义不一致时返回None，调用方需要退回逐个正则搜索。
+    """
+    lowered = text.lower()
+    if len(lowered) != len(text) or _UNSAFE_CASEFOLD_RE.search(text):
+        return None
+    return lowered
+
+
+def compile_literal_scanner(literals: Sequence[str]) -> "re.Pattern[str]":
+    # 只包含字面量、不带分组，sre 才能使用字面量快速路径(带命名分组会慢一个数量级)。
+    # 较长的字面量排在前面，同一位置上优先命中最长的那个。
+    return re.compile(
+        "|".join(re.escape(literal) for literal in sorted(literals, key=len, reverse=True))
+    )
+
+
+def _to_float(value: str) -> float:
+    return float(value.replace(",", "."))
+
+
+def _group_text(match: "re.Match[str]") -> Optional[str]:
+    return match.group(1).strip()
+
+
+def _group_float(match: "re.Match[str]") -> Optional[float]:
+    try:
+        return _to_float(match.group(1))
+    except ValueError:
+        return None
+
+
+def _match_date(match: "re.Match[str]") -> Optional[datetime]:
+    day, month, year = match.groups()
+    if len(year) == 2:
+        year = "20" + year
+    try:
+        return datetime(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
+def _match_time(match: "re.Match[str]") -> Optional[str]:
+    return f"{match.group(1)}:{match.group(2)}"
+
+
+class FieldRule(NamedTuple):
+    """
+    一个表头字段的提取规则。
+
+    triggers 为小写触发词，字段的任何匹配起点都必须以其中之一开头；
+    为空时该字段单独搜索全文。多条规则可以写入同一个 target，按规则顺序
+    取第一个匹配到的；unless 指定的字段已有值时跳过本规则。
+    """
+
+    name: str
+    pattern: "re.Pattern[str]"
+    triggers: Tuple[str, ...] = ()
+    convert: Callable[["re.Match[str]"], Any] = _group_text
+    target: Optional[str] = None
+    unless: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return self.target or self.name
+
+
+def payment_rules() -> List[FieldRule]:
+    rules = []
+    for index, method in enumerate(PAYMENT_METHODS):
+        rules.append(
+            FieldRule(
+                f"payment_{index}",
+                re.compile(rf"\b{re.escape(method)}\b", re.IGNORECASE),
+                (method.lower(),),
+                convert=lambda _match, method=method: method,
+                target="payment_method",
+            )
+        )
+    return rules
+
+
+COMMON_HEADER_RULES: List[FieldRule] = [
+    FieldRule(
+        "store_address",
+        re.compile(
+            r"(?<=\n)([A-Za-zäöüÄÖÜß\s.\-]+\s\d+[\s,]*\n\d{5}\s+[A-Za-zäöüÄÖÜß\s.\-]+)"
+        ),
+    ),
+    FieldRule(
+        "telephone",
+        re.compile(r"(?:Tel|Telefon|Tel\.)[:\s]+([0-9\s/\-+]+)", re.IGNORECASE),
+        ("tel",),
+    ),
+    FieldRule(
+        "uid_number",
+        re.compile(
+            r"(?:UID-Nr|USt-IdNr|Steuernummer)[:\s.]+([A-Z0-9\s]+)", re.IGNORECASE
+        ),
+        ("uid-nr", "ust-idnr", "steuernummer"),
+    ),
+    FieldRule(
+        "markt_id",
+        re.compile(r"(?:Markt-ID|Filial-ID|Markt)[:\s]+(\d+)", re.IGNORECASE),
+        ("markt", "filial-id"),
+    ),
+    FieldRule(
+        "receipt_nr",
+        re.compile(r"(?:Bon-Nr|Bon|Beleg)[:\s.]+([A-Z0-9\-]+)", re.IGNORECASE),
+        ("bon", "beleg"),
+    ),
+    FieldRule(
+        "document_nr",
+        re.compile(r"(?:Beleg-Nr|Belegnummer)[:\s.]+([A-Z0-9\-]+)", re.IGNORECASE),
+        ("beleg",),
+        unless="receipt_nr",
+    ),
+    FieldRule(
+        "date",
+        re.compile(r"(\d{1,2})[\.-](\d{1,2})[\.-](\d{2,4})"),
+        convert=_match_date,
+    ),
+    FieldRule("time", re.compile(r"(\d{1,2}):(\d{2})(?:\s*Uhr)?"), convert=_match_time),
+    *payment_rules(),
+    FieldRule(
+        "total",
+        re.compile(
+            r"(?:SUMME|Summe|Gesamtbetrag|Gesamt|Total)[:\s]*(\d+[,.]\d{2})",
+            re.IGNORECASE,
+        ),
+        ("summe", "gesamt", "total"),
+        convert=_group_float,
+    ),
+]
+
+
+class HeaderGrammar:
+    """一组表头字段规则，导入时编译成一个触发词扫描器"""
+
+    def __init__(self, rules: Sequence[FieldRule]):
+        self.rules = {rule.name: rule for rule in rules}
+        self.search_fields = [rule.name for rule in rules if not rule.triggers]
+
+        trigger_fields: Dict[str, List[str]] = {}
+        for rule in rules:
+            for trigger in rule.triggers:
+                trigger_fields.setdefault(trigger, []).append(rule.name)
+
+        # 同一位置只会报告最长的触发词，所以它的候选字段要包含所有是它前缀的触发词的字段
+        self.trigger_fields: Dict[str, List[str]] = {}
+        for trigger in trigger_fields:
+            fields = []
+            for other, other_fields in trigger_fields.items():
+                if trigger.startswith(other):
+                    fields.extend(f for f in other_fields if f not in fields)
+            self.trigger_fields[trigger] = [name for name in self.rules if name in fields]
+
+        self.trigger_re = (
+            compile_literal_scanner(self.trigger_fields) if self.trigger_fields else None
+        )
+
+        # 同一 target 中排在后面(优先级更低)的规则
+        self._lower_priority: Dict[str, List[str]] = {}
+        names = list(self.rules)
+        for index, name in enumerate(names):
+            key = self.rules[name].key
+            self._lower_priority[name] = [
+                other for other in names[index + 1 :] if self.rules[other].key == key
+            ]
+
+    def scan(self, text: str) -> Dict[str, "re.Match[str]"]:
+        """扫描全文，返回每个字段最早的匹配"""
+        lowered = lower_for_scan(text)
+        if lowered is None or self.trigger_re is None:
+            return self._search(text)
+
+        found: Dict[str, "re.Match[str]"] = {}
+        pending = {
+            name for fields in self.trigger_fields.values() for name in fields
+        }
+
+        position = 0
+        while pending:
+            trigger = self.trigger_re.search(lowered, position)
+            if trigger is None:
+                break
+            position = trigger.start()
+
+            for name in self.trigger_fields[trigger.group()]:
+                if name not in pending:
+                    continue
+                field_match = self.rules[name].pattern.match(text, position)
+                if field_match:
+                    found[name] = field_match
+                    pending.discard(name)
+                    # 同一字段按规则顺序取第一个出现过的，找到后优先级更低的无需再找
+                    pending.difference_update(self._lower_priority[name])
+
+            position += 1
+
+        # 不以关键词开头的字段各自搜索一次
+        for name in self.search_fields:
+            field_match = self.rules[name].pattern.search(text)
+            if field_match:
+                found[name] = field_match
+
+        return found
+
+    def _search(self, text: str) -> Dict[str, "re.Match[str]"]:
+        found = {}
+        for name, rule in self.rules.items():
+            field_match = rule.pattern.search(text)
+            if field_match:
+                found[name] = field_match
+        return found
+
+    def extract(self, text: str) -> Dict[str, Any]:
+        """提取表头字段，只包含识别出的字段"""
+        found = self.scan(text)
+        data: Dict[str, Any] = {}
+        for name, rule in self.rules.items():
+            if name not in found or rule.key in data:
+                continue
+            if rule.unless and rule.unless in data:
+                continue
+            value = rule.convert(found[name])
+            if value is not None:
+                data[rule.key] = value
+        return data
+
+
+# 商品区域的开始/结束标记，合并成一个多行正则在全文中只搜索一次。
+# 用 [^\S\n] 代替 \s，保证匹配不会跨行。
+START_MARKERS = {
+    "count_artikel": r"^[^\S\n]*\d+[^\S\n]+Artikel",
+    "ihre_einkaeufe": r"Ihre[^\S\n]+Einkäufe",
+    "pos_artikel": r"^Pos\.[^\S\n]+Artikel",
+    "artikelbezeichnung": r"Artikelbezeichnung",
+    "pick_and_go": r"mit Pick & Go",
+    "uid_nr": r"UID Nr\.",
+    "eur": r"EUR$",
+}
+END_MARKERS = {
+    "summe_eur_upper": r"^[^\S\n]*SUMME[^\S\n]+EUR",
+    "gesamtbetrag": r"^[^\S\n]*Gesamtbetrag",
+    "summe_eur": r"^[^\S\n]*Summe[^\S\n]+EUR",
+    "zu_zahlen": r"^[^\S\n]*zu zahlen",
+    "dashes": r"^-{6,}",
+    "gesamt": r"^[^\S\n]*Gesamt[^\S\n]+\d",
+}
+
+SKIP_LINE_RE = re.compile(r"www\.|http|^EUR$", re.IGNORECASE)
+TAX_ITEM_RE = re.compile(r"(.+?)\s+(\d+[,.]\d{1,2})\s*([A-Z])$")
+QUANTITY_ITEM_RE = re.compile(
+    r"(.+?)\s+(\d+(?:[,.]\d+)?)\s*[xX]\s*(\d+[,.]\d{2})\s+(\d+[,.]\d{2})"
+)
+PRICE_ITEM_RE = re.compile(r"(.+?)\s+(\d+[,.]\d{2})$")
+NON_ITEM_RE = re.compile(r"MwSt\.|Rabatt|Pfand|Steuer|Netto|Brutto", re.IGNORECASE)
+
+
+def _tax_item(match: "re.Match[str]") -> Optional[Dict[str, Any]]:
+    name, price, _tax_category = match.groups()
+    return {"name": name.strip(), "total_price": _to_float(price)}
+
+
+def _quantity_item(match: "re.Match[str]") -> Optional[Dict[str, Any]]:
+    name, quantity, unit_price, total_price = match.groups()
+    return {
+        "name": name.strip(),
+        "quantity": _to_float(quantity),
+        "unit_price": _to_float(unit_price),
+        "total_price": _to_float(total_price),
+    }
+
+
+def _price_item(match: "re.Match[str]") -> Optional[Dict[str, Any]]:
+    name, price = match.groups()
+    if NON_ITEM_RE.search(name):
+        return None
+    return {"name": name.strip(), "total_price": _to_float(price)}
+
+
+# 商品行规则：按顺序尝试，第一个返回商品的规则生效
+DEFAULT_ITEM_RULES: List[Tuple["re.Pattern[str]", Callable]] = [
+    (TAX_ITEM_RE, _tax_item),
+    (QUANTITY_ITEM_RE, _quantity_item),
+    (PRICE_ITEM_RE, _price_item),
+]
+
+
+class ItemGrammar:
+    """商品区域的开始/结束标记和商品行规则"""
+
+    def __init__(
+        self,
+        start_markers: Sequence[str],
+        end_markers: Sequence[str],
+        line_rules: Sequence[Tuple["re.Pattern[str]", Callable]] = DEFAULT_ITEM_RULES,
+    ):
+        self.start_marker_re = re.compile(
+            "|".join(START_MARKERS[name] for name in start_markers),
+            re.IGNORECASE | re.MULTILINE,
+        )
+        self.end_marker_re = re.compile(
+            "|".join(END_MARKERS[name] for name in end_markers),
+            re.IGNORECASE | re.MULTILINE,
+        )
+        self.line_rules = list(line_rules)
+
+    def find_section(self, text: str) -> Tuple[int, int]:
+        """返回商品区域的行号范围 [start, end)，找不到时对应的值为 -1"""
+        start_match = self.start_marker_re.search(text)
+        if not start_match:
+            return -1, -1
+
+        start_index = text.count("\n", 0, start_match.start()) + 1
+
+        # 与原实现一致：从开始标记之后的第二行起查找结束标记
+        offset = 0
+        for _ in range(start_index + 1):
+            offset = text.find("\n", offset) + 1
+            if offset == 0:
+                return start_index, -1
+
+        end_match = self.end_marker_re.search(text, offset)
+        if not end_match:
+            return start_index, -1
+
+        return start_index, text.count("\n", 0, end_match.start())
+
+    def parse_line(self, line: str) -> Optional[Dict[str, Any]]:
+        line = line.strip()
+        if not line or SKIP_LINE_RE.search(line):
+            return None
+
+        for pattern, build in self.line_rules:
+            line_match = pattern.search(line)
+            if line_match:
+                item = build(line_match)
+                if item is not None:
+                    return item
+        return None
+
+    def extract(self, text: str) -> List[Dict[str, Any]]:
+        start_index, end_index = self.find_section(text)
+
+        if start_index == -1:
+            logger.warning("未找到商品区域开始标记")
+        if end_index == -1:
+            logger.warning("未找到商品区域结束标记")
+        if start_index == -1 or end_index == -1:
+            return []
+
+        lines = text.split("\n")
+        items = []
+        for i in range(start_index, end_index):
+            item = self.parse_line(lines[i])
+            if item is not None:
+                items.append(item)
+
+        logger.debug(f"商品区域范围: {start_index} 到 {end_index-1}，共 {len(items)} 个商品")
+        return items
@@ -0,0 +1,178 @@
+"""
+按零售商分派的小票解析器
+
+每个零售商注册一个解析器，带有自己编译好的表头和商品语法。识别品牌时把所有
+已注册解析器的品牌关键词合成一个字面量正则，对小写文本只扫描一遍，然后只运行
+匹配到的那个解析器；都没有匹配时使用通用解析器。零售商语法没有找到商品时再用通用
+语法提取一次。新增零售商不会拖慢其他小票的解析。
+
+    @register_parser
+    class NettoParser(ReceiptParser):
+        brand = "Netto"
+        keywords = ("netto marken-discount",)
+        items = ItemGrammar(["count_artikel"], ["zu_zahlen"])
+"""
+
+import logging
+import re
+from typing import Any, Dict, List, Optional, Type
+
+from app.utils.receipt_extractor import (
+    COMMON_HEADER_RULES,
+    END_MARKERS,
+    START_MARKERS,
+    FieldRule,
+    HeaderGrammar,
+    ItemGrammar,
+    compile_literal_scanner,
+    lower_for_scan,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ReceiptParser:
+    """
+    通用解析器，也是各零售商解析器的基类。
+
+    子类通过类属性声明品牌名、用于识别品牌的小写关键词以及表头/商品语法，
+    语法在导入时编译，解析时不再编译任何正则。
+    """
+
+    brand: Optional[str] = None
+    keywords: tuple = ()
+    header = HeaderGrammar(COMMON_HEADER_RULES)
+    items = ItemGrammar(
+        list(START_MARKERS),
+        [name for name in END_MARKERS if name != "gesamt"],
+    )
+
+    def parse(self, text: str) -> Dict[str, Any]:
+        """从OCR文本中提取发票字段和商品项目，只包含识别出的字段"""
+        data = self.header.extract(text)
+        if self.brand:
+            data["brand"] = self.brand
+        data["items"] = self.items.extract(text)
+        if not data["items"] and self.items is not ReceiptParser.items:
+            # 零售商语法没有找到商品(版式不同，例如以 zu zahlen 结尾)时退回通用语法
+            data["items"] = ReceiptParser.items.extract(text)
+        return data
+
+
+GENERIC_PARSER = ReceiptParser()
+
+# 按注册顺序排列，同一张小票匹配到多个品牌时取注册顺序靠前的
+_parsers: List[ReceiptParser] = []
+_keyword_parsers: Dict[str, int] = {}
+_brand_re: Optional["re.Pattern[str]"] = None
+
+
+def register_parser(parser_cls: Type[ReceiptParser]) -> Type[ReceiptParser]:
+    """注册零售商解析器，可以作为类装饰器使用"""
+    global _brand_re
+
+    if not parser_cls.brand or not parser_cls.keywords:
+        raise ValueError(f"{parser_cls.__name__} 必须设置 brand 和 keywords")
+
+    priority = len(_parsers)
+    _parsers.append(parser_cls())
+    for keyword in parser_cls.keywords:
+        _keyword_parsers.setdefault(keyword.lower(), priority)
+    _brand_re = compile_literal_scanner(_keyword_parsers)
+    return parser_cls
+
+
+def get_parsers() -> List[ReceiptParser]:
+    return list(_parsers)
+
+
+def detect_parser(text: str) -> ReceiptParser:
+    """扫描一遍文本中的品牌关键词，返回优先级最高的解析器"""
+    if _brand_re is None:
+        return GENERIC_PARSER
+
+    lowered = lower_for_scan(text)
+    if lowered is None:
+        # 小写化不安全时逐个品牌忽略大小写搜索
+        for parser in _parsers:
+            for keyword in parser.keywords:
+                if re.search(re.escape(keyword), text, re.IGNORECASE):
+                    return parser
+        return GENERIC_PARSER
+
+    best = None
+    for keyword_match in _brand_re.finditer(lowered):
+        priority = _keyword_parsers[keyword_match.group()]
+        if best is None or priority < best:
+            best = priority
+            if best == 0:
+                break
+
+    return GENERIC_PARSER if best is None else _parsers[best]
+
+
+def extract_invoice_data(text: str) -> Dict[str, Any]:
+    """识别品牌并用对应的解析器提取发票字段和商品项目"""
+    parser = detect_parser(text)
+    logger.debug(f"使用解析器: {type(parser).__name__}")
+    return parser.parse(text)
+
+
+@register_parser
+class ReweParser(ReceiptParser):
+    brand = "REWE"
+    keywords = ("rewe",)
+    header = HeaderGrammar(
+        [
+            FieldRule(
+                "markt_name",
+                re.compile(r"REWE\s+([A-Za-z0-9\s.\-]+)(?=\n|$)"),
+                ("rewe",),
+            ),
+            *COMMON_HEADER_RULES,
+        ]
+    )
+    items = ItemGrammar(
+        ["ihre_einkaeufe", "pick_and_go", "uid_nr", "eur"],
+        ["summe_eur_upper", "summe_eur", "dashes"],
+    )
+
+
+@register_parser
+class KauflandParser(ReceiptParser):
+    brand = "Kaufland"
+    keywords = ("kaufland",)
+    items = ItemGrammar(
+        ["artikelbezeichnung"],
+        ["gesamtbetrag", "summe_eur", "dashes"],
+    )
+
+
+@register_parser
+class AldiParser(ReceiptParser):
+    brand = "ALDI"
+    keywords = ("aldi",)
+    items = ItemGrammar(
+        ["pos_artikel"],
+        ["summe_eur_upper", "summe_eur", "zu_zahlen"],
+    )
+
+
+@register_parser
+class LidlParser(ReceiptParser):
+    brand = "LIDL"
+    keywords = ("lidl",)
+    items = ItemGrammar(
+        ["count_artikel"],
+        ["zu_zahlen", "summe_eur"],
+    )
+
+
+@register_parser
+class EdekaParser(ReceiptParser):
+    brand = "Edeka"
+    keywords = ("edeka",)
+    items = ItemGrammar(
+        ["ihre_einkaeufe"],
+        ["gesamtbetrag", "gesamt", "summe_eur", "zu_zahlen", "dashes"],
+    )
@@ -0,0 +1,52 @@
+"""
+发票处理各阶段的耗时
+
+每个阶段的耗时记录到直方图 invoice_stage_seconds{stage}，同时累加到
+StageTimings 中，处理完成后保存在 File.processing_timings 上，便于查看单个文件
+慢在哪一步。阶段名称：
+
+    upload_write      接收上传并写入磁盘
+    text_layer        读取PDF自带的文字层
+    ocrmypdf          PDF的OCR
+    image_preprocess  图片预处理(灰度、纠偏、二值化)
+    tesseract         图片的OCR
+    pdfplumber        从OCR后的PDF中提取文本
+    parse             解析发票字段和商品项目
+    persist           保存发票和商品项目
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from app.utils.metrics import registry
+
+stage_seconds = registry.histogram(
+    "invoice_stage_seconds",
+    "Time spent in each invoice processing stage",
+    ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+
+
+def observe_stage(stage: str, seconds: float):
+    stage_seconds.observe(seconds, stage=stage)
+
+
+class StageTimings:
+    """一个文件各阶段的耗时(秒)，同一阶段执行多次时累加"""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float):
+        observe_stage(stage, seconds)
+        self.timings[stage] = round(self.timings.get(stage, 0.0) + seconds, 4)
+
+    @contextmanager
+    def time(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
@@ -0,0 +1,325 @@
+"""
+流式接收上传文件
+
+直接解析请求体中的 multipart 数据，按固定大小分块异步写入 upload_dir，
+写入的同时计算SHA-256并根据文件头识别真实类型。超过大小限制、类型不支持
+或与声明的类型不符时立即中止并删除已写入的部分，不会先把整个文件落盘。
+
+文件按内容哈希命名，重复上传的相同文件只在磁盘上保存一份。接收完成的文件先留在
+临时路径，由 place_upload() 在写入数据库记录的事务中(持有内容哈希锁)移动到最终路径。
+
+批量上传时(skip_rejected=True)单个文件被拒绝不会中止整个请求，
+该文件以 RejectedUpload 的形式出现在结果中，其余文件照常保存。
+"""
+
+import hashlib
+import os
+import time
+import uuid
+from typing import List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import anyio
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import Request
+
+from app.utils.stage_timings import observe_stage
+
+CHUNK_SIZE = 1024 * 1024
+
+# multipart 边界和每个部分的头信息所占的余量
+MULTIPART_OVERHEAD = 64 * 1024
+
+# 文件头 -> MIME类型
+MAGIC_NUMBERS = [
+    (b"%PDF-", "application/pdf"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+]
+SNIFF_BYTES = max(len(magic) for magic, _ in MAGIC_NUMBERS)
+
+EXTENSIONS = {
+    "application/pdf": ".pdf",
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+}
+ALLOWED_CONTENT_TYPES = list(EXTENSIONS)
+
+
+class StoredUpload(NamedTuple):
+    filename: str
+    file_path: str
+    file_size: int
+    content_hash: str
+    original_filename: str
+    content_type: str
+    write_seconds: float  # 从开始接收到写入完成的时间
+    temp_path: str  # 接收完成后文件所在的临时路径，place_upload() 之后不再存在
+
+
+class RejectedUpload(NamedTuple):
+    original_filename: str
+    status_code: int
+    detail: str
+
+
+class UploadRejected(Exception):
+    """上传被拒绝，status_code 和 detail 直接用于HTTP响应"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    for magic, content_type in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return content_type
+    return None
+
+
+class _UploadWriter:
+    """把一个文件部分分块写入临时文件，同时计算哈希、识别类型并检查大小"""
+
+    def __init__(
+        self,
+        upload_dir: str,
+        original_filename: str,
+        declared_type: str,
+        max_bytes: int,
+        allowed_types: Sequence[str],
+    ):
+        self.upload_dir = upload_dir
+        self.original_filename = original_filename
+        self.declared_type = declared_type
+        self.max_bytes = max_bytes
+        self.allowed_types = allowed_types
+
+        self.temp_path = os.path.join(upload_dir, f".{uuid.uuid4()}.part")
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.content_type: Optional[str] = None
+        self._head = b""
+        self._buffer = bytearray()
+        self._file = None
+        self._started = 0.0
+
+    async def open(self):
+        self._started = time.perf_counter()
+        self._file = await anyio.open_file(self.temp_path, "wb")
+
+    async def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadRejected(
+                413, f"文件超过大小限制 ({self.max_bytes // (1024 * 1024)} MB)"
+            )
+
+        if self.content_type is None:
+            self._head += data[: SNIFF_BYTES - len(self._head)]
+            if len(self._head) >= SNIFF_BYTES:
+                self._check_content_type()
+
+        self.sha256.update(data)
+        self._buffer += data
+        if len(self._buffer) >= CHUNK_SIZE:
+            await self._flush()
+
+    def _check_content_type(self):
+        sniffed = sniff_content_type(self._head)
+        if sniffed not in self.allowed_types:
+            raise UploadRejected(400, "只支持PDF和图片文件")
+        if sniffed != self.declared_type:
+            raise UploadRejected(
+                400, f"文件内容({sniffed})与声明的类型({self.declared_type})不符"
+            )
+        self.content_type = sniffed
+
+    async def _flush(self):
+        if self._buffer:
+            await self._file.write(bytes(self._buffer))
+            self._buffer.clear()
+
+    async def finish(self) -> StoredUpload:
+        """写完剩余数据，文件留在临时路径，返回按内容哈希确定的最终路径"""
+        if self.content_type is None:
+            self._check_content_type()
+
+        await self._flush()
+        await self._file.aclose()
+        self._file = None
+
+        content_hash = self.sha256.hexdigest()
+        filename = f"{content_hash}{EXTENSIONS[self.content_type]}"
+
+        write_seconds = time.perf_counter() - self._started
+        observe_stage("upload_write", write_seconds)
+        return StoredUpload(
+            filename,
+            os.path.join(self.upload_dir, filename),
+            self.size,
+            content_hash,
+            self.original_filename,
+            self.content_type,
+            write_seconds,
+            self.temp_path,
+        )
+
+    async def abort(self):
+        if self._file is not None:
+            await self._file.aclose()
+            self._file = None
+        await anyio.Path(self.temp_path).unlink(missing_ok=True)
+
+
+async def receive_uploads(
+    request: Request,
+    upload_dir: str,
+    max_bytes: int,
+    field_name: str = "file",
+    max_files: int = 1,
+    allowed_types: Sequence[str] = ALLOWED_CONTENT_TYPES,
+    skip_rejected: bool = False,
+) -> List[Union[StoredUpload, RejectedUpload]]:
+    """
+    从请求体中流式接收 field_name 字段的文件(最多 max_files 个)并保存到 upload_dir。
+
+    被拒绝时抛出 UploadRejected，本次请求已写入的文件都会被删除。skip_rejected 为真时
+    单个文件的大小或类型不符合要求只丢弃该文件，结果中按顺序包含 RejectedUpload；
+    请求本身无效时仍然抛出 UploadRejected。
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadRejected(400, "请求必须是 multipart/form-data")
+
+    # 请求声明的长度已经超过上限时不读取请求体
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit():
+        if int(content_length) > max_files * (max_bytes + MULTIPART_OVERHEAD):
+            raise UploadRejected(
+                413, f"文件超过大小限制 ({max_bytes // (1024 * 1024)} MB)"
+            )
+
+    events: List[Tuple[str, bytes]] = []
+    parser = MultipartParser(
+        params[b"boundary"],
+        {
+            "on_part_begin": lambda: events.append(("part_begin", b"")),
+            "on_part_data": lambda data, start, end: events.append(
+                ("part_data", data[start:end])
+            ),
+            "on_part_end": lambda: events.append(("part_end", b"")),
+            "on_header_field": lambda data, start, end: events.append(
+                ("header_field", data[start:end])
+            ),
+            "on_header_value": lambda data, start, end: events.append(
+                ("header_value", data[start:end])
+            ),
+            "on_header_end": lambda: events.append(("header_end", b"")),
+            "on_headers_finished": lambda: events.append(("headers_finished", b"")),
+        },
+    )
+
+    results: List[Union[StoredUpload, RejectedUpload]] = []
+    writer: Optional[_UploadWriter] = None
+    filename = ""
+    headers = {}
+    header_field = header_value = b""
+
+    async def reject(e: UploadRejected):
+        # 丢弃当前文件，该部分剩余的数据会被忽略
+        nonlocal writer
+        if not skip_rejected:
+            raise e
+        if writer is not None:
+            await writer.abort()
+            writer = None
+        results.append(RejectedUpload(filename, e.status_code, e.detail))
+
+    async def handle_events():
+        nonlocal writer, filename, headers, header_field, header_value
+        for event, data in events:
+            if event == "part_begin":
+                headers = {}
+                header_field = header_value = b""
+            elif event == "header_field":
+                header_field += data
+            elif event == "header_value":
+                header_value += data
+            elif event == "header_end":
+                headers[header_field.lower()] = header_value
+                header_field = header_value = b""
+            elif event == "headers_finished":
+                _, options = parse_options_header(
+                    headers.get(b"content-disposition", b"")
+                )
+                if options.get(b"name") != field_name.encode() or b"filename" not in options:
+                    continue
+                if len(results) >= max_files:
+                    raise UploadRejected(400, f"最多只能上传 {max_files} 个文件")
+
+                filename = options[b"filename"].decode("utf-8", errors="replace")
+                declared_type = headers.get(b"content-type", b"").decode("latin-1")
+                if declared_type not in allowed_types:
+                    await reject(UploadRejected(400, "只支持PDF和图片文件"))
+                    continue
+
+                writer = _UploadWriter(
+                    upload_dir, filename, declared_type, max_bytes, allowed_types
+                )
+                await writer.open()
+            elif event == "part_data":
+                if writer is not None:
+                    try:
+                        await writer.write(data)
+                    except UploadRejected as e:
+                        await reject(e)
+            elif event == "part_end":
+                if writer is not None:
+                    try:
+                        results.append(await writer.finish())
+                    except UploadRejected as e:
+                        await reject(e)
+                    writer = None
+        events.clear()
+
+    try:
+        async for chunk in request.stream():
+            try:
+                parser.write(chunk)
+            except Exception:
+                raise UploadRejected(400, "无效的 multipart 请求")
+            await handle_events()
+        parser.finalize()
+        await handle_events()
+
+        if not results:
+            raise UploadRejected(400, "缺少上传文件")
+    except BaseException:
+        if writer is not None:
+            await writer.abort()
+        for result in results:
+            if isinstance(result, StoredUpload):
+                await anyio.Path(result.temp_path).unlink(missing_ok=True)
+        raise
+
+    return results
+
+
+def place_upload(upload: StoredUpload) -> bool:
+    """
+    把接收完成的临时文件移动到按内容哈希命名的最终路径；相同内容的文件已经存在时
+    直接删除临时文件。返回是否新建了最终路径上的文件。调用方需要持有该内容哈希的锁。
+    """
+    if os.path.exists(upload.file_path):
+        discard_upload(upload)
+        return False
+    os.replace(upload.temp_path, upload.file_path)
+    return True
+
+
+def discard_upload(upload: StoredUpload):
+    try:
+        os.remove(upload.temp_path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,155 @@
+"""
+JWT -> 用户 的TTL缓存
+
+get_current_user 在每个认证请求上都要按用户名查一次数据库。这里以令牌的
+(sub, exp) 为键缓存用户的列数据，命中时直接构造一个不绑定会话的 Users 对象，
+不再访问数据库。缓存时间不超过 AUTH_USER_CACHE_TTL，也不超过令牌本身的有效期。
+
+update_user / delete_user 会按用户名前缀使缓存失效。默认后端是进程内的
+LocalTTLCache，失效只作用于执行修改的进程，其他API进程中的缓存要等TTL过期，
+所以 AUTH_USER_CACHE_TTL 默认只有几秒：被停用或删除的用户最多还能在这段时间内
+通过认证。需要立即在所有进程中失效时，用 set_user_cache_backend() 换成实现了
+UserCacheBackend 接口的共享后端(例如Redis)，缓存的值只包含JSON类型。
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import DateTime
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.core.config import settings
+from app.models.users import Users
+from app.utils.metrics import registry
+
+user_cache_requests = registry.counter(
+    "auth_user_cache_requests_total",
+    "JWT to user cache lookups in get_current_user",
+    ["result"],
+)
+
+
+class UserCacheBackend:
+    """缓存后端接口，值为只包含JSON类型的dict"""
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float):
+        raise NotImplementedError
+
+    def delete_prefix(self, prefix: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class LocalTTLCache(UserCacheBackend):
+    """进程内的TTL缓存，超过 max_entries 时淘汰最久未使用的条目"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete_prefix(self, prefix: str):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_backend: UserCacheBackend = LocalTTLCache(settings.auth_user_cache_max_entries)
+
+
+def set_user_cache_backend(backend: UserCacheBackend):
+    global _backend
+    _backend = backend
+
+
+def get_user_cache_backend() -> UserCacheBackend:
+    return _backend
+
+
+def _prefix(username: str) -> str:
+    return f"user:{username}:"
+
+
+def _to_json(user: Users) -> Dict[str, Any]:
+    """用户的列数据，UUID和时间转换为字符串"""
+    data = {}
+    for key, value in user.dict().items():
+        if isinstance(value, uuid.UUID):
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        data[key] = value
+    return data
+
+
+def _from_json(data: Dict[str, Any]) -> Users:
+    columns = Users.__table__.columns
+    values = {}
+    for key, value in data.items():
+        if value is not None and isinstance(columns[key].type, UUID):
+            value = uuid.UUID(value)
+        elif value is not None and isinstance(columns[key].type, DateTime):
+            value = datetime.fromisoformat(value)
+        values[key] = value
+    return Users(**values)
+
+
+def get_cached_user(username: str, exp: Any) -> Optional[Users]:
+    """返回缓存的用户(不绑定数据库会话)，未命中时返回None"""
+    if settings.auth_user_cache_ttl <= 0:
+        return None
+
+    data = _backend.get(f"{_prefix(username)}{exp}")
+    user_cache_requests.inc(result="hit" if data is not None else "miss")
+    if data is None:
+        return None
+    return _from_json(data)
+
+
+def cache_user(username: str, exp: Any, user: Users):
+    ttl = settings.auth_user_cache_ttl
+    if isinstance(exp, (int, float)):
+        ttl = min(ttl, exp - time.time())
+    if ttl <= 0:
+        return
+    _backend.set(f"{_prefix(username)}{exp}", _to_json(user), ttl)
+
+
+def invalidate_user(username: str):
+    """删除该用户名下所有令牌的缓存"""
+    _backend.delete_prefix(_prefix(username))
@@ -0,0 +1,175 @@
+"""
+OCR worker 进程池
+
+从 ocr_job 队列表中领取任务并执行OCR，每个worker进程使用自己的数据库会话。
+
+    python -m app.worker              # 启动 settings.ocr_worker_count 个worker进程
+    python -m app.worker --workers 4
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from app.core.config import settings
+from app.core.db import SessionLocal, engine
+from app.crud.files import update_file
+from app.crud.ocr_job import (
+    claim_next_ocr_job,
+    complete_ocr_job,
+    extend_ocr_job_lease,
+    fail_ocr_job,
+)
+from app.models.ocr_job import OcrJob
+
+# 独立运行时需要导入全部模型，关系映射才能完成配置
+from app.models.consumer_analysis import ConsumerAnalysis  # noqa: F401
+from app.models.invitation import Invitation  # noqa: F401
+from app.models.users import Users  # noqa: F401
+from app.schemas.files import FileUpdate
+from app.utils.invoice_pipeline import process_file
+from app.utils.metrics import registry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class LeaseHeartbeat:
+    """在任务处理期间定期续租，防止长时间的OCR被其他worker重复领取"""
+
+    def __init__(self, job_id, worker_id: str, lease_seconds: int):
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        interval = max(self.lease_seconds / 3, 1)
+        while not self._stop.wait(interval):
+            try:
+                with SessionLocal() as db:
+                    if not extend_ocr_job_lease(
+                        db, self.job_id, self.worker_id, self.lease_seconds
+                    ):
+                        logger.warning(f"任务 {self.job_id} 的租约已丢失")
+                        return
+            except Exception as e:
+                logger.error(f"任务 {self.job_id} 续租失败: {str(e)}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_job(db, job: OcrJob, worker_id: str):
+    job_id, file_id = job.id, job.file_id
+    logger.info(f"worker {worker_id} 开始处理任务 {job_id} (文件 {file_id})")
+
+    with LeaseHeartbeat(job_id, worker_id, settings.ocr_job_lease_seconds):
+        try:
+            process_file(db, file_id)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"处理文件 {file_id} 时出错: {str(e)}")
+            failed_job = fail_ocr_job(db, job_id, worker_id, str(e))
+            if failed_job is not None and failed_job.status == OcrJob.FAILED:
+                # 重试次数用完，仍然将文件标记为已处理
+                update_file(db, file_id, FileUpdate(is_processed=True))
+            return
+
+    if not complete_ocr_job(db, job_id, worker_id):
+        logger.warning(f"任务 {job_id} 完成时租约已不属于 {worker_id}")
+
+
+def run_worker(worker_index: int):
+    """单个worker进程的主循环"""
+    # fork出来的子进程不能复用父进程的数据库连接
+    engine.dispose(close=False)
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    logger.info(f"OCR worker {worker_index} ({worker_id}) 已启动")
+    while not stop.is_set():
+        try:
+            with SessionLocal() as db:
+                job = claim_next_ocr_job(
+                    db, worker_id, settings.ocr_job_lease_seconds
+                )
+                if job is None:
+                    stop.wait(settings.ocr_job_poll_interval)
+                    continue
+                try:
+                    run_job(db, job, worker_id)
+                finally:
+                    registry.flush()
+        except Exception as e:
+            logger.error(f"OCR worker {worker_id} 出错: {str(e)}")
+            stop.wait(settings.ocr_job_poll_interval)
+
+    logger.info(f"OCR worker {worker_index} ({worker_id}) 已退出")
+
+
+def run_worker_pool(worker_count: int):
+    """启动并守护worker进程，子进程意外退出时自动重启"""
+    processes = {}
+    stopping = threading.Event()
+
+    def shutdown(*_):
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    def start(index: int):
+        process = multiprocessing.Process(
+            target=run_worker, args=(index,), name=f"ocr-worker-{index}"
+        )
+        process.start()
+        processes[index] = process
+
+    for index in range(worker_count):
+        start(index)
+
+    while not stopping.is_set():
+        for index, process in list(processes.items()):
+            if not process.is_alive():
+                logger.warning(
+                    f"OCR worker {index} 异常退出 (exitcode={process.exitcode})，正在重启"
+                )
+                start(index)
+        time.sleep(1)
+
+    for process in processes.values():
+        if process.is_alive():
+            process.terminate()
+    for process in processes.values():
+        process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the OCR worker pool")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.ocr_worker_count,
+        help="number of worker processes",
+    )
+    args = parser.parse_args()
+    run_worker_pool(max(args.workers, 1))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Benchmark for the per-user invoice, file and analysis queries.
+
+Seeds the configured (local!) Postgres database with synthetic users, files,
+invoices, items and analyses, then runs the queries issued by
+get_user_invoices, get_invoice_by_file, get_user_files,
+ConsumerDataExtractor.extract_data and get_latest_user_analysis. Each query is
+run twice: once inside a transaction that drops the foreign-key and
+(user_id, date/created_at DESC) indexes and is rolled back afterwards, and
+once with the indexes in place. It reports p50/p95 latencies and the top
+node of each EXPLAIN ANALYZE plan.
+
+    python scripts/bench_invoice_queries.py --seed [--users 200 --invoices 250]
+    python scripts/bench_invoice_queries.py [--repeat 50] [--explain]
+    python scripts/bench_invoice_queries.py --cleanup
+
+Seeded users are named bench_<n> and are only removed by --cleanup.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from sqlalchemy import event, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.db import SessionLocal, engine  # noqa: E402
+from app.crud.consumer_analysis import get_latest_user_analysis  # noqa: E402
+from app.crud.files import get_user_files  # noqa: E402
+from app.crud.invoice import get_invoice_by_file, get_user_invoices  # noqa: E402
+from app.models.consumer_analysis import ConsumerAnalysis  # noqa: E402,F401
+from app.models.files import File  # noqa: E402,F401
+from app.models.invitation import Invitation  # noqa: E402,F401
+from app.models.invoice import Invoice  # noqa: E402
+from app.models.invoice_item import InvoiceItem  # noqa: E402
+from app.models.ocr_job import OcrJob  # noqa: E402,F401
+from app.models.users import Users  # noqa: E402
+
+# 迁移 5d2e8a7c41f0 添加的索引
+INDEXES = [
+    "ix_invoice_file_id",
+    "ix_invoice_user_id_date",
+    "ix_invoice_user_id_created_at",
+    "ix_invoice_item_invoice_id",
+    "ix_file_user_id_created_at",
+    "ix_consumer_analysis_user_id_created_at",
+]
+
+SEED_STATEMENTS = [
+    """
+    INSERT INTO users (id, username, email, hashed_password, first_name, last_name,
+                       is_active, is_superuser, is_verified)
+    SELECT gen_random_uuid(), 'bench_' || g, 'bench_' || g || '@example.com',
+           'x', 'Bench', 'User', true, false, false
+    FROM generate_series(1, :users) g
+    """,
+    """
+    INSERT INTO file (id, filename, original_filename, file_path, file_size,
+                      file_type, is_active, is_processed, user_id,
+                      created_at, updated_at)
+    SELECT gen_random_uuid(), g || '.pdf', g || '.pdf', '/dev/null', 1024,
+           'application/pdf', true, true, u.id,
+           now() - g * interval '7 hours', now() - g * interval '7 hours'
+    FROM users u CROSS JOIN generate_series(1, :invoices) g
+    WHERE u.username LIKE 'bench\\_%'
+    """,
+    """
+    INSERT INTO invoice (id, brand, date, total, is_processed, file_id, user_id,
+                         created_at, updated_at)
+    SELECT gen_random_uuid(), 'REWE', f.created_at::timestamp,
+           round((random() * 100)::numeric, 2), true, f.id, f.user_id,
+           f.created_at, f.created_at
+    FROM file f JOIN users u ON u.id = f.user_id
+    WHERE u.username LIKE 'bench\\_%'
+    """,
+    """
+    INSERT INTO invoice_item (id, name, quantity, unit_price, total_price, invoice_id)
+    SELECT gen_random_uuid(), 'Artikel ' || g, 1, 1.99, 1.99, i.id
+    FROM invoice i JOIN users u ON u.id = i.user_id
+    CROSS JOIN generate_series(1, :items) g
+    WHERE u.username LIKE 'bench\\_%'
+    """,
+    """
+    INSERT INTO consumer_analysis (id, user_id, analysis_data, created_at)
+    SELECT gen_random_uuid(), u.id, '{}'::json, now() - g * interval '1 day'
+    FROM users u CROSS JOIN generate_series(1, :analyses) g
+    WHERE u.username LIKE 'bench\\_%'
+    """,
+]
+
+CLEANUP_STATEMENTS = [
+    "CREATE TEMP TABLE bench_users AS "
+    "SELECT id FROM users WHERE username LIKE 'bench\\_%'",
+    "DELETE FROM invoice_item WHERE invoice_id IN "
+    "(SELECT id FROM invoice WHERE user_id IN (SELECT id FROM bench_users))",
+    "DELETE FROM invoice WHERE user_id IN (SELECT id FROM bench_users)",
+    "DELETE FROM file WHERE user_id IN (SELECT id FROM bench_users)",
+    "DELETE FROM consumer_analysis WHERE user_id IN (SELECT id FROM bench_users)",
+    "DELETE FROM users WHERE id IN (SELECT id FROM bench_users)",
+    "DROP TABLE bench_users",
+]
+
+
+def seed(db, args):
+    existing = db.execute(
+        text("SELECT count(*) FROM users WHERE username LIKE 'bench\\_%'")
+    ).scalar()
+    if existing:
+        print(f"{existing} bench users already exist, run --cleanup first")
+        sys.exit(1)
+
+    params = {
+        "users": args.users,
+        "invoices": args.invoices,
+        "items": args.items,
+        "analyses": args.analyses,
+    }
+    for statement in SEED_STATEMENTS:
+        start = time.perf_counter()
+        result = db.execute(text(statement), params)
+        table = statement.split()[2]
+        print(f"seeded {result.rowcount:>9} rows into {table:<18} "
+              f"({time.perf_counter() - start:.1f}s)")
+    db.commit()
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE"))
+
+
+def cleanup(db):
+    for statement in CLEANUP_STATEMENTS:
+        db.execute(text(statement))
+    db.commit()
+    print("removed bench data")
+
+
+def workloads(db, user_id, file_id):
+    def extract_data_invoices():
+        # 与 ConsumerDataExtractor.extract_data 中的查询相同
+        return (
+            db.query(Invoice)
+            .filter(Invoice.user_id == user_id)
+            .order_by(Invoice.date.desc())
+            .all()
+        )
+
+    invoice_ids = [invoice.id for invoice in extract_data_invoices()]
+    db.expunge_all()
+
+    def extract_data_items():
+        return (
+            db.query(InvoiceItem).filter(InvoiceItem.invoice_id.in_(invoice_ids)).all()
+        )
+
+    return {
+        "get_user_invoices": lambda: get_user_invoices(db, user_id),
+        "get_invoice_by_file": lambda: get_invoice_by_file(db, file_id),
+        "get_user_files": lambda: get_user_files(db, user_id),
+        "extract_data (invoices)": extract_data_invoices,
+        "extract_data (items)": extract_data_items,
+        "get_latest_user_analysis": lambda: get_latest_user_analysis(db, user_id),
+    }
+
+
+def capture_statement(func):
+    """执行一次查询并返回实际发送给数据库的SQL和参数"""
+    statements = []
+
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        func()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return statements[0]
+
+
+def scan_nodes(plan):
+    """从计划中取出各个扫描节点，例如 "Index Scan using ix_invoice_user_id_date" """
+    nodes = []
+    for line in plan:
+        node = line.strip().lstrip("->").split("  (")[0].strip()
+        if "Scan" in node and not node.startswith("Bitmap Heap"):
+            nodes.append(node.replace(" on ", " "))
+    return "; ".join(nodes)
+
+
+def run_phase(db, title, queries, repeat, explain):
+    print(f"\n== {title}")
+    print(f"{'query':<26} {'p50 ms':>8} {'p95 ms':>8}  scans")
+    for name, func in queries.items():
+        statement, parameters = capture_statement(func)
+        plan = [
+            row[0]
+            for row in db.connection().exec_driver_sql(
+                "EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters
+            )
+        ]
+        db.expunge_all()
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+            db.expunge_all()
+
+        p50 = statistics.median(timings)
+        p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else p50
+        print(f"{name:<26} {p50:8.2f} {p95:8.2f}  {scan_nodes(plan)}")
+        if explain:
+            for line in plan:
+                print(f"    {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seed", action="store_true", help="seed bench data first")
+    parser.add_argument("--cleanup", action="store_true", help="remove bench data")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--invoices", type=int, default=250, help="per user")
+    parser.add_argument("--items", type=int, default=8, help="per invoice")
+    parser.add_argument("--analyses", type=int, default=20, help="per user")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--explain", action="store_true", help="print full plans")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        if args.cleanup:
+            cleanup(db)
+            return
+        if args.seed:
+            seed(db, args)
+
+        user = (
+            db.query(Users)
+            .filter(Users.username.like("bench\\_%"))
+            .order_by(Users.username)
+            .offset(args.users // 2)
+            .first()
+        )
+        if user is None:
+            print("no bench data, run with --seed first")
+            sys.exit(1)
+        user_id = user.id
+        file_id = db.execute(
+            text("SELECT file_id FROM invoice WHERE user_id = :user_id LIMIT 1"),
+            {"user_id": str(user_id)},
+        ).scalar()
+        print(
+            "rows: "
+            + ", ".join(
+                f"{table}={db.execute(text(f'SELECT count(*) FROM {table}')).scalar()}"
+                for table in ("users", "file", "invoice", "invoice_item", "consumer_analysis")
+            )
+        )
+        db.rollback()
+
+        queries = workloads(db, user_id, file_id)
+
+        # DDL在Postgres中是事务性的，回滚后索引恢复
+        for index in INDEXES:
+            db.execute(text(f"DROP INDEX IF EXISTS {index}"))
+        run_phase(db, "without indexes", queries, args.repeat, args.explain)
+        db.rollback()
+
+        run_phase(db, "with indexes", queries, args.repeat, args.explain)
+        db.rollback()
+
+
+if __name__ == "__main__":
+    main()
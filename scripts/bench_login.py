@@ -0,0 +1,157 @@
+"""
+Benchmark for password verification and login throughput under concurrency.
+
+Runs --concurrency concurrent bcrypt verifications (at PASSWORD_BCRYPT_ROUNDS)
+in a single event loop, first inline as the /token route used to do and then
+through the bounded password executor. For each mode it reports verifications
+per second and the event-loop lag measured by a heartbeat coroutine, which is
+what every other request on the worker waits for. Finally it posts
+concurrent logins to /token through the ASGI app against the configured
+database.
+
+    python scripts/bench_login.py [--requests 64 --concurrency 16]
+    python scripts/bench_login.py --cleanup
+
+The login phase creates a user named bench_login, which is only removed by
+--cleanup.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings  # noqa: E402
+from app.core.db import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.users import Users  # noqa: E402
+from app.utils.password import (  # noqa: E402
+    get_password_hash,
+    verify_password,
+    verify_password_async,
+)
+
+USERNAME = "bench_login"
+EMAIL = "bench_login@example.com"
+PASSWORD = "bench-password"
+
+
+def percentile(values, q):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100)[q - 1]
+
+
+async def heartbeat(lags, stop, interval=0.005):
+    """记录事件循环的延迟：每次sleep实际多等待了多久"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append((loop.time() - start - interval) * 1000)
+
+
+async def run_concurrently(func, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await func()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    lags = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    return elapsed, latencies, lags
+
+
+def report(name, requests, elapsed, latencies, lags):
+    print(
+        f"{name:<10} {requests / elapsed:8.1f}/s "
+        f"p50 {percentile(latencies, 50):8.1f} ms  p95 {percentile(latencies, 95):8.1f} ms  "
+        f"loop lag p95 {percentile(lags, 95):8.1f} ms  max {max(lags, default=0):8.1f} ms"
+    )
+
+
+def ensure_user():
+    with SessionLocal() as db:
+        user = db.query(Users).filter(Users.username == USERNAME).first()
+        if user is None:
+            db.add(
+                Users(
+                    username=USERNAME,
+                    email=EMAIL,
+                    hashed_password=get_password_hash(PASSWORD),
+                    first_name="Bench",
+                    last_name="Login",
+                )
+            )
+            db.commit()
+
+
+def cleanup():
+    with SessionLocal() as db:
+        db.query(Users).filter(Users.username == USERNAME).delete()
+        db.commit()
+    print("removed bench user")
+
+
+async def bench(args):
+    hashed = get_password_hash(PASSWORD)
+
+    async def inline():
+        verify_password(PASSWORD, hashed)
+
+    async def executor():
+        await verify_password_async(PASSWORD, hashed)
+
+    print(
+        f"bcrypt rounds={settings.password_bcrypt_rounds} "
+        f"workers={settings.password_hash_workers} "
+        f"requests={args.requests} concurrency={args.concurrency}"
+    )
+    for name, func in (("inline", inline), ("executor", executor)):
+        report(name, args.requests, *await run_concurrently(func, args.requests, args.concurrency))
+
+    ensure_user()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def login():
+            response = await client.post(
+                f"{settings.api_prefix}/token",
+                data={"username": EMAIL, "password": PASSWORD},
+            )
+            response.raise_for_status()
+
+        report("/token", args.requests, *await run_concurrently(login, args.requests, args.concurrency))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--cleanup", action="store_true", help="remove bench user")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup()
+        return
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
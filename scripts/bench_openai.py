@@ -0,0 +1,143 @@
+"""
+Benchmark for ChatGPTClient against a local mock OpenAI server.
+
+Starts scripts/mock_openai.py in-process on a free port and sends --requests
+analyses with --concurrency in flight, first with a new httpx client per call
+(how the client used to work) and then through the shared, pooled client that
+the FastAPI lifespan opens. For each mode it reports analyses per second,
+p50/p95 latency, failed analyses, the number of TCP connections the mock saw
+and the retries triggered by its 429 responses (--error-rate, honoring
+Retry-After). The mock speaks plain HTTP, so the per-call mode only pays the
+TCP handshake here; against api.openai.com it also pays a TLS handshake.
+
+    python scripts/bench_openai.py [--requests 200 --concurrency 16 --latency-ms 50]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+import uvicorn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+PORT = free_port()
+os.environ["OPENAI_API_URL"] = f"http://127.0.0.1:{PORT}/v1/chat/completions"
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+from mock_openai import create_app  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.utils import chatgpt_client  # noqa: E402
+from app.utils.chatgpt_client import ChatGPTClient  # noqa: E402
+
+CONSUMER_DATA = {
+    "user_id": "bench",
+    "invoices": [],
+    "summary": {
+        "total_invoices": 12,
+        "total_items": 80,
+        "total_spent": 231.5,
+        "by_brand": {"REWE": 231.5},
+        "by_month": {"2025-04": 231.5},
+        "top_items": [["Bananen", 6], ["Milch", 5]],
+    },
+}
+
+
+def percentile(values, q):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100)[q - 1]
+
+
+def start_mock(args):
+    app = create_app(args.latency_ms, args.error_rate, args.retry_after)
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=PORT, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return app, server
+
+
+async def run_load(requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    client = ChatGPTClient()
+    latencies = []
+    errors = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            result = await client.analyze_consumer_data(CONSUMER_DATA)
+            if "error" in result:
+                errors.append(result["error"])
+                return
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return time.perf_counter() - start, latencies, errors
+
+
+async def bench(args, mock):
+    print(
+        f"requests={args.requests} concurrency={args.concurrency} "
+        f"mock latency={args.latency_ms}ms error rate={args.error_rate} "
+        f"max retries={settings.openai_max_retries} "
+        f"max concurrency={settings.openai_max_concurrency}"
+    )
+    print(
+        f"{'client':<10} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'errors':>7} {'connections':>12} {'retries':>8}"
+    )
+    for name in ("per-call", "shared"):
+        if name == "shared":
+            await chatgpt_client.open_http_client()
+        mock.state.reset()
+        retries_before = sum(chatgpt_client.openai_retries.snapshot().values())
+
+        elapsed, latencies, errors = await run_load(args.requests, args.concurrency)
+
+        retries = sum(chatgpt_client.openai_retries.snapshot().values()) - retries_before
+        print(
+            f"{name:<10} {len(latencies) / elapsed:8.1f} "
+            f"{percentile(latencies, 50):8.1f} {percentile(latencies, 95):8.1f} "
+            f"{len(errors):7} {len(mock.state.connections):12} {retries:8.0f}"
+        )
+    await chatgpt_client.close_http_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--retry-after", type=float, default=0.1)
+    args = parser.parse_args()
+
+    mock, server = start_mock(args)
+    try:
+        asyncio.run(bench(args, mock))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Micro-benchmark for receipt field extraction.
+
+Compares the previous implementation (one uncompiled re.search per field and
+per marker, kept below as ``legacy_extract``) with the per-retailer parsers in
+app/utils/receipt_parsers.py over the sample receipts in scripts/receipts/.
+
+Header fields must be identical. Items are checked against the generic parser,
+whose grammar is the legacy one; the retailer parsers may find more items than
+the legacy code (their grammars know the retailer's own section markers), but
+never fewer: when a retailer grammar finds no items the parser falls back to
+the generic grammar (rewe_zu_zahlen.txt ends with "zu zahlen", which the REWE
+grammar does not know).
+
+    python scripts/bench_receipt_extraction.py [--rounds 2000]
+"""
+
+import argparse
+import glob
+import logging
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.receipt_parsers import (  # noqa: E402
+    GENERIC_PARSER,
+    detect_parser,
+    extract_invoice_data,
+)
+
+RECEIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "receipts")
+
+
+def legacy_extract(text):
+    data = {}
+
+    if re.search(r"REWE", text, re.IGNORECASE):
+        data["brand"] = "REWE"
+    elif re.search(r"Kaufland", text, re.IGNORECASE):
+        data["brand"] = "Kaufland"
+    elif re.search(r"ALDI", text, re.IGNORECASE):
+        data["brand"] = "ALDI"
+    elif re.search(r"LIDL", text, re.IGNORECASE):
+        data["brand"] = "LIDL"
+    elif re.search(r"Edeka", text, re.IGNORECASE):
+        data["brand"] = "Edeka"
+
+    markt_match = re.search(r"REWE\s+([A-Za-z0-9\s.\-]+)(?=\n|$)", text)
+    if markt_match:
+        data["markt_name"] = markt_match.group(1).strip()
+
+    address_match = re.search(
+        r"(?<=\n)([A-Za-zäöüÄÖÜß\s.\-]+\s\d+[\s,]*\n\d{5}\s+[A-Za-zäöüÄÖÜß\s.\-]+)",
+        text,
+    )
+    if address_match:
+        data["store_address"] = address_match.group(1).strip()
+
+    phone_match = re.search(
+        r"(?:Tel|Telefon|Tel\.)[:\s]+([0-9\s/\-+]+)", text, re.IGNORECASE
+    )
+    if phone_match:
+        data["telephone"] = phone_match.group(1).strip()
+
+    uid_match = re.search(
+        r"(?:UID-Nr|USt-IdNr|Steuernummer)[:\s.]+([A-Z0-9\s]+)", text, re.IGNORECASE
+    )
+    if uid_match:
+        data["uid_number"] = uid_match.group(1).strip()
+
+    markt_id_match = re.search(
+        r"(?:Markt-ID|Filial-ID|Markt)[:\s]+(\d+)", text, re.IGNORECASE
+    )
+    if markt_id_match:
+        data["markt_id"] = markt_id_match.group(1).strip()
+
+    receipt_match = re.search(
+        r"(?:Bon-Nr|Bon|Beleg)[:\s.]+([A-Z0-9\-]+)", text, re.IGNORECASE
+    )
+    if receipt_match:
+        data["receipt_nr"] = receipt_match.group(1).strip()
+
+    doc_match = re.search(
+        r"(?:Beleg-Nr|Belegnummer)[:\s.]+([A-Z0-9\-]+)", text, re.IGNORECASE
+    )
+    if doc_match and not data.get("receipt_nr"):
+        data["document_nr"] = doc_match.group(1).strip()
+
+    date_match = re.search(r"(\d{1,2})[\.-](\d{1,2})[\.-](\d{2,4})", text)
+    if date_match:
+        day, month, year = date_match.groups()
+        if len(year) == 2:
+            year = "20" + year
+        try:
+            data["date"] = datetime(int(year), int(month), int(day))
+        except ValueError:
+            pass
+
+    time_match = re.search(r"(\d{1,2}):(\d{2})(?:\s*Uhr)?", text)
+    if time_match:
+        data["time"] = f"{time_match.group(1)}:{time_match.group(2)}"
+
+    payment_methods = [
+        "EC-Cash",
+        "Girocard",
+        "Kreditkarte",
+        "Mastercard",
+        "Visa",
+        "American Express",
+        "BAR",
+        "Bar",
+        "Bargeld",
+    ]
+    for method in payment_methods:
+        if re.search(rf"\b{method}\b", text, re.IGNORECASE):
+            data["payment_method"] = method
+            break
+
+    total_match = re.search(
+        r"(?:SUMME|Summe|Gesamtbetrag|Gesamt|Total)[:\s]*(\d+[,.]\d{2})",
+        text,
+        re.IGNORECASE,
+    )
+    if total_match:
+        try:
+            data["total"] = float(total_match.group(1).replace(",", "."))
+        except ValueError:
+            pass
+
+    data["items"] = legacy_extract_items(text)
+    return data
+
+
+def legacy_extract_items(text):
+    lines = text.split("\n")
+    items = []
+
+    start_markers = [
+        r"^\s*\d+\s+Artikel",
+        r"Ihre\s+Einkäufe",
+        r"^Pos\.\s+Artikel",
+        r"Artikelbezeichnung",
+        r"mit Pick & Go",
+        r"UID Nr\.",
+        r"EUR$",
+    ]
+    end_markers = [
+        r"^\s*SUMME\s+EUR",
+        r"^\s*Gesamtbetrag",
+        r"^\s*Summe\s+EUR",
+        r"^\s*zu zahlen",
+        r"^-{6,}",
+    ]
+
+    start_index = -1
+    end_index = -1
+
+    for i, line in enumerate(lines):
+        for pattern in start_markers:
+            if re.search(pattern, line, re.IGNORECASE):
+                start_index = i
+                break
+        if start_index != -1:
+            break
+
+    if start_index != -1:
+        start_index += 1
+
+    if start_index != -1:
+        for i in range(start_index + 1, len(lines)):
+            for pattern in end_markers:
+                if re.search(pattern, lines[i], re.IGNORECASE):
+                    end_index = i
+                    break
+            if end_index != -1:
+                break
+
+    if start_index != -1 and end_index != -1:
+        for i in range(start_index, end_index):
+            line = lines[i].strip()
+            if not line or re.search(r"www\.|http|^EUR$", line, re.IGNORECASE):
+                continue
+
+            rewe_item_match = re.search(r"(.+?)\s+(\d+[,.]\d{1,2})\s*([A-Z])$", line)
+            if rewe_item_match:
+                name, price, tax_category = rewe_item_match.groups()
+                items.append(
+                    {"name": name.strip(), "total_price": float(price.replace(",", "."))}
+                )
+                continue
+
+            item_match = re.search(
+                r"(.+?)\s+(\d+(?:[,.]\d+)?)\s*[xX]\s*(\d+[,.]\d{2})\s+(\d+[,.]\d{2})",
+                line,
+            )
+            if item_match:
+                name, quantity, unit_price, total_price = item_match.groups()
+                items.append(
+                    {
+                        "name": name.strip(),
+                        "quantity": float(quantity.replace(",", ".")),
+                        "unit_price": float(unit_price.replace(",", ".")),
+                        "total_price": float(total_price.replace(",", ".")),
+                    }
+                )
+                continue
+
+            price_match = re.search(r"(.+?)\s+(\d+[,.]\d{2})$", line)
+            if price_match:
+                name, price = price_match.groups()
+                if not re.search(
+                    r"MwSt\.|Rabatt|Pfand|Steuer|Netto|Brutto", name, re.IGNORECASE
+                ):
+                    items.append(
+                        {
+                            "name": name.strip(),
+                            "total_price": float(price.replace(",", ".")),
+                        }
+                    )
+                    continue
+
+    return items
+
+
+def load_corpus():
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(RECEIPTS_DIR, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            corpus.append((os.path.basename(path), f.read()))
+    return corpus
+
+
+def measure(extract, corpus, rounds):
+    texts = [text for _, text in corpus]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            extract(text)
+    elapsed = time.perf_counter() - start
+    return rounds * len(texts) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    # 只测提取本身的开销，不包含日志输出
+    logging.disable(logging.CRITICAL)
+
+    corpus = load_corpus()
+    for name, text in corpus:
+        legacy, current = legacy_extract(text), extract_invoice_data(text)
+        legacy_items, current_items = legacy.pop("items"), current.pop("items")
+        generic_items = GENERIC_PARSER.items.extract(text)
+        if legacy != current or legacy_items != generic_items:
+            print(f"output mismatch for {name}:\n  legacy:  {legacy}\n  current: {current}")
+            sys.exit(1)
+        if len(current_items) < len(legacy_items):
+            print(
+                f"{name}: dispatched parser found {len(current_items)} items, "
+                f"legacy {len(legacy_items)}"
+            )
+            sys.exit(1)
+        parser_name = type(detect_parser(text)).__name__
+        print(
+            f"{name:<20} {parser_name:<16} items: "
+            f"{len(legacy_items)} legacy, {len(current_items)} dispatched"
+        )
+
+    before = measure(legacy_extract, corpus, args.rounds)
+    after = measure(extract_invoice_data, corpus, args.rounds)
+
+    print(f"corpus: {len(corpus)} receipts x {args.rounds} rounds")
+    print(f"before: {before:10.0f} receipts/s")
+    print(f"after:  {after:10.0f} receipts/s  ({after / before:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
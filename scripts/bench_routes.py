@@ -0,0 +1,224 @@
+"""
+Load test for the DB-bound read routes, run in-process through the ASGI app.
+
+Sends --requests concurrent GETs to /files/me, /files/invoices/me and
+/ai/consumer-analyses, and for comparison to copies of the same handlers
+declared `async def` that call the CRUD functions directly on the event loop
+(how these routes used to be written). Local Postgres answers in well under a
+millisecond, so --db-latency-ms adds a blocking sleep before every statement
+to model the network round trip to a hosted database. For each variant it
+reports requests per second, p50/p95 latency, the event-loop lag and the
+number of failed requests. With the legacy handlers the event loop itself
+blocks on pool checkout once concurrency exceeds the pool, so the sessions
+that would release connections cannot finish; DB_POOL_TIMEOUT defaults to 5
+seconds here so that shows up as errors instead of a long stall.
+
+    python scripts/bench_routes.py [--requests 200 --concurrency 32 --db-latency-ms 20]
+    python scripts/bench_routes.py --cleanup
+
+Creates a user named bench_routes with --files files and invoices, which are
+only removed by --cleanup.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import httpx
+from fastapi import APIRouter, Depends
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DB_POOL_TIMEOUT", "5")
+
+from app.auth import create_access_token, get_current_active_user  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.db import SessionLocal, engine, get_db  # noqa: E402
+from app.crud.consumer_analysis import get_user_analyses  # noqa: E402
+from app.crud.files import get_user_files  # noqa: E402
+from app.crud.invoice import get_user_invoices  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.files import File  # noqa: E402
+from app.models.invoice import Invoice  # noqa: E402
+from app.models.users import Users  # noqa: E402
+from app.schemas.consumer_analysis import ConsumerAnalysis  # noqa: E402
+from app.schemas.files import File as FileSchema  # noqa: E402
+from app.schemas.invoice import Invoice as InvoiceSchema  # noqa: E402
+
+USERNAME = "bench_routes"
+ROUTES = ["/files/me", "/files/invoices/me", "/ai/consumer-analyses"]
+
+# 旧写法：async def 中直接调用同步CRUD
+legacy = APIRouter(prefix="/bench-legacy")
+
+
+@legacy.get("/files/me", response_model=List[FileSchema])
+async def legacy_files(db=Depends(get_db), user=Depends(get_current_active_user)):
+    return get_user_files(db, user.id)
+
+
+@legacy.get("/files/invoices/me", response_model=List[InvoiceSchema])
+async def legacy_invoices(db=Depends(get_db), user=Depends(get_current_active_user)):
+    return get_user_invoices(db, user.id)
+
+
+@legacy.get("/ai/consumer-analyses", response_model=List[ConsumerAnalysis])
+async def legacy_analyses(db=Depends(get_db), user=Depends(get_current_active_user)):
+    return get_user_analyses(db, user.id)
+
+
+def percentile(values, q):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100)[q - 1]
+
+
+async def heartbeat(lags, stop, interval=0.005):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append((loop.time() - start - interval) * 1000)
+
+
+async def run_load(client, paths, headers, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.get(paths[i % len(paths)], headers=headers)
+                response.raise_for_status()
+            except Exception as e:
+                errors.append(e)
+                return
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    lags = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+    return elapsed, latencies, lags, errors
+
+
+def ensure_user(files):
+    with SessionLocal() as db:
+        user = db.query(Users).filter(Users.username == USERNAME).first()
+        if user is not None:
+            return user.username
+        user = Users(
+            username=USERNAME,
+            email=f"{USERNAME}@example.com",
+            hashed_password="x",
+            first_name="Bench",
+            last_name="Routes",
+        )
+        db.add(user)
+        db.flush()
+        now = datetime.now()
+        for i in range(files):
+            file = File(
+                filename=f"{i}.pdf",
+                original_filename=f"{i}.pdf",
+                file_path="/dev/null",
+                file_size=1024,
+                file_type="application/pdf",
+                is_processed=True,
+                user_id=user.id,
+            )
+            db.add(file)
+            db.flush()
+            db.add(
+                Invoice(
+                    brand="REWE",
+                    date=now - timedelta(days=i),
+                    total=9.99,
+                    is_processed=True,
+                    file_id=file.id,
+                    user_id=user.id,
+                )
+            )
+        db.commit()
+        return user.username
+
+
+def cleanup():
+    with SessionLocal() as db:
+        user = db.query(Users).filter(Users.username == USERNAME).first()
+        if user is not None:
+            db.delete(user)
+            db.commit()
+    print("removed bench user")
+
+
+async def bench(args):
+    headers = {
+        "Authorization": f"Bearer {create_access_token({'sub': ensure_user(args.files)})}"
+    }
+    app.include_router(legacy, prefix=settings.api_prefix)
+
+    if args.db_latency_ms > 0:
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def simulate_latency(conn, cursor, statement, parameters, context, executemany):
+            time.sleep(args.db_latency_ms / 1000)
+
+    print(
+        f"requests={args.requests} concurrency={args.concurrency} "
+        f"db_latency={args.db_latency_ms}ms pool={settings.db_pool_size}+{settings.db_max_overflow}"
+    )
+    print(
+        f"{'variant':<12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'loop lag p95':>13} {'errors':>7}"
+    )
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        variants = (
+            ("async+sync", [f"{settings.api_prefix}/bench-legacy{p}" for p in ROUTES]),
+            ("threadpool", [f"{settings.api_prefix}{p}" for p in ROUTES]),
+        )
+        # 预热：建立连接池中的连接并填充用户缓存
+        warmup = min(args.concurrency, settings.db_pool_size)
+        for _, paths in variants:
+            await run_load(client, paths, headers, warmup, warmup)
+
+        for name, paths in variants:
+            elapsed, latencies, lags, errors = await run_load(
+                client, paths, headers, args.requests, args.concurrency
+            )
+            print(
+                f"{name:<12} {len(latencies) / elapsed:8.1f} "
+                f"{percentile(latencies, 50):8.1f} {percentile(latencies, 95):8.1f} "
+                f"{percentile(lags, 95):13.1f} {len(errors):7}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--db-latency-ms", type=float, default=20)
+    parser.add_argument("--files", type=int, default=50, help="seeded files/invoices")
+    parser.add_argument("--cleanup", action="store_true", help="remove bench user")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup()
+        return
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
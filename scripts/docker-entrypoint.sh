@@ -0,0 +1,45 @@
+#!/bin/sh
+# Container entrypoint.
+#
+#   all     (default) the API and the OCR worker pool in one container
+#   api     only the API (uvicorn)
+#   worker  only the OCR worker pool (python -m app.worker)
+#
+# Extra arguments are passed to uvicorn or app.worker; any other command is run
+# as is (e.g. "alembic upgrade head"). api and worker containers must share the
+# uploads directory (/app/uploads) and METRICS_DIR.
+set -e
+
+API="uvicorn app.main:app --host 0.0.0.0 --port 8000"
+
+case "$1" in
+    api)
+        shift
+        exec $API "$@"
+        ;;
+    worker)
+        shift
+        exec python -m app.worker "$@"
+        ;;
+    all)
+        shift
+        # both processes write metric snapshots here, /metrics merges them
+        export METRICS_DIR="${METRICS_DIR:-/tmp/spend-metrics}"
+        python -m app.worker &
+        worker_pid=$!
+        $API "$@" &
+        api_pid=$!
+        trap 'stopping=1; kill -TERM "$api_pid" "$worker_pid" 2>/dev/null' TERM INT
+        # stop both when either one exits, so the container restarts as a whole
+        while kill -0 "$api_pid" 2>/dev/null && kill -0 "$worker_pid" 2>/dev/null; do
+            sleep 1 &
+            wait $! || true
+        done
+        kill -TERM "$api_pid" "$worker_pid" 2>/dev/null || true
+        wait
+        [ -n "$stopping" ]
+        ;;
+    *)
+        exec "$@"
+        ;;
+esac
@@ -0,0 +1,125 @@
+"""
+Minimal mock of the OpenAI chat completions endpoint for local benchmarks.
+
+Answers POST /v1/chat/completions after --latency-ms with a fixed JSON
+analysis. A share of requests (--error-rate) is answered with 429 and a
+Retry-After header instead, to exercise the client's retries. The mock
+counts requests, rate-limited responses and distinct client connections,
+and GET /stats returns those counts. Requests with "stream": true get the
+same answer as Server-Sent Events chunks spread evenly over --latency-ms, the
+way the real API streams tokens.
+
+    python scripts/mock_openai.py [--port 8090 --latency-ms 300 --error-rate 0.1]
+    OPENAI_API_URL=http://127.0.0.1:8090/v1/chat/completions uvicorn app.main:app
+"""
+
+import argparse
+import asyncio
+import json
+import random
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+ANALYSIS = {
+    "basic_analysis": {
+        "spending_pattern": "mock",
+        "avg_spending": "0",
+        "shopping_frequency": "weekly",
+    },
+    "items_analysis": {"frequently_bought": [], "possible_categories": {}},
+    "shopping_habits": {"preferred_stores": [], "time_patterns": "mock"},
+    "recommendations": ["mock"],
+}
+
+
+def create_app(latency_ms: float = 300, error_rate: float = 0.0, retry_after: float = 1):
+    stats = {"requests": 0, "rate_limited": 0}
+    connections = set()
+
+    async def chat_completions(request: Request):
+        stats["requests"] += 1
+        connections.add(request.client)
+        body = await request.json()
+        if random.random() < error_rate:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "requests"}},
+                status_code=429,
+                headers={"Retry-After": str(retry_after)},
+            )
+        if body.get("stream"):
+            return StreamingResponse(
+                stream_chunks(json.dumps(ANALYSIS)), media_type="text/event-stream"
+            )
+        await asyncio.sleep(latency_ms / 1000)
+        return JSONResponse(
+            {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {
+                            "role": "assistant",
+                            "content": json.dumps(ANALYSIS),
+                        },
+                        "finish_reason": "stop",
+                    }
+                ],
+            }
+        )
+
+    async def stream_chunks(content: str, chunks: int = 20):
+        size = -(-len(content) // chunks)
+        for start in range(0, len(content), size):
+            await asyncio.sleep(latency_ms / 1000 / chunks)
+            chunk = {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "choices": [
+                    {"index": 0, "delta": {"content": content[start : start + size]}}
+                ],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    async def get_stats(request: Request):
+        return JSONResponse({**stats, "connections": len(connections)})
+
+    def reset():
+        stats.update(requests=0, rate_limited=0)
+        connections.clear()
+
+    app = Starlette(
+        routes=[
+            Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+            Route("/stats", get_stats),
+        ]
+    )
+    app.state.stats = stats
+    app.state.connections = connections
+    app.state.reset = reset
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1)
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(args.latency_ms, args.error_rate, args.retry_after),
+        host=args.host,
+        port=args.port,
+    )
+
+
+if __name__ == "__main__":
+    main()